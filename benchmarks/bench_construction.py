@@ -0,0 +1,41 @@
+'''Benchmarks creating and sorting large blocks serially and with workers.
+
+Run from repository root with package source on path:
+    PYTHONPATH=source python benchmarks/bench_construction.py [items] [workers]
+
+Workers are only used on free-threaded python builds, elsewhere both
+timings sort items in one process.
+'''
+import random
+import sys
+import time
+
+from mimap import block
+from mimap import item
+from mimap import parallel
+
+
+def create_items(count):
+    # Creates items with random priorities.
+    return [item.Item(position, random.random()) for position in range(count)]
+
+def time_block(items, workers=None):
+    # Returns seconds taken to create block and sort its items.
+    started = time.perf_counter()
+    block_object = block.Block(items, workers=workers)
+    block_object.get_first_item()
+    return time.perf_counter() - started
+
+def main(count=1000000, workers=4):
+    items = create_items(count)
+    serial_time = time_block(items)
+    parallel_time = time_block(items, workers)
+    print("items: {}, workers: {}, free-threaded: {}".format(count, workers,
+        parallel.is_free_threaded()))
+    print("serial:   {:.3f}s".format(serial_time))
+    print("parallel: {:.3f}s".format(parallel_time))
+    print("speedup:  {:.2f}x".format(serial_time/parallel_time))
+
+
+if __name__ == "__main__":
+    main(*[int(argument) for argument in sys.argv[1:3]])
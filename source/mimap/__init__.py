@@ -1,4 +1,5 @@
 from pemap.reference import Reference
+from mimap.reference import WeakReference
 from mimap.priority import Priority
 
 from pemap.items import BaseItem
@@ -7,6 +8,11 @@ from mimap.item import Item
 from pemap.block import BaseBlock
 from mimap.block import Block
 from pemap.block import DeepBlock
+from mimap.aging import AgingBlock
+from mimap.bucket import BucketBlock
+from mimap.disk import DiskBlock
+from mimap.sharded import ShardedBlock
+from mimap.mapping import PriorityMapping
 
 from mimap.highlevel import *
 
@@ -0,0 +1,272 @@
+'''Running aggregates of items priorities.
+
+Aggregates are updated as items are added and removed without going
+through all items again. Items are identified by sequence numbers
+given to them by block.'''
+from mimap import sketch
+from mimap.index import Descending
+
+import abc
+import copy
+import heapq
+
+
+class _Sum():
+    # Running sum compensated for low digits lost by float additions
+    # (Neumaier summation). Integers are summed exactly.
+    # Ratio of magnitude left to largest magnitude reached below which
+    # sum is no longer trusted.
+    _cancellation = 2**-26
+
+    def __init__(self):
+        self._total = 0
+        self._compensation = 0
+        # Sum of absolute values of numbers currently summed and largest
+        # one reached, rounding errors are relative to the largest.
+        self._magnitude = 0
+        self._peak = 0
+
+    def _add(self, value):
+        total = self._total + value
+        if abs(self._total) >= abs(value):
+            self._compensation += (self._total - total) + value
+        else:
+            self._compensation += (value - total) + self._total
+        self._total = total
+
+    def add(self, value):
+        self._add(value)
+        self._magnitude += abs(value)
+        if self._magnitude > self._peak:
+            self._peak = self._magnitude
+
+    def remove(self, value):
+        self._add(-value)
+        self._magnitude -= abs(value)
+
+    def is_cancelled(self):
+        # Checks if removals cancelled most of magnitude summed before.
+        if isinstance(self._total, int):
+            return False
+        return self._magnitude < self._peak * self._cancellation
+
+    def get_value(self):
+        return self._total + self._compensation
+
+
+class Aggregate(abc.ABC):
+    '''Base class for aggregates updated one item at a time'''
+    def __init__(self, records=()):
+        '''
+        records: Iterator
+            (sequence number, Item object) pairs of existing items.
+        '''
+        self._count = 0
+        for seq, _item in records:
+            self.add(seq, _item)
+
+    def add(self, seq, _item):
+        '''Adds item with sequence number to aggregate'''
+        self._count += 1
+
+    def remove(self, seq, _item):
+        '''Removes item with sequence number from aggregate'''
+        self._count -= 1
+
+    @abc.abstractmethod
+    def get_value(self):
+        '''Gets value of aggregate, None if there are no items'''
+
+    def is_outdated(self):
+        '''Checks if aggregate needs to be created again from items'''
+        return False
+
+    def copy(self):
+        '''Returns copy of aggregate'''
+        return copy.copy(self)
+
+    def __len__(self):
+        return self._count
+
+
+class SumAggregate(Aggregate):
+    '''Keeps sum of priorities of items
+
+    Float priorities are summed with compensation for rounding. Removing
+    items which cancel most of sum makes aggregate outdated until created
+    again from remaining items.'''
+    def __init__(self, records=()):
+        self._sum = _Sum()
+        super().__init__(records)
+
+    def add(self, seq, _item):
+        super().add(seq, _item)
+        self._sum.add(_item.get_priority())
+
+    def remove(self, seq, _item):
+        super().remove(seq, _item)
+        self._sum.remove(_item.get_priority())
+
+    def is_outdated(self):
+        return self._sum.is_cancelled()
+
+    def copy(self):
+        copied_aggregate = super().copy()
+        copied_aggregate._sum = copy.copy(self._sum)
+        return copied_aggregate
+
+    def get_value(self):
+        if not self._count:
+            return None
+        return self._sum.get_value()
+
+
+class MeanAggregate(SumAggregate):
+    '''Keeps mean of priorities of items from their sum and count'''
+    def get_value(self):
+        if not self._count:
+            return None
+        return self._sum.get_value()/self._count
+
+
+class WeightedMeanAggregate(Aggregate):
+    '''Keeps mean of priorities of items weighted by `weight(item)`'''
+    def __init__(self, records=(), weight=None):
+        self._weight = weight
+        self._weighted_sum = _Sum()
+        self._weights_sum = _Sum()
+        super().__init__(records)
+
+    def get_weight(self, _item):
+        '''Gets weight of item, 1 if weight function was not provided'''
+        if self._weight is None:
+            return 1
+        return self._weight(_item)
+
+    def add(self, seq, _item):
+        super().add(seq, _item)
+        weight = self.get_weight(_item)
+        self._weighted_sum.add(weight * _item.get_priority())
+        self._weights_sum.add(weight)
+
+    def remove(self, seq, _item):
+        super().remove(seq, _item)
+        weight = self.get_weight(_item)
+        self._weighted_sum.remove(weight * _item.get_priority())
+        self._weights_sum.remove(weight)
+
+    def is_outdated(self):
+        return self._weighted_sum.is_cancelled() or \
+            self._weights_sum.is_cancelled()
+
+    def copy(self):
+        copied_aggregate = super().copy()
+        copied_aggregate._weighted_sum = copy.copy(self._weighted_sum)
+        copied_aggregate._weights_sum = copy.copy(self._weights_sum)
+        return copied_aggregate
+
+    def get_value(self):
+        if not self._count:
+            return None
+        weights_sum = self._weights_sum.get_value()
+        if not weights_sum:
+            err_msg = "Weights of items add up to zero"
+            raise ValueError(err_msg)
+        return self._weighted_sum.get_value()/weights_sum
+
+
+class QuantileAggregate(Aggregate):
+    '''Keeps sketch estimating quantile of priorities of items
+
+    Sketch cannot forget priorities, removing item makes aggregate
+    outdated until created again from remaining items.'''
+    def __init__(self, records=(), fraction=0.5, error=0.01):
+        self._fraction = fraction
+        self._sketch = sketch.QuantileSketch(error)
+        self._outdated = False
+        super().__init__(records)
+
+    def add(self, seq, _item):
+        super().add(seq, _item)
+        self._sketch.update(_item.get_priority())
+
+    def remove(self, seq, _item):
+        super().remove(seq, _item)
+        self._outdated = True
+
+    def copy(self):
+        copied_aggregate = super().copy()
+        copied_aggregate._sketch = self._sketch.copy()
+        return copied_aggregate
+
+    def get_sketch(self):
+        '''Gets sketch of priorities of items'''
+        return self._sketch
+
+    def get_value(self):
+        if not self._count:
+            return None
+        return self._sketch.get_quantile(self._fraction)
+
+    def is_outdated(self):
+        return self._outdated
+
+
+class MinAggregate(Aggregate):
+    '''Keeps minimum of priorities of items in heap
+
+    Removed items stay in heap until they reach its top, they are then
+    discarded(lazy deletion).'''
+    def __init__(self, records=()):
+        self._heap = []
+        # Maps sequence number of item to version of its heap entry.
+        # Entries whose version is not current belong to removed items.
+        self._versions = {}
+        self._version = 0
+        super().__init__(records)
+
+    def _to_priority(self, priority):
+        # Returns priority as compared by heap.
+        return priority
+
+    def _from_priority(self, priority):
+        return priority
+
+    def add(self, seq, _item):
+        super().add(seq, _item)
+        self._version += 1
+        self._versions[seq] = self._version
+        entry = (self._to_priority(_item.get_priority()), seq, self._version)
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, seq, _item):
+        super().remove(seq, _item)
+        del self._versions[seq]
+        if len(self._heap) > 2 * len(self._versions) + 32:
+            # Drops entries of removed items once they dominate heap.
+            self._heap = [entry for entry in self._heap
+                if self._versions.get(entry[1]) == entry[2]]
+            heapq.heapify(self._heap)
+
+    def copy(self):
+        copied_aggregate = super().copy()
+        copied_aggregate._heap = list(self._heap)
+        copied_aggregate._versions = dict(self._versions)
+        return copied_aggregate
+
+    def get_value(self):
+        heap = self._heap
+        while heap and self._versions.get(heap[0][1]) != heap[0][2]:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return self._from_priority(heap[0][0])
+
+
+class MaxAggregate(MinAggregate):
+    '''Keeps maximum of priorities of items in heap'''
+    def _to_priority(self, priority):
+        return Descending(priority)
+
+    def _from_priority(self, priority):
+        return priority.value
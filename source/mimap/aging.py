@@ -0,0 +1,205 @@
+from mimap import block
+from mimap import columns
+
+import random
+
+
+class AgingBlock(block.Block):
+    '''Block whose items priorities change with time at the same rate.
+
+    Instances of this class keep priority offset shared by all items
+    instead of changing priority of each item. Priority stored by item
+    is its base priority, effective priority is base priority plus
+    offset and is only calculated when read. Aging block only changes
+    the offset which takes the same time regardless of number of items.
+
+    Items added after block aged get base priority of their priority
+    minus offset, that way items waiting longer get more aged priorities.
+    Shifting all priorities by the same offset keeps their order which
+    means items are not sorted again because of aging.
+
+    Priorities need to be numbers. `rate` is change of priority per unit
+    of time passed to `age()`. Default rate is negative which makes
+    priorities smaller(higher priority) while items wait.
+
+    Methods of this class take and return effective priorities except
+    for item objects which keep their base priorities.'''
+
+    def __init__(self, items, priority=block.Block._default_priority,
+    rate=-1, **kwargs):
+        '''
+        items: Iterator
+            Collection of Item objects
+        priority: Any
+            Number used as priority for block, default: None.
+        rate: Number
+            Change of items priorities per unit of time, default: -1.
+        **kwargs:
+            Other arguments accepted by Block except `key`.
+        '''
+        if kwargs.get("key") is not None:
+            err_msg = "'key' is not supported by {}"
+            raise ValueError(err_msg.format(self.__class__.__name__))
+        # Offset needs to exist before items are setup.
+        self._offset = 0
+        self._rate = rate
+        super().__init__(items, priority, **kwargs)
+
+    def _shift(self, priority):
+        # Converts effective priority to base priority.
+        if priority is None:
+            return None
+        return priority - self._offset
+
+    def _prepare_items(self, items, priority):
+        # Stores base priorities of items added after block aged.
+        new_items = super()._prepare_items(items, priority)
+        if self._offset:
+            new_items = self._copy_items(new_items)
+            for new_item in new_items:
+                new_item.set_priority(self._shift(new_item.get_priority()))
+        return new_items
+
+    def _blend_priority(self, priority):
+        # Effective priority is blended with block priority.
+        return self._shift(super()._blend_priority(priority + self._offset))
+
+    def get_offset(self):
+        '''Gets offset added to base priorities of items'''
+        return self._offset
+
+    def get_rate(self):
+        '''Gets change of priorities per unit of time'''
+        return self._rate
+
+    def set_rate(self, rate):
+        '''Sets change of priorities per unit of time'''
+        self._rate = rate
+
+    def age(self, delta=1):
+        '''Ages priorities of all items by delta units of time'''
+        self._offset += self._rate * delta
+        self._notify_parents()
+
+    def get_effective_priority(self, _item):
+        '''Gets priority of item stored by block including offset'''
+        return _item.get_priority() + self._offset
+
+    def _get_nested_priority(self, nested_block):
+        # Item containing nested block gets its priority as effective one.
+        return self._shift(super()._get_nested_priority(nested_block))
+
+    def set_item_priority(self, _item, priority):
+        '''Sets effective priority for item stored by block'''
+        super().set_item_priority(_item, self._shift(priority))
+
+    def get_priority(self):
+        '''Gets priority for block'''
+        _priority = super().get_priority()
+        if self._priority_provided or _priority is None:
+            return _priority
+        # Priority calculated from base priorities shifts with them.
+        if self._priority_mode in self._sum_priority_modes:
+            # Each item adds its own offset to sum.
+            return _priority + self._offset * len(self)
+        return _priority + self._offset
+
+    def get_priorities(self):
+        '''Gets effective priorities of block item objects'''
+        return [_item.get_priority() + self._offset
+            for _item in self._items]
+
+    def get_items_by_priority(self, priority):
+        '''Gets item objects matching effective priority'''
+        return super().get_items_by_priority(self._shift(priority))
+
+    def get_items_by_priorities(self, priorities):
+        '''Gets item objects matching any of effective priorities'''
+        priorities = [self._shift(priority) for priority in priorities]
+        return super().get_items_by_priorities(priorities)
+
+    def _find_priority_range(self, start, end):
+        return super()._find_priority_range(self._shift(start), 
+            self._shift(end))
+
+    def get_items_by_priority_ranges(self, ranges):
+        '''Gets item objects for each of effective priority ranges'''
+        ranges = [(self._shift(start), self._shift(end))
+            for start, end in ranges]
+        return super().get_items_by_priority_ranges(ranges)
+
+    def aggregate_range(self, start=None, end=None, mode="mean"):
+        '''Aggregates effective priorities of items within range'''
+        start, end = self._shift(start), self._shift(end)
+        value = super().aggregate_range(start, end, mode)
+        if value is None or mode == "count" or not self._offset:
+            return value
+        if mode in self._sum_priority_modes:
+            # Each item adds its own offset to sum.
+            return value + self._offset * \
+                super().aggregate_range(start, end, "count")
+        return value + self._offset
+
+    def get_items_by_priority_batch(self, priorities):
+        '''Gets item objects matching each of effective priorities'''
+        priorities = [self._shift(priority) for priority in priorities]
+        return super().get_items_by_priority_batch(priorities)
+
+    def _get_priority_group(self, priority):
+        return super()._get_priority_group(self._shift(priority))
+
+    def _get_group_priorities(self):
+        return [priority + self._offset 
+            for priority in super()._get_group_priorities()]
+
+    def _get_priority_groups(self):
+        for priority, items in super()._get_priority_groups():
+            yield priority + self._offset, items
+
+    def sample(self, k=1, weighted=True, rng=None):
+        '''Draws k random items weighted by effective priorities
+
+        Offset adds the same weight to each item. Positive offset is
+        drawn as uniform choice of item in proportion to its share of
+        weights. With negative offset, items drawn by base priorities are
+        kept in proportion of their effective priorities.'''
+        if not weighted or not self._offset:
+            return super().sample(k, weighted, rng)
+        if rng is None:
+            rng = random
+        weight_index = self._get_weight_index()
+        base_total = weight_index.get_total()
+        total = base_total + self._offset * len(weight_index)
+        if not len(weight_index):
+            return []
+        if total <= 0:
+            err_msg = "Priorities of items add up to zero"
+            raise ValueError(err_msg)
+        items = self._items
+        sampled_items = []
+        while len(sampled_items) < k:
+            if self._offset > 0 and rng.random() * total >= base_total:
+                sampled_items.append(rng.choice(items))
+                continue
+            _item = weight_index.find(rng.random() * base_total)
+            if self._offset < 0:
+                effective_priority = self.get_effective_priority(_item)
+                if effective_priority < 0:
+                    err_msg = "Priority used as weight cant be negative '{}'"
+                    raise ValueError(err_msg.format(effective_priority))
+                if rng.random() * _item.get_priority() >= effective_priority:
+                    continue
+            sampled_items.append(_item)
+        return sampled_items
+
+    def to_tuple(self):
+        '''Returns tuple form of block with effective priorities'''
+        return tuple((self.get_effective_priority(_item), _item.get_object())
+            for _item in self.get_sorted_items())
+
+    def to_columns(self):
+        '''Returns sorted effective priorities and objects as sequences'''
+        sorted_items = self.get_sorted_items()
+        priorities = columns.to_array(self.get_effective_priority(_item)
+            for _item in sorted_items)
+        return priorities, self.extract_objects_from_items(sorted_items)
@@ -1,8 +1,44 @@
+from mimap import aggregate
+from mimap import columns
+from mimap import index
 from mimap import item
+from mimap import mapping
+from mimap import memory
+from mimap import parallel
+from mimap import profiling
+from mimap import query
+from mimap import reference
+from mimap import sketch
 from mimap.priority import Priority
+from mimap.priority import SharedPriority
 
-from collections import defaultdict
+from collections import namedtuple
 from queue import PriorityQueue
+import contextlib
+import copy
+import heapq
+import random
+import time
+import weakref
+
+
+# Items changed by Block.update_from().
+UpdateSummary = namedtuple("UpdateSummary", ["added", "removed", "changed"])
+
+
+class _Evictions():
+    # Tells blocks sharing weakly referenced objects when they are freed.
+    def __init__(self, _block):
+        self._blocks = weakref.WeakSet([_block])
+
+    def add(self, _block):
+        # Block also receives weakref objects of freed objects.
+        self._blocks.add(_block)
+
+    def notify(self, ref):
+        # Called with weakref object when its object is freed.
+        for _block in list(self._blocks):
+            _block._dead_refs.append(ref)
 
 
 class BaseBlock():
@@ -23,9 +59,17 @@ class BaseBlock():
         # Non item objects will  result in item objects.
         return  [item.Item.to_item(_item) for _item in _items_like]
 
+    def _copy_items(self, items):
+        # Copies items recording the copies on this block.
+        started = profiling.enabled and profiling.start()
+        copied_items = [_item.copy() for _item in items]
+        if started:
+            profiling.record(self, "copies", len(copied_items), started)
+        return copied_items
+
     def copy_items(self):
         # Copies current items of block
-        return [_item.copy() for _item in self._items]
+        return self._copy_items(self._items)
 
     def get_items(self):
         # Returns items stored in block object
@@ -47,9 +91,12 @@ class BaseBlock():
 
     def filter_items(self, key=None, limit=None):
         '''Filters item objects filtered by key function'''
+        started = profiling.enabled and profiling.start()
         filtered_items = list(filter(key, self._items))
         if limit != None:
             filtered_items = filtered_items[:limit]
+        if started:
+            profiling.record(self, "scans", len(self._items), started)
         return filtered_items
 
     def __iter__(self):
@@ -80,7 +127,43 @@ class Block(BaseBlock):
     
     When `strict` is True, block instance will not allow item containing
     another block. This is by default set to True to avoid confusion
-    but can be set to True to allow nested block instances.'''
+    but can be set to True to allow nested block instances.
+    
+    `key` maps each item priority to key used for sorting, searching and
+    calculating median. Keys are computed once and cached by the block,
+    set priorities of items through block or call `refresh_index()` after
+    changing them. `reverse` sorts items from highest to lowest key.
+    `tie_breaker` maps item to secondary key for ordering items with 
+    equal keys which otherwise keep their original order.
+    
+    Priority calculated from items is kept current as items change.
+    Sum, mean, weighted mean, min and max of priorities are updated one
+    item at a time while median and percentiles are read from sorted
+    items. `priority_mode` of 'percentile:<p>' uses priority at `p`
+    percent of sorted items, 'weighted_mean' weights priorities with
+    `weight(item)`.
+    
+    Approximate modes 'median~' and 'percentile~:<p>' estimate priority
+    from sketch of priorities which keeps few of them in memory. Rank of
+    estimated priority is within `sketch_error` times number of items
+    of the exact one.
+    
+    `workers` splits checking and sorting of items into chunks processed
+    by threads and then merges sorted chunks. Workers are only used on
+    free-threaded python builds, elsewhere items are sorted by current
+    thread as processes made sorting slower(0.54x to 0.87x the speed for
+    300k items with 4 workers). This only pays off for very large number
+    of items.
+    
+    Items can be added and removed after block is created. Priority for
+    block calculated from items is updated when items change.
+    
+    With `link_nested`, items containing nested blocks take priorities
+    of those blocks and follow them as they change. Nested block keeps
+    links to blocks containing it and marks its items there when its
+    priority changes, marked items are updated when block is next used.
+    Change of nested block then only updates blocks on its path to the
+    outermost block.'''
     # Default priority when priority not provided.
     _default_priority = Priority.get_default_value()
 
@@ -89,15 +172,40 @@ class Block(BaseBlock):
     _median_priority_modes = {"median"}
     _min_priority_modes = {"min"}
     _max_priority_modes = {"max"}
+    _sum_priority_modes = {"sum"}
+    _weighted_priority_modes = {"weighted_mean"}
+    # Percentile mode is prefix followed by percent e.g 'percentile:90'.
+    _percentile_priority_prefix = "percentile:"
+    # Approximate modes estimate percentiles from sketch of priorities.
+    _approximate_median_priority_modes = {"median~"}
+    _approximate_percentile_priority_prefix = "percentile~:"
     _priority_modes = {
         *_average_priority_modes,
         *_median_priority_modes,
         *_min_priority_modes,
-        *_max_priority_modes
+        *_max_priority_modes,
+        *_sum_priority_modes,
+        *_weighted_priority_modes,
+        *_approximate_median_priority_modes,
+        _percentile_priority_prefix + "<p>",
+        _approximate_percentile_priority_prefix + "<p>"
+    }
+    # Modes of aggregating priorities of items within range.
+    _range_modes = {
+        "count",
+        *_average_priority_modes,
+        *_median_priority_modes,
+        *_min_priority_modes,
+        *_max_priority_modes,
+        *_sum_priority_modes,
+        _percentile_priority_prefix + "<p>"
     }
 
     def __init__(self, items, priority=_default_priority, _type=object, 
-    strict=True, priority_mode=None, update_priorities=True):
+    strict=True, priority_mode=None, update_priorities=True, key=None,
+    reverse=False, tie_breaker=None, workers=None, weight=None,
+    sketch_error=0.01, weak=False, ttl=None, clock=None,
+    intern_priorities=False, link_nested=False):
         '''
         items: Iterator
             Collection of Item objects
@@ -114,13 +222,66 @@ class Block(BaseBlock):
             'median'.
         update_priorities: Bool
             Enables and disables updating of block and items priorities.
+        key: Callable
+            Maps priority to comparable key used for sorting, default: None.
+        reverse: Bool
+            Sorts items from highest to lowest priority, default: False.
+        tie_breaker: Callable
+            Maps item to secondary key for ordering items with equal keys.
+        workers: Int
+            Number of workers for checking and sorting items, default: None.
+        weight: Callable
+            Maps item to weight for 'weighted_mean' mode, default: None.
+        sketch_error: Float
+            Rank error of approximate modes relative to number of items,
+            default: 0.01.
+        weak: Bool
+            Keeps weak references to objects of items, items are removed
+            once their objects are garbage collected, default: False.
+        ttl: Float
+            Time items live after being added, default: None(forever).
+        clock: Callable
+            Returns current time used for expiring items, default:
+            time.monotonic.
+        intern_priorities: Bool
+            Stores each distinct priority once sharing it with copies
+            of items having that priority, default: False.
+        link_nested: Bool
+            Items containing nested blocks follow priorities of those
+            blocks, default: False.
         '''
+        # Items may be iterator which can only be consumed once.
+        items = list(items)
         super().__init__(items, _type)
-        self._items = items
         self._strict = strict
         self._type = _type
         self._strict = strict
         self._update_priorities = update_priorities
+        self._key = key
+        self._reverse = reverse
+        self._tie_breaker = tie_breaker
+        self._workers = workers
+        self._weight = weight
+        self._sketch_error = sketch_error
+        self._weak = weak
+        # Weakref objects of freed objects wait here to be removed.
+        self._dead_refs = []
+        self._evictions = _Evictions(self) if weak else None
+        self._ttl = ttl
+        self._clock = time.monotonic if clock is None else clock
+        # Maps priorities to priority objects shared by items.
+        self._interned = {} if intern_priorities else None
+        self._link_nested = link_nested
+        # Blocks containing this block mapped to sequence numbers of
+        # their items containing it, created when first linked.
+        self._parents = None
+        # Sorted index is created when first needed.
+        self._index = None
+        # Changes made within batch() are recorded for undoing them.
+        self._journal = None
+        # Block priority is calculated from items unless provided.
+        self._priority_provided = priority != self._default_priority
+        self._priority_outdated = False
         # Calling methods with initializer causes problems.
         # Thats why super().__init__() is fist call to __init__().
         self._setup_priority_mode(priority_mode)
@@ -134,15 +295,31 @@ class Block(BaseBlock):
         # have been modified.
         # This are results of calling methods within initialiser.
         self._setup_items(items, priority)
+        if weak:
+            # Original items would keep their objects alive.
+            self._original_items = None
+        if ttl is not None:
+            expiry = self._clock() + ttl
+            self._setup_expiries([expiry] * len(self._entries))
         # Calling method within initializer is hell.
         # The instance is not yet fully created.
         # Warning has been included on the methods called by __init__().
+        if self._workers:
+            # Sorting is the part workers are meant for.
+            self._get_index()
 
     def _setup_priority(self, priority):
         # Setup priority from average of items priorities.
         # Default priority is already set by super class.
         # This method is not meant to be overiden(take care)
         if priority == self._default_priority:
+            if self._percentile is not None and not self._approximate \
+                and self._entries:
+                # Priority at percentile is read from sorted index when
+                # first needed. Items are then sorted once for both.
+                self._priority = self._default_priority
+                self._priority_outdated = True
+                return
             # Priority was suppossed to be calculated from average.
             # But priority can be non number(that makes it impossible).
             # Median is used here to calculate priority for block.
@@ -150,15 +327,9 @@ class Block(BaseBlock):
             priorities = [_item.get_priority() for _item in self._items]
             # Empty priorities wont work(rather be default one)
             if priorities:
-                if self._priority_mode in self._median_priority_modes:
-                    # Calculates priority from median(midpoint).
-                    # This is based on position other than values.
-                    # It will work even if priorities are non numbers.
-                    priorities.sort(reverse=False)
-                    # Get midpoint index of priorities list
-                    median_index = round((len(priorities)-1)/2)
-                    # Use the index to find meadin priority.
-                    _priority = priorities[median_index]
+                if self._approximate:
+                    # Percentile is estimated from sketch of priorities.
+                    _priority = self._create_aggregate().get_value()
                 elif self._priority_mode in self._average_priority_modes:
                     # Calculates avarage of priorities.
                     # Priorities needs to be numbers to work.
@@ -169,6 +340,13 @@ class Block(BaseBlock):
                 elif self._priority_mode in self._max_priority_modes:
                     # Maximum of priorities is used as block priority.
                     _priority = max(priorities)
+                elif self._priority_mode in self._sum_priority_modes:
+                    # Sum of priorities is used as block priority.
+                    _priority = sum(priorities)
+                elif self._priority_mode in self._weighted_priority_modes:
+                    # Priorities are weighted by weights of their items.
+                    _priority = aggregate.WeightedMeanAggregate(
+                        enumerate(self._items), self._weight).get_value()
                 else:
                     err_msg = "priority_mode should one of {} not '{}'"
                     err_msg = err_msg.format(
@@ -190,33 +368,66 @@ class Block(BaseBlock):
         # Item objects will be created when neccessary.
         # This could make find bugs hard but it simplifies things.
         # This method is not meant to be overiden(take care)
-        new_items = []
-        for _item in items:
-            new_item = item.Item.to_item(_item)
-            # Gets object underlying item.
-            _object = new_item.get_object()
+        for seq in list(self._nested_blocks):
+            self._unlink_item(seq)
+        self._items = self._prepare_items(items, priority)
+        if self._blends_priorities():
+            for seq, _item in self._entries.items():
+                self._blend_item(seq, _item)
+        if self._interned is not None:
+            for _item in self._entries.values():
+                self._intern_priority(_item)
+        if self._link_nested:
+            for seq, _item in self._entries.items():
+                self._link_item(seq, _item)
+
+    def _prepare_item(self, _item):
+        # Returns item object for item after checking its type.
+        new_item = item.Item.to_item(_item)
+        # Gets object underlying item.
+        _object = new_item.get_object()
+        if isinstance(_object, Block):
             # Check if strict is respected(Block objects not allowed).
             # Exception is raised if not respected.
-            if self._strict and isinstance(_object, Block):
+            if self._strict:
                 err_msg = "Nested Block objects not allowed when " +\
                     "'strict' is enabled"
                 raise TypeError(err_msg)
-            # Check if type for object is correct.
-            # Exception is if type of object does not match expected one.
-            if not isinstance(_object, self._type):
-                err_msg = "Item should have reference of type '{}' not '{}'"
-                type_name = _object.__class__.__name__
-                err_msg = err_msg.format(self._type.__name__, type_name)
-                raise TypeError(err_msg)
-            # Appends new item to items list
-            new_items.append(new_item)
+            if self._link_nested:
+                nested_priority = _object.get_priority()
+                if nested_priority != self._default_priority:
+                    # Item follows priority of nested block.
+                    new_item = item.Item(new_item.get_reference(), 
+                        nested_priority)
+        # Check if type for object is correct.
+        # Exception is if type of object does not match expected one.
+        if not isinstance(_object, self._type):
+            err_msg = "Item should have reference of type '{}' not '{}'"
+            type_name = _object.__class__.__name__
+            err_msg = err_msg.format(self._type.__name__, type_name)
+            raise TypeError(err_msg)
+        if self._weak:
+            # Block gets told when object is garbage collected.
+            _reference = reference.WeakReference(_object, 
+                self._evictions.notify)
+            new_item = item.Item(_reference, new_item.get_priority())
+        return new_item
+
+    def _prepare_items(self, items, priority):
+        # Returns item objects ready to be stored by block.
+        # Items are copied if their priorities will be updated.
+        def prepare_chunk(chunk):
+            return [self._prepare_item(_item) for _item in chunk]
+        new_items = parallel.map_chunks(prepare_chunk, list(items), 
+            self._workers)
         if self._update_priorities and priority != None:
             # Copies items to avoid modifying original ones.
-            copied_items = [_item.copy() for _item in new_items]
-            self._items = self._update_items_priorities(copied_items,
-            priority)
-        else:
-            self._items = new_items
+            # Their priorities are blended when they are stored.
+            return self._copy_items(new_items)
+        if self._interned is not None:
+            # Priorities of copies are shared instead of original ones.
+            return self._copy_items(new_items)
+        return new_items
 
     def _setup_priority_mode(self, priority_mode):
         # This method is not meant to be overiden(take care)
@@ -226,25 +437,102 @@ class Block(BaseBlock):
             self._priority_mode = list(self._median_priority_modes)[0]
         else:
             self._priority_mode = priority_mode
+        # Percent of sorted items below priority for block.
+        # Its None for modes not based on position of items.
+        self._percentile = None
+        self._approximate = self._priority_mode in \
+            self._approximate_median_priority_modes
+        if self._approximate or \
+            self._priority_mode in self._median_priority_modes:
+            self._percentile = 50
+        elif isinstance(self._priority_mode, str):
+            for prefix, approximate in [
+                (self._percentile_priority_prefix, False),
+                (self._approximate_percentile_priority_prefix, True)]:
+                if self._priority_mode.startswith(prefix):
+                    self._approximate = approximate
+                    self._percentile = self._parse_percentile(
+                        self._priority_mode[len(prefix):], 
+                        self._priority_mode)
 
-    def _update_items_priorities(self, items, block_priority):
-        # Updates items priorities with ones calculated from block priority.
-        if block_priority == self._default_priority:
-            # No updating items priorities when block priority is not
-            # provided(being None).
-            return items
-        updated_items = []
-        for _item in items:
-            # Copies item object(avoid modifying original object)
-            new_item_priority =  _item.get_priority()
-            if self._priority_mode in self._average_priority_modes:
-                # New priority is between item and block priorities.
-                # Average is the best as it satisfies both block and item 
-                # priorities equally.
-                new_priority = (self._priority + new_item_priority)/2
-                _item.set_priority(new_priority)
-            updated_items.append( _item)
-        return updated_items
+    def _parse_percentile(self, text, mode):
+        # Returns percentile from text following percentile mode prefix.
+        try:
+            percentile = float(text)
+        except ValueError:
+            percentile = -1
+        if not 0 <= percentile <= 100:
+            err_msg = "Percentile of priority_mode '{}' should be " +\
+                "number from 0 to 100"
+            raise ValueError(err_msg.format(mode))
+        return percentile
+
+    def _get_percentile_rank(self, count, percentile=None):
+        # Returns position of percentile within count sorted items.
+        if percentile is None:
+            percentile = self._percentile
+        return round((count-1)*percentile/100)
+
+    def _create_aggregate(self):
+        # Creates running aggregate of items priorities for priority mode.
+        records = self._entries.items()
+        if self._approximate:
+            return aggregate.QuantileAggregate(records, self._percentile/100,
+                self._sketch_error)
+        elif self._priority_mode in self._average_priority_modes:
+            return aggregate.MeanAggregate(records)
+        elif self._priority_mode in self._sum_priority_modes:
+            return aggregate.SumAggregate(records)
+        elif self._priority_mode in self._weighted_priority_modes:
+            return aggregate.WeightedMeanAggregate(records, self._weight)
+        elif self._priority_mode in self._min_priority_modes:
+            return aggregate.MinAggregate(records)
+        elif self._priority_mode in self._max_priority_modes:
+            return aggregate.MaxAggregate(records)
+        err_msg = "priority_mode should one of {} not '{}'"
+        raise ValueError(err_msg.format(self._priority_modes, 
+            self._priority_mode))
+
+    def _calculate_priority(self):
+        # Calculates priority for block from items changed after creation.
+        # Sorted index and running aggregate are updated with each item
+        # and created when first needed.
+        if self._percentile is not None and not self._approximate:
+            rank = self._get_percentile_rank(len(self._entries))
+            return self._get_index().get_item_at(rank).get_priority()
+        if self._aggregate is None or self._aggregate.is_outdated():
+            started = profiling.enabled and profiling.start()
+            self._aggregate = self._create_aggregate()
+            if started:
+                profiling.record(self, "scans", len(self._entries), started)
+        return self._aggregate.get_value()
+
+    def _blends_priorities(self):
+        # Checks if priorities of stored items are blended with provided
+        # block priority.
+        return self._update_priorities and self._priority_provided and \
+            self._priority_mode in self._average_priority_modes
+
+    def _blend_priority(self, priority):
+        # Returns priority between item and block priorities.
+        # Average is the best as it satisfies both block and item 
+        # priorities equally.
+        return (self._priority + priority)/2
+
+    def _blend_item(self, seq, _item):
+        # Blends priority of item not yet indexed with block priority.
+        # Priority item had is kept to blend it again on set_priority().
+        base_priority = _item.get_priority()
+        _item.set_priority(self._blend_priority(base_priority))
+        self._base_priorities[seq] = (base_priority, _item.get_priority())
+
+    def _get_base_priority(self, seq, _item):
+        # Returns priority of stored item before it was blended.
+        # Item whose priority was set afterwards keeps that priority.
+        record = self._base_priorities.get(seq)
+        if record is not None and record[1] == _item.get_priority():
+            return record[0]
+        return _item.get_priority()
 
     def _should_update_block_priority(self):
         # Checks if block priority should be updated.
@@ -262,18 +550,811 @@ class Block(BaseBlock):
         '''Returns items sorted by their priorities'''
         return sorted(items, key=lambda _item: _item.get_priority())
 
+    def _get_index(self):
+        # Returns sorted index of items creating it when necessary.
+        self._prune()
+        if self._index is None:
+            if profiling.enabled:
+                profiling.record(self, "index_misses")
+            started = profiling.enabled and profiling.start()
+            self._index = index.SortedIndex(self._entries.values(), 
+            self._key, self._tie_breaker, self._entries.keys(), 
+            self._workers)
+            if started:
+                profiling.record(self, "sorts", len(self._index), started)
+        elif profiling.enabled:
+            profiling.record(self, "index_hits")
+        return self._index
+
+    def _get_hash_index(self):
+        # Returns hash index of items priorities creating it when necessary.
+        # TypeError is raised if priorities are not hashable.
+        self._prune()
+        if self._hash_index is None:
+            if profiling.enabled:
+                profiling.record(self, "index_misses")
+            self._hash_index = index.HashIndex(self._entries.values(), 
+                self._entries.keys())
+        elif profiling.enabled:
+            profiling.record(self, "index_hits")
+        return self._hash_index
+
+    def _get_heap_index(self):
+        # Returns heaps of first and last items creating them if necessary.
+        self._prune()
+        if self._heap_index is None:
+            if profiling.enabled:
+                profiling.record(self, "index_misses")
+            self._heap_index = index.HeapIndex(self._entries.values(), 
+                self._key, self._tie_breaker, self._entries.keys(),
+                self._reverse)
+        elif profiling.enabled:
+            profiling.record(self, "index_hits")
+        return self._heap_index
+
+    def _get_weight_index(self):
+        # Returns weights of items for drawing them creating if necessary.
+        self._prune()
+        if self._weight_index is None:
+            if profiling.enabled:
+                profiling.record(self, "index_misses")
+            self._weight_index = index.WeightIndex(self._entries.values(), 
+                self._entries.keys())
+        elif profiling.enabled:
+            profiling.record(self, "index_hits")
+        return self._weight_index
+
+    def _get_sum_index(self):
+        # Returns sums of priorities by their keys creating if necessary.
+        self._prune()
+        if self._sum_index is None:
+            if profiling.enabled:
+                profiling.record(self, "index_misses")
+            self._sum_index = index.SumIndex(self._entries.values(), 
+                self._key)
+        elif profiling.enabled:
+            profiling.record(self, "index_hits")
+        return self._sum_index
+
+    @property
+    def _items(self):
+        # Items in order they were added to block.
+        # Items are stored by their sequence numbers which allows them
+        # to be removed without shifting other items.
+        self._prune()
+        if self._items_list is None:
+            self._items_list = list(self._entries.values())
+        return self._items_list
+
+    @_items.setter
+    def _items(self, items):
+        # Replaces all items of block.
+        self._entries = dict(enumerate(items))
+        self._next_seq = len(self._entries)
+        # Sequence numbers of items are mapped when first needed.
+        self._item_seqs = None
+        self._items_list = None
+        self._index = None
+        self._hash_index = None
+        self._heap_index = None
+        self._weight_index = None
+        self._sum_index = None
+        self._aggregate = None
+        self._weak_seqs = None
+        # Maps keys of objects to sequence numbers of their items.
+        self._object_seqs = None
+        self._object_key = None
+        # Maps sequence numbers of items to their expiry times.
+        # Heap keeps (expiry, sequence number) of items to expire first.
+        self._expiries = {}
+        self._expiry_heap = []
+        # New items are not shared with forks of block.
+        self._shared = False
+        self._shared_seq = 0
+        self._owned_seqs = set()
+        self._replaced_items = {}
+        # Nested blocks of items linked to this block.
+        self._nested_blocks = {}
+        self._outdated_nested = set()
+        # Maps sequence numbers of items to their priorities before and
+        # after being blended with block priority.
+        self._base_priorities = {}
+
+    def _get_weak_seqs(self):
+        # Maps weakref objects of items to their sequence numbers.
+        if self._weak_seqs is None:
+            self._weak_seqs = {id(_item.get_reference().get_ref()): seq
+                for seq, _item in self._entries.items()}
+        return self._weak_seqs
+
+    def _setup_expiries(self, expiries):
+        # Sets expiry times of items in order they were added.
+        for seq, expiry in zip(self._entries, expiries):
+            if expiry is not None:
+                self._expiries[seq] = expiry
+                self._expiry_heap.append((expiry, seq))
+        heapq.heapify(self._expiry_heap)
+
+    def _set_expiry(self, seq, expiry):
+        # Sets expiry time of item, None if item never expires.
+        # Previous entry of item in heap is discarded when reached.
+        self._unshare()
+        if self._journal is not None:
+            self._journal.append(("expiry", seq, self._entries[seq],
+                self._expiries.get(seq)))
+        if expiry is None:
+            self._expiries.pop(seq, None)
+        else:
+            self._expiries[seq] = expiry
+            heapq.heappush(self._expiry_heap, (expiry, seq))
+
+    def _expire(self):
+        # Removes items whose expiry times have passed.
+        now = self._clock()
+        if self._expiry_heap[0][0] > now:
+            return
+        self._unshare()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expiry, seq = heapq.heappop(heap)
+            if self._expiries.get(seq) == expiry:
+                self._delete_item(seq)
+
+    def _prune(self):
+        # Removes items whose objects were garbage collected or expired.
+        # Items are kept within batch() as they may be restored.
+        if self._journal is not None:
+            return
+        if self._dead_refs:
+            dead_refs, self._dead_refs = self._dead_refs, []
+            weak_seqs = self._get_weak_seqs()
+            for ref in dead_refs:
+                seq = weak_seqs.get(id(ref))
+                # Weakref may belong to item removed or not owned by block.
+                _item = self._entries.get(seq)
+                if _item is not None and \
+                    _item.get_reference().get_ref() is ref:
+                    self._delete_item(seq)
+        if self._expiry_heap:
+            self._expire()
+        if self._outdated_nested:
+            self._update_nested()
+
+    def _link_item(self, seq, _item):
+        # Links nested block of item to this block as its parent.
+        nested_block = _item.get_object()
+        if not isinstance(nested_block, Block):
+            return
+        self._nested_blocks[seq] = nested_block
+        if nested_block._parents is None:
+            nested_block._parents = weakref.WeakKeyDictionary()
+        nested_block._parents.setdefault(self, set()).add(seq)
+
+    def _unlink_item(self, seq):
+        # Removes link of nested block of item to this block.
+        nested_block = self._nested_blocks.pop(seq, None)
+        if nested_block is None:
+            return
+        seqs = nested_block._parents.get(self)
+        if seqs is not None:
+            seqs.discard(seq)
+            if not seqs:
+                del nested_block._parents[self]
+
+    def _notify_parents(self):
+        # Tells blocks containing this block that its priority changed.
+        if self._parents:
+            for parent, seqs in list(self._parents.items()):
+                parent._nested_changed(seqs)
+
+    def _nested_changed(self, seqs):
+        # Marks items whose nested blocks changed their priorities.
+        # Blocks containing this one were told when items got marked.
+        if seqs <= self._outdated_nested:
+            return
+        self._outdated_nested.update(seqs)
+        self._items_changed()
+
+    def _get_nested_priority(self, nested_block):
+        # Returns priority for item containing nested block.
+        nested_priority = nested_block.get_priority()
+        if nested_priority == self._default_priority:
+            return None
+        if self._blends_priorities():
+            # Priority is blended with block priority like on adding.
+            return (self._priority + nested_priority)/2
+        return nested_priority
+
+    def _update_nested(self):
+        # Sets priorities of items whose nested blocks changed.
+        # Nested blocks update their own items when priorities are read.
+        priorities = {seq: self._get_nested_priority(self._nested_blocks[seq])
+            for seq in self._outdated_nested if seq in self._nested_blocks}
+        self._outdated_nested = set()
+        for seq, priority in priorities.items():
+            # Items keep priorities while nested blocks are empty.
+            if priority is not None and \
+                priority != self._entries[seq].get_priority():
+                self._change_priority(seq, priority)
+
+    def _get_key_of_object(self, _object):
+        # Returns key identifying object within updates.
+        if self._object_key is None:
+            return id(_object)
+        return self._object_key(_object)
+
+    def _get_object_seqs(self, object_key):
+        # Maps keys of objects to sequence numbers of their items.
+        self._prune()
+        if self._object_seqs is None or self._object_key is not object_key:
+            self._object_key = object_key
+            self._object_seqs = {}
+            for seq, _item in self._entries.items():
+                key = self._get_key_of_object(_item.get_object())
+                self._object_seqs.setdefault(key, []).append(seq)
+        return self._object_seqs
+
+    def _find_seq(self, _item):
+        # Returns sequence number of item stored by block.
+        self._prune()
+        if self._item_seqs is None:
+            self._item_seqs = {id(stored_item): seq 
+                for seq, stored_item in self._entries.items()}
+        seq = self._item_seqs.get(id(_item))
+        if seq is not None and self._entries.get(seq) is _item:
+            return seq
+        # Item may have been copied when block was changed after fork.
+        replaced = self._replaced_items.get(id(_item))
+        if replaced is not None and replaced[0] is _item and \
+            replaced[1] in self._entries:
+            return replaced[1]
+        # Same item may have been added more than once.
+        for seq, stored_item in self._entries.items():
+            if stored_item is _item:
+                self._item_seqs[id(_item)] = seq
+                return seq
+        err_msg = "Item '{}' is not in block"
+        raise ValueError(err_msg.format(_item))
+
+    def _items_changed(self):
+        # Marks priority calculated from items as outdated.
+        if not self._priority_provided:
+            self._priority_outdated = True
+            self._notify_parents()
+
+    def _index_item(self, _item, seq):
+        # Adds item to indexes and aggregate that already exist.
+        if self._index is not None:
+            self._index.insert(_item, seq)
+        if self._hash_index is not None:
+            self._insert_hashed(_item, seq)
+        if self._heap_index is not None:
+            self._heap_index.insert(_item, seq)
+        if self._weight_index is not None:
+            self._insert_weighted(_item, seq)
+        if self._sum_index is not None:
+            self._insert_summed(_item, seq)
+        if self._aggregate is not None:
+            self._aggregate.add(seq, _item)
+        self._items_changed()
+
+    def _unindex_item(self, _item, seq):
+        # Removes item from indexes and aggregate that already exist.
+        if self._index is not None:
+            self._index.remove(_item, seq)
+        if self._hash_index is not None:
+            self._hash_index.remove(_item, seq)
+        if self._heap_index is not None:
+            self._heap_index.remove(_item, seq)
+        if self._weight_index is not None:
+            self._weight_index.remove(_item, seq)
+        if self._sum_index is not None:
+            self._sum_index.remove(_item, seq)
+        if self._aggregate is not None:
+            self._aggregate.remove(seq, _item)
+        self._items_changed()
+
+    def _unshare(self):
+        # Copies structures shared with forks before block changes them.
+        if not self._shared:
+            return
+        self._shared = False
+        self._entries = dict(self._entries)
+        if self._items_list is not None:
+            self._items_list = list(self._items_list)
+        if self._item_seqs is not None:
+            self._item_seqs = dict(self._item_seqs)
+        if self._weak_seqs is not None:
+            self._weak_seqs = dict(self._weak_seqs)
+        self._expiries = dict(self._expiries)
+        self._expiry_heap = list(self._expiry_heap)
+        self._base_priorities = dict(self._base_priorities)
+        # Keys of objects are mapped again when needed.
+        self._object_seqs = None
+        for name in ("_index", "_hash_index", "_heap_index", 
+            "_weight_index", "_sum_index", "_aggregate"):
+            structure = getattr(self, name)
+            if structure is not None:
+                setattr(self, name, structure.copy())
+
+    def _own_item(self, seq):
+        # Returns stored item after copying it if forks share it.
+        _item = self._entries[seq]
+        if seq >= self._shared_seq or seq in self._owned_seqs:
+            return _item
+        self._owned_seqs.add(seq)
+        return self._replace_item(seq)
+
+    def _replace_item(self, seq):
+        # Replaces stored item with its copy returning the copy.
+        _item = self._entries[seq]
+        copied_item = self._copy_items([_item])[0]
+        self._entries[seq] = copied_item
+        self._items_list = None
+        if self._item_seqs is not None:
+            self._item_seqs[id(copied_item)] = seq
+        # Original item can still be used to refer to its copy.
+        self._replaced_items[id(_item)] = (_item, seq)
+        return copied_item
+
+    def _intern_priority(self, _item, priority=None):
+        # Makes item share priority object with items of equal priority.
+        # Unhashable priorities are kept by item.
+        if priority is None:
+            priority = _item.get_priority()
+        try:
+            shared_priority = self._interned.get(priority)
+            if shared_priority is None:
+                shared_priority = SharedPriority(priority)
+                self._interned[priority] = shared_priority
+        except TypeError:
+            if priority is not _item.get_priority():
+                _item.set_priority_object(Priority(priority))
+            return
+        _item.set_priority_object(shared_priority)
+
+    def _insert_item(self, _item, seq=None):
+        # Stores prepared item and adds it to existing indexes.
+        # Sequence number is only provided when removed item is restored.
+        self._unshare()
+        if self._interned is not None:
+            self._intern_priority(_item)
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+            if self._items_list is not None:
+                self._items_list.append(_item)
+        else:
+            self._items_list = None
+        self._entries[seq] = _item
+        if self._item_seqs is not None:
+            self._item_seqs[id(_item)] = seq
+        if self._weak_seqs is not None:
+            self._weak_seqs[id(_item.get_reference().get_ref())] = seq
+        if self._object_seqs is not None:
+            key = self._get_key_of_object(_item.get_object())
+            self._object_seqs.setdefault(key, []).append(seq)
+        if self._journal is not None:
+            self._journal.append(("insert", seq, _item))
+        if self._link_nested:
+            self._link_item(seq, _item)
+        self._index_item(_item, seq)
+        return seq
+
+    def _delete_item(self, seq):
+        # Removes item with sequence number from block and its indexes.
+        self._unshare()
+        _item = self._entries.pop(seq)
+        if self._item_seqs is not None and \
+            self._item_seqs.get(id(_item)) == seq:
+            del self._item_seqs[id(_item)]
+        if self._weak_seqs is not None:
+            self._weak_seqs.pop(id(_item.get_reference().get_ref()), None)
+        if self._object_seqs is not None:
+            key = self._get_key_of_object(_item.get_object())
+            seqs = self._object_seqs[key]
+            seqs.remove(seq)
+            if not seqs:
+                del self._object_seqs[key]
+        self._items_list = None
+        self._unlink_item(seq)
+        if self._journal is not None:
+            self._journal.append(("remove", seq, _item, 
+                self._expiries.get(seq)))
+        else:
+            # Items removed within batch() may be restored with base.
+            self._base_priorities.pop(seq, None)
+        if self._expiries.pop(seq, None) is not None and \
+            len(self._expiry_heap) > 2 * len(self._expiries) + 32:
+            # Drops entries of removed items once they dominate heap.
+            self._expiry_heap = [entry for entry in self._expiry_heap
+                if self._expiries.get(entry[1]) == entry[0]]
+            heapq.heapify(self._expiry_heap)
+        self._unindex_item(_item, seq)
+        return _item
+
+    def _change_priority(self, seq, priority, copy=False):
+        # Sets priority of stored item moving it within indexes.
+        # Item is copied first if `copy` is True.
+        self._unshare()
+        _item = self._entries[seq]
+        if self._journal is not None:
+            self._journal.append(("priority", seq, _item, 
+                _item.get_priority()))
+        self._unindex_item(_item, seq)
+        if copy:
+            _item = self._replace_item(seq)
+        else:
+            _item = self._own_item(seq)
+        if self._interned is not None:
+            self._intern_priority(_item, priority)
+        elif isinstance(_item.get_priority_object(), SharedPriority):
+            # Priority shared by items of other block stays unchanged.
+            _item.set_priority_object(Priority(priority))
+        else:
+            _item.set_priority(priority)
+        self._index_item(_item, seq)
+
+    def _insert_hashed(self, _item, seq):
+        # Inserts item into hash index discarding index if priority of
+        # item cannot be hashed.
+        try:
+            self._hash_index.insert(_item, seq)
+        except TypeError:
+            self._hash_index = None
+
+    def _insert_weighted(self, _item, seq):
+        # Inserts item into weight index discarding index if priority of
+        # item cannot be used as weight.
+        try:
+            self._weight_index.insert(_item, seq)
+        except (TypeError, ValueError):
+            self._weight_index = None
+
+    def _insert_summed(self, _item, seq):
+        # Inserts item into sum index discarding index if priority of
+        # item cannot be summed.
+        try:
+            self._sum_index.insert(_item, seq)
+        except TypeError:
+            self._sum_index = None
+
+    def _prepare_new_items(self, items):
+        # Prepares items added after block was created.
+        if self._priority_provided:
+            return self._prepare_items(items, self._priority)
+        return self._prepare_items(items, self._default_priority)
+
+    def _insert_items(self, new_items, ttl=None):
+        # Stores prepared items setting their expiry times.
+        if ttl is None:
+            ttl = self._ttl
+        if ttl is not None:
+            expiry = self._clock() + ttl
+        blends = self._blends_priorities()
+        for new_item in new_items:
+            if blends:
+                base_priority = new_item.get_priority()
+                new_item.set_priority(self._blend_priority(base_priority))
+            seq = self._insert_item(new_item)
+            if blends:
+                self._base_priorities[seq] = (base_priority, 
+                    new_item.get_priority())
+            if ttl is not None:
+                self._set_expiry(seq, expiry)
+
+    def add_items(self, items, ttl=None):
+        '''Adds items to block returning items stored by block
+
+        Items are prepared the same way as items passed to initializer
+        which means stored items may be copies of items provided. Items
+        expire after `ttl` which defaults to `ttl` of block.'''
+        new_items = self._prepare_new_items(items)
+        self._insert_items(new_items, ttl)
+        return new_items
+
+    def add_item(self, _item, ttl=None):
+        '''Adds item to block returning item stored by block'''
+        return self.add_items([_item], ttl)[0]
+
+    def remove_item(self, _item):
+        '''Removes item stored by block'''
+        self._delete_item(self._find_seq(_item))
+
+    def remove_items(self, items):
+        '''Removes items stored by block'''
+        for _item in items:
+            self.remove_item(_item)
+
+    def set_item_priority(self, _item, priority):
+        '''Sets priority for item stored by block'''
+        self._change_priority(self._find_seq(_item), priority)
+
+    def set_item_expiry(self, _item, expiry):
+        '''Sets time on clock of block when item expires
+        
+        Item never expires if expiry is None. Expired items are removed
+        when block is next used.'''
+        self._set_expiry(self._find_seq(_item), expiry)
+
+    def get_item_expiry(self, _item):
+        '''Gets time on clock of block when item expires, None if never'''
+        return self._expiries.get(self._find_seq(_item))
+
+    def update_from(self, items, object_key=None):
+        '''Updates items of block to match new collection of items
+
+        Items are matched with stored items by their objects, only items
+        whose objects are new are added, items whose objects are missing
+        are removed and matched items whose priorities differ get new
+        priorities. Changes are made within batch() which updates sorted
+        items once. Returns UpdateSummary of added, removed and changed
+        stored items.
+
+        object_key: Callable
+            Maps object to key matching it with stored object, default:
+            None(objects are matched by identity).'''
+        object_seqs = self._get_object_seqs(object_key)
+        entries = self._entries
+        # Counts items matched with stored items of each key.
+        # Objects appearing more than once are matched in order.
+        matches = {}
+        repeated_keys = []
+        candidates = []
+        inserted_items = []
+        for new_item in self._to_items(items):
+            _object = new_item.get_object()
+            key = id(_object) if object_key is None else object_key(_object)
+            position = matches.get(key, 0)
+            matches[key] = position + 1
+            seqs = object_seqs.get(key)
+            if seqs is None or position >= len(seqs):
+                inserted_items.append(new_item)
+                continue
+            if position == 0 and len(seqs) > 1:
+                repeated_keys.append(key)
+            seq = seqs[position]
+            # Stored priority may have been blended with block priority.
+            if new_item.get_priority() != self._get_base_priority(seq, 
+                entries[seq]):
+                candidates.append((seq, new_item))
+        removed_seqs = []
+        for key in object_seqs.keys() - matches.keys():
+            removed_seqs.extend(object_seqs[key])
+        for key in repeated_keys:
+            removed_seqs.extend(object_seqs[key][matches[key]:])
+        # Priorities of candidates are compared after being prepared.
+        prepared_items = self._prepare_new_items([new_item 
+            for _, new_item in candidates] + inserted_items)
+        changed_seqs = []
+        with self.batch():
+            removed_items = [self._delete_item(seq) for seq in removed_seqs]
+            blends = self._blends_priorities()
+            for (seq, _), prepared_item in zip(candidates, prepared_items):
+                priority = base_priority = prepared_item.get_priority()
+                if blends:
+                    priority = self._blend_priority(base_priority)
+                if priority != self._entries[seq].get_priority():
+                    self._change_priority(seq, priority)
+                    changed_seqs.append(seq)
+                    if blends:
+                        self._base_priorities[seq] = (base_priority,
+                            priority)
+            added_items = prepared_items[len(candidates):]
+            self._insert_items(added_items)
+        return UpdateSummary(added_items, removed_items, 
+            [self._entries[seq] for seq in changed_seqs])
+
+    def fork(self):
+        '''Creates block with the same items sharing storage with block
+
+        Forking copies nothing, block and fork share items and indexes
+        until one of them is changed. Changed block copies what it shares
+        which is much faster than creating new block. Items are copied
+        only when their priorities are set, original item can still be
+        passed to methods of block that copied it. Block and its forks
+        dont see changes made by each other.
+
+        First change after forking copies storage and indexes shared
+        with forks which takes time linear to number of items, changes
+        after that take their usual time.'''
+        if self._journal is not None:
+            err_msg = "Block cant be forked within batch()"
+            raise RuntimeError(err_msg)
+        forked_block = copy.copy(self)
+        for _block in (self, forked_block):
+            _block._shared = True
+            _block._shared_seq = self._next_seq
+            _block._owned_seqs = set()
+        forked_block._replaced_items = dict(self._replaced_items)
+        # Fork is not contained by blocks containing block.
+        forked_block._parents = None
+        forked_block._nested_blocks = {}
+        forked_block._outdated_nested = set(self._outdated_nested)
+        for seq in self._nested_blocks:
+            forked_block._link_item(seq, self._entries[seq])
+        if self._weak:
+            forked_block._dead_refs = list(self._dead_refs)
+            self._evictions.add(forked_block)
+        return forked_block
+
+    def __getstate__(self):
+        # Weak links to blocks containing this block cant be pickled.
+        # Containing blocks link their nested blocks again when loaded.
+        state = self.__dict__.copy()
+        state["_parents"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for seq in list(self._nested_blocks):
+            self._link_item(seq, self._entries[seq])
+
+    def _undo(self, journal):
+        # Undoes changes recorded in journal starting from the last one.
+        restored = False
+        for record in reversed(journal):
+            operation, seq, _item = record[:3]
+            if operation == "insert":
+                self._delete_item(seq)
+            elif operation == "remove":
+                self._insert_item(_item, seq)
+                if record[3] is not None:
+                    self._set_expiry(seq, record[3])
+                restored = True
+            elif operation == "expiry":
+                self._set_expiry(seq, record[3])
+            else:
+                self._change_priority(seq, record[3])
+        if restored:
+            # Restored items are put back in order they were added.
+            self._entries = dict(sorted(self._entries.items()))
+
+    def _merge_journal(self, sorted_index, journal):
+        # Updates sorted index with items changed in journal at once.
+        # First change of item tells if item was in index before.
+        first_records = {}
+        for record in journal:
+            first_records.setdefault(record[1], record)
+        removed = [(record[2], seq) for seq, record in 
+            first_records.items() if record[0] != "insert"]
+        inserted = [(self._entries[seq], seq) for seq in first_records
+            if seq in self._entries]
+        started = profiling.enabled and profiling.start()
+        sorted_index.update(removed, inserted)
+        if started:
+            profiling.record(self, "sorts", len(sorted_index), started)
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''Defers updating sorted items until changes within `with` end
+
+        Items can be added, removed and have their priorities set as
+        usual within `with block.batch():`. Sorted items are updated once
+        at the end by merging changed items into them instead of being
+        updated for each change. Priority for block is calculated once
+        when next needed. All changes are undone if exception is raised
+        within `with`. Priority for block cant be set within batch.'''
+        if self._journal is not None:
+            # Changes of nested batch belong to outer batch.
+            yield self
+            return
+        # Sorted index shared with forks is copied before being changed.
+        self._unshare()
+        journal = self._journal = []
+        sorted_index = self._index
+        next_seq = self._next_seq
+        # Sorted index is detached and updated once with all changes.
+        self._index = None
+        try:
+            yield self
+        except BaseException:
+            self._journal = None
+            self._undo(journal)
+            self._next_seq = next_seq
+            if self._index is None and sorted_index is not None:
+                # Items copied from forks within batch replace originals.
+                self._merge_journal(sorted_index, journal)
+                self._index = sorted_index
+            raise
+        self._journal = None
+        if self._index is None and sorted_index is not None:
+            # Sorted index was not needed within batch.
+            self._merge_journal(sorted_index, journal)
+            self._index = sorted_index
+
+    def refresh_index(self):
+        '''Discards cached sort keys after items priorities changed'''
+        self._index = None
+        self._hash_index = None
+        self._heap_index = None
+        self._weight_index = None
+        self._sum_index = None
+        self._aggregate = None
+        self._items_changed()
+
     def set_priority(self, priority):
-        '''Sets priority for block and update items priorities'''
-        self._priority = priority
-        self._items = self._get_items_with_new_priorities(self._items) 
+        '''Sets priority for block and update items priorities
+
+        Priorities of items are blended again from priorities they were
+        added with, stored items remain the same objects.'''
+        if self._journal is not None:
+            err_msg = "Priority for block cant be set within batch()"
+            raise RuntimeError(err_msg)
+        previous = (self._priority, self._priority_provided)
+        self._priority_provided = priority != self._default_priority
+        if self._priority_provided:
+            # Provided priority is needed for blending items priorities.
+            self._priority = priority
+        try:
+            priorities, base_priorities = self._get_new_priorities()
+        except Exception:
+            self._priority, self._priority_provided = previous
+            raise
+        # Sorted items are updated once for all changed priorities.
+        # Items not blended before may be ones passed to block, those
+        # are copied but can still be used to refer to their copies.
+        with self.batch():
+            for seq, new_priority in priorities.items():
+                if new_priority != self._entries[seq].get_priority():
+                    self._change_priority(seq, new_priority, 
+                        copy=seq not in self._base_priorities)
+        self._base_priorities = base_priorities
+        self._priority_outdated = False
+        self._setup_priority(priority)
+        self._notify_parents()
+
+    def _get_new_priorities(self):
+        # Returns priorities of items after block priority was set with
+        # priorities of blended items before being blended.
+        blends = self._blends_priorities()
+        priorities = {}
+        base_priorities = {}
+        for seq, _item in self._entries.items():
+            nested_block = self._nested_blocks.get(seq)
+            if nested_block is not None:
+                nested_priority = self._get_nested_priority(nested_block)
+                if nested_priority is not None:
+                    priorities[seq] = nested_priority
+                    continue
+            base_priority = self._get_base_priority(seq, _item)
+            if blends:
+                priorities[seq] = self._blend_priority(base_priority)
+                base_priorities[seq] = (base_priority, priorities[seq])
+            else:
+                priorities[seq] = base_priority
+        return priorities, base_priorities
 
     def get_priority(self):
         '''Gets priority for block'''
+        self._prune()
+        if self._priority_outdated:
+            self._priority_outdated = False
+            if self._entries:
+                self._priority = self._calculate_priority()
+            else:
+                # Items were removed leaving nothing to calculate from.
+                self._priority = self._default_priority
         return self._priority
 
+    def get_priority_sketch(self):
+        '''Gets sketch of priorities of items for estimating quantiles
+
+        Sketches of multiple blocks can be merged to estimate quantiles
+        of priorities of all their items.'''
+        priority_sketch = sketch.QuantileSketch(self._sketch_error)
+        priority_sketch.extend(self.get_priorities())
+        return priority_sketch
+
+    def __len__(self):
+        self._prune()
+        return len(self._entries)
+
     def get_sorted_items(self):
         '''Gets items sorted by their priorities'''
-        return self.sort_items_by_priority(self._items)
+        if self._reverse:
+            return list(self._get_index().get_descending_items())
+        return list(self._get_index().get_items())
 
     def get_sorted_objects(self):
         '''Gets items underlying objects sorted by priority'''
@@ -286,9 +1367,20 @@ class Block(BaseBlock):
 
     def get_items_by_priority(self, priority):
         '''Gets item objects matching priority'''
-        def func(_item):
-            return _item.get_priority() == priority
-        return self.filter_items(func)
+        try:
+            if self._key is None:
+                # Equal priorities are found by their hashes which also
+                # works for partially ordered priorities(e.g sets).
+                return self._get_hash_index().get_ordered_items([priority])
+            _index = self._get_index()
+            slices = [_index.find(priority)]
+        except TypeError:
+            # Priorities cannot be compared with each other.
+            # Items are still compared for equality as before.
+            def func(_item):
+                return _item.get_priority() == priority
+            return self.filter_items(func)
+        return _index.get_ordered_items(slices)
 
     def get_item_by_priority(self, priority):
         '''Gets first item matching priority'''
@@ -297,39 +1389,142 @@ class Block(BaseBlock):
 
     def get_items_by_priorities(self, priorities):
         '''Gets item objects matching any of priorities'''
-        def func(_item):
-            return _item.get_priority() in priorities
-        return self.filter_items(func)
+        try:
+            if self._key is None:
+                return self._get_hash_index().get_ordered_items(priorities)
+            _index = self._get_index()
+            # Same priority may be provided more than once.
+            slices = {_index.find(priority) for priority in priorities}
+        except TypeError:
+            def func(_item):
+                return _item.get_priority() in priorities
+            return self.filter_items(func)
+        return _index.get_ordered_items(slices)
 
     def get_item_by_priorities(self, priorities):
         '''Gets first item matching any of priorities'''
         items = self.get_items_by_priorities(priorities)
         if items: return items[0]
 
-    def get_items_by_priority_range(self, start=None, end=None):
-        '''Gets item objects with priorities in range'''
-        # Both 'start' and 'end' priorities are included.
-        # This method should work for non numbers priorities.
+    def _check_priority_range(self, start, end):
+        # Raises error if start priority is greater than end priority.
         if start != None and end != None:
-            if start > end:
+            _index = self._get_index()
+            if _index.get_key(start) > _index.get_key(end):
                 err_msg = "Start priority '{}' cant be greater than " +\
                     "end priority '{}'"
                 err_msg = err_msg.format(start, end)
                 raise ValueError(err_msg)
-        def func(_item):
-            priority = _item.get_priority()
-            if start != None and priority < start:
-                return False
-            if end != None and priority > end:
-                return False
-            return True
-        return self.filter_items(func)
+
+    def _find_priority_range(self, start, end):
+        # Returns index and its slice of items with priorities in range.
+        _index = self._get_index()
+        self._check_priority_range(start, end)
+        return _index, _index.find_range(start, end)
+
+    def get_items_by_priority_range(self, start=None, end=None):
+        '''Gets item objects with priorities in range'''
+        # Both 'start' and 'end' priorities are included.
+        # This method should work for non numbers priorities.
+        _index, _slice = self._find_priority_range(start, end)
+        return _index.get_ordered_items([_slice])
 
     def get_item_by_priority_range(self, start=None, end=None):
         '''Gets first item with priority in range'''
         items = self.get_items_by_priority_range(start, end)
         if items: return items[0]
 
+    def get_items_by_priority_ranges(self, ranges):
+        '''Gets item objects for each of (start, end) priority ranges
+        
+        Returns list of items for each range in order of ranges. Ranges
+        are searched together in one pass over sorted items.'''
+        _index = self._get_index()
+        ranges = list(ranges)
+        for start, end in ranges:
+            self._check_priority_range(start, end)
+        return [_index.get_ordered_items([_slice]) 
+            for _slice in _index.find_ranges(ranges)]
+
+    def aggregate_range(self, start=None, end=None, mode="mean"):
+        '''Aggregates priorities of items with priorities in range
+
+        Mode is one of 'count', 'sum', 'mean', 'min', 'max', 'median' or
+        'percentile:<p>'. Returns None if there are no items in range(0
+        for 'count'). Sums of priorities are kept in Fenwick tree updated
+        as items change and other modes read sorted items, each mode
+        takes logarithmic time.
+
+        Range, median and percentiles follow keys of priorities while
+        'min' and 'max' compare priorities themselves like priority
+        modes of the same names. With `key`, 'min' and 'max' then look
+        at each item in range.'''
+        # Both 'start' and 'end' priorities are included.
+        percentile = None
+        if isinstance(mode, str) and \
+            mode.startswith(self._percentile_priority_prefix):
+            percentile = self._parse_percentile(
+                mode[len(self._percentile_priority_prefix):], mode)
+        elif mode in self._median_priority_modes:
+            percentile = 50
+        elif mode not in self._range_modes:
+            err_msg = "mode should one of {} not '{}'"
+            raise ValueError(err_msg.format(self._range_modes, mode))
+        _index = self._get_index()
+        self._check_priority_range(start, end)
+        lower, upper = _index.find_range(start, end)
+        count = _index.count_slice(lower, upper)
+        if mode == "count":
+            return count
+        if not count:
+            return None
+        if mode in self._sum_priority_modes or \
+            mode in self._average_priority_modes:
+            total = self._get_sum_index().get_totals(start, end)[1]
+            if mode in self._sum_priority_modes:
+                return total
+            return total / count
+        if self._key is not None and (mode in self._min_priority_modes or 
+            mode in self._max_priority_modes):
+            # Order of keys may differ from order of priorities.
+            priorities = [_item.get_priority() 
+                for _item in _index.iter_slice(lower, upper)]
+            if mode in self._min_priority_modes:
+                return min(priorities)
+            return max(priorities)
+        if mode in self._min_priority_modes:
+            rank = 0
+        elif mode in self._max_priority_modes:
+            rank = count - 1
+        else:
+            rank = self._get_percentile_rank(count, percentile)
+        # Rank within range is offset by items before the range.
+        rank += _index.count_slice(0, lower)
+        return _index.get_item_at(rank).get_priority()
+
+    def get_items_by_priority_batch(self, priorities):
+        '''Gets item objects matching each of priorities
+
+        Returns list of items for each priority in order of priorities.
+        Priorities are searched together in one pass over sorted items.'''
+        _index = self._get_index()
+        return [_index.get_ordered_items([_slice]) 
+            for _slice in _index.find_many(priorities)]
+
+    def get_items_by_priority_prefix(self, prefix, start=None, end=None):
+        '''Gets item objects with tuple priorities starting with prefix
+        
+        Component of priority following prefix can be restricted to be
+        within range of `start` and `end`(both included).'''
+        _index = self._get_index()
+        return _index.get_ordered_items(
+            [_index.find_prefix(prefix, start, end)])
+
+    def get_item_by_priority_prefix(self, prefix, start=None, end=None):
+        '''Gets first item with tuple priority starting with prefix'''
+        items = self.get_items_by_priority_prefix(prefix, start, end)
+        if items: return items[0]
+
     def get_items_by_type(self, _type):
         '''Gets item objects of provided type'''
         # Type is defined as type of object underlying item.
@@ -337,6 +1532,14 @@ class Block(BaseBlock):
             return isinstance(_item.get_object(), _type)
         return self.filter_items(func)   
 
+    def query(self):
+        '''Creates query of items of block
+
+        Conditions are chained and run together when results are
+        requested, e.g `block.query().of_type(str).between(1, 5).first(2)`.
+        See mimap.query.Query for available conditions.'''
+        return query.Query(self)
+
     def get_item_by_type(self, _type):
         '''Gets first item of provided type'''
         items = self.get_items_by_type(_type)
@@ -344,8 +1547,10 @@ class Block(BaseBlock):
 
     def get_first_items(self, limit=3):
         '''Gets first item objects based on their priority'''
-        sorted_items = self.sort_items_by_priority(self._items)
-        return sorted_items[:limit]
+        _index = self._get_index()
+        if self._reverse:
+            return _index.get_descending_items()[:limit]
+        return _index.get_items()[:limit]
 
     def get_first_item(self):
         '''Gets first item based on priority'''
@@ -354,8 +1559,10 @@ class Block(BaseBlock):
 
     def get_last_items(self, limit=3):
         '''Gets last item objects based on their priority'''
-        sorted_items = self.sort_items_by_priority(self._items)
-        return sorted_items[-limit:]
+        _index = self._get_index()
+        if self._reverse:
+            return _index.get_descending_items()[-limit:]
+        return _index.get_items()[-limit:]
 
     def get_last_item(self):
         '''Gets last item based on priority'''
@@ -364,6 +1571,103 @@ class Block(BaseBlock):
             return items[-1]
         
 
+    def peek_first(self):
+        '''Gets first item without removing it, None if block is empty'''
+        record = self._get_heap_index().peek_first()
+        if record is not None:
+            return record[1]
+
+    def peek_last(self):
+        '''Gets last item without removing it, None if block is empty'''
+        record = self._get_heap_index().peek_last()
+        if record is not None:
+            return record[1]
+
+    def pop_first(self):
+        '''Removes and returns first item, None if block is empty
+        
+        Items are taken from heaps which takes logarithmic time. Sorted
+        items are also updated if they were already needed.'''
+        record = self._get_heap_index().peek_first()
+        if record is not None:
+            return self._delete_item(record[0])
+
+    def pop_last(self):
+        '''Removes and returns last item, None if block is empty'''
+        record = self._get_heap_index().peek_last()
+        if record is not None:
+            return self._delete_item(record[0])
+
+    def pop_first_n(self, count):
+        '''Removes and returns up to count first items'''
+        items = []
+        while len(items) < count:
+            _item = self.pop_first()
+            if _item is None:
+                break
+            items.append(_item)
+        return items
+
+    def memory_usage(self, deep=True):
+        '''Estimates bytes of memory used by block
+
+        Returns dict of bytes used by 'items', 'references', 'priorities',
+        'storage' and 'indexes' of block and their 'total'. Bytes used by
+        objects of items are included as 'objects' if `deep` is True.
+        Objects shared by parts are counted in first part using them.'''
+        self._prune()
+        seen = set()
+        usage = {}
+        items = list(self._entries.values())
+        objects = [_item.get_object() for _item in items]
+        if deep:
+            usage["objects"] = sum(memory.get_size(_object, seen) 
+                for _object in objects)
+        else:
+            seen.update(id(_object) for _object in objects)
+        usage["priorities"] = memory.get_size(self._interned, seen) + \
+            sum(memory.get_size(_item.get_priority_object(), seen) 
+            for _item in items)
+        usage["references"] = sum(memory.get_size(_item.get_reference(), 
+            seen) for _item in items)
+        usage["items"] = sum(memory.get_size(_item, seen) for _item in items)
+        storage = [self._entries, self._items_list, self._item_seqs, 
+            self._weak_seqs, self._object_seqs, self._expiries, 
+            self._expiry_heap, self._owned_seqs, self._replaced_items, 
+            self._dead_refs, self._nested_blocks, self._outdated_nested]
+        usage["storage"] = sum(memory.get_size(structure, seen) 
+            for structure in storage if structure is not None)
+        indexes = [self._index, self._hash_index, self._heap_index, 
+            self._weight_index, self._sum_index, self._aggregate]
+        usage["indexes"] = sum(memory.get_size(_index, seen) 
+            for _index in indexes if _index is not None)
+        usage = {name: usage[name] for name in ("items", "references", 
+            "priorities", "objects", "storage", "indexes") if name in usage}
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def sample(self, k=1, weighted=True, rng=None):
+        '''Draws k random items with replacement
+
+        Items are drawn with probability proportional to their priorities
+        if `weighted` is True, priorities then need to be non negative
+        numbers. Weights are kept up to date as items change which makes
+        each draw take logarithmic time. `rng` is random.Random object 
+        used for drawing, default: random module.'''
+        if rng is None:
+            rng = random
+        if not weighted:
+            items = self._items
+            return rng.choices(items, k=k) if items else []
+        weight_index = self._get_weight_index()
+        if not len(weight_index):
+            return []
+        total = weight_index.get_total()
+        if total <= 0:
+            err_msg = "Priorities of items add up to zero"
+            raise ValueError(err_msg)
+        return [weight_index.find(rng.random() * total) for _ in range(k)]
+
     def to_tuple(self):
         '''Returns tuple form of block with priorities and objects'''
         # Priority will be used as tuple key and object as value.
@@ -373,23 +1677,69 @@ class Block(BaseBlock):
             results.append((_item.get_priority(), _item.get_object()))
         return tuple(results)
 
+    def _get_priority_group(self, priority):
+        # Returns items with priority in order they were added.
+        return self._get_hash_index().get_items(priority)
+
+    def _get_group_priorities(self):
+        # Returns distinct priorities of items.
+        return self._get_hash_index().get_priorities()
+
+    def _get_priority_groups(self):
+        # Returns distinct priorities with their items in order added.
+        return self._get_hash_index().iter_groups()
+
+    def to_mapping(self, multi=False):
+        '''Returns read-only view mapping priorities to objects
+        
+        View is created without copying anything and reflects changes
+        made to block. Each priority maps to object of its first item or
+        list of distinct objects if `multi` is True.'''
+        return mapping.PriorityMapping(self, multi)
+
     def to_dict(self):
         '''Returns dict form of block with priorities and objects'''
         # This will fail if priority not hashable.
-        map = dict()
-        for priority, object_ in self.to_tuple():
-            if priority not in map:
-                map[priority] = object_
-        return map
+        # Items are grouped by priority without sorting them.
+        return dict(self.to_mapping())
 
     def to_multi_dict(self):
         '''Returns multi dict from items priorities and underlying objects'''
         # Key is priority and values are underlying objects.
-        result_dict = defaultdict(list)
-        for _priority, _object in self.to_tuple():
-            if _object not in result_dict[_priority]:
-                result_dict[_priority].append(_object)
-        return dict(result_dict)
+        # Groups are read in one pass instead of looking up each priority.
+        multi_dict = {}
+        for priority, items in self._get_priority_groups():
+            if len(items) == 1:
+                # Single object needs no checks for repeated ones.
+                multi_dict[priority] = [_item.get_object() for _item in items]
+            else:
+                multi_dict[priority] = mapping.unique_objects(
+                    _item.get_object() for _item in items)
+        return multi_dict
+
+    def to_columns(self):
+        '''Returns sorted priorities and objects as two sequences
+        
+        Priorities are returned in array.array when they are all integers
+        or all floats otherwise in list. Objects are returned in list.'''
+        sorted_items = self.get_sorted_items()
+        priorities = columns.to_array(_item.get_priority() 
+            for _item in sorted_items)
+        return priorities, self.extract_objects_from_items(sorted_items)
+
+    @classmethod
+    def from_columns(cls, priorities, objects, *args, **kwargs):
+        '''Creates block from sequences of priorities and objects
+        
+        Other arguments are passed to initializer of block.'''
+        priorities = list(priorities)
+        objects = list(objects)
+        if len(priorities) != len(objects):
+            err_msg = "Got {} priorities for {} objects"
+            raise ValueError(err_msg.format(len(priorities), len(objects)))
+        items = [item.Item(_object, priority) 
+            for priority, _object in zip(priorities, objects)]
+        return cls(items, *args, **kwargs)
 
     def to_priority_queue(self, maxsize=None):
         '''Returns priority queue version of block object'''
@@ -455,12 +1805,34 @@ class DeepBlock(Block):
                 deep_items.append(_item)
         return deep_items
 
+    def _prepare_items(self, items, priority):
+        # Replaces items containing block objects with their deep items.
+        deep_items = []
+        for _item in self._to_items(items):
+            if isinstance(_item.get_object(), Block):
+                deep_items.extend(self._extract_deep_items(_item.get_object()))
+            else:
+                deep_items.append(_item)
+        return super()._prepare_items(deep_items, priority)
+
+    def add_item(self, _item, ttl=None):
+        '''Adds item to block returning item stored by block
+        
+        Items of nested block objects are added instead of item containing
+        block object which may result in more than one item, first of them
+        is returned(None if there were none). add_items() returns all.'''
+        new_items = self.add_items([_item], ttl)
+        if new_items: return new_items[0]
+
     def _setup_items(self, items, priority):
         # Setup deep items overiding existing item objects.
         # Ensures all items are really item objects.
         # _extract_deep_items() expectes item objects.
         self._items = self._to_items(self._items)
+        started = profiling.enabled and profiling.start()
         _items = self._extract_deep_items(self)
+        if started:
+            profiling.record(self, "flattens", len(_items), started)
         # Now asks super class to setup items as usual.
         # Items priorities will be updated as expected.
         super()._setup_items(_items, priority)
@@ -0,0 +1,134 @@
+from mimap import block
+from mimap import index
+from mimap import profiling
+
+
+class BucketBlock(block.Block):
+    '''Block for items with small integer priorities kept in buckets.
+
+    Each priority from 0 to `size - 1` has its own first in, first out
+    bucket of items and bitmap marks buckets having items. First item is
+    popped from front of its bucket and last item from its back. Adding and
+    removing items, getting items of priority, counting them and popping
+    first or last item take the same time regardless of number of items.
+    Items are never sorted, buckets are already in order of priorities.
+
+    Priorities of items need to be integers from 0 to `size - 1`, that
+    includes priorities updated from priority of block. Block has the
+    same methods as Block except searching by prefix. Custom `key` and
+    `tie_breaker` are not supported.'''
+    _default_size = 256
+
+    def __init__(self, items, priority=block.Block._default_priority,
+    size=_default_size, **kwargs):
+        '''
+        items: Iterator
+            Collection of Item objects with integer priorities.
+        priority: Any
+            Any object can sorted or support comparison operators.
+        size: Int
+            Number of buckets(priorities), default: 256.
+        **kwargs:
+            Other arguments accepted by Block except `key` and 
+            `tie_breaker`.
+        '''
+        for argument in ("key", "tie_breaker"):
+            if kwargs.get(argument) is not None:
+                err_msg = "'{}' is not supported by {}"
+                raise ValueError(err_msg.format(argument, 
+                    self.__class__.__name__))
+        # Size needs to exist before items are setup.
+        self._size = size
+        super().__init__(items, priority, **kwargs)
+
+    @classmethod
+    def supports_items(cls, items, size=_default_size):
+        '''Checks if priorities of items allow them in bucket block'''
+        return all(index.BucketIndex.to_bucket(_item.get_priority(), size)
+            is not None for _item in items)
+
+    def _prepare_items(self, items, priority):
+        # Checks priorities of items after they were updated.
+        new_items = super()._prepare_items(items, priority)
+        for new_item in new_items:
+            self._check_priority(new_item.get_priority())
+        return new_items
+
+    def _blend_priority(self, priority):
+        # Blended priority also needs to have bucket.
+        blended_priority = super()._blend_priority(priority)
+        self._check_priority(blended_priority)
+        return blended_priority
+
+    def _check_priority(self, priority):
+        # Raises error if priority has no bucket.
+        if index.BucketIndex.to_bucket(priority, self._size) is None:
+            err_msg = "Priority should be integer from 0 to {} not '{}'"
+            raise ValueError(err_msg.format(self._size - 1, priority))
+
+    def _get_index(self):
+        # Buckets are index of this block(nothing to sort).
+        self._prune()
+        if self._index is None:
+            if profiling.enabled:
+                profiling.record(self, "index_misses")
+            self._index = index.BucketIndex(self._entries.values(), 
+                self._entries.keys(), self._size)
+        elif profiling.enabled:
+            profiling.record(self, "index_hits")
+        return self._index
+
+    def set_item_priority(self, _item, priority):
+        '''Sets priority for item stored by block'''
+        self._check_priority(priority)
+        super().set_item_priority(_item, priority)
+
+    def get_priority_count(self, priority):
+        '''Gets number of items with priority'''
+        return self._get_index().get_count(priority)
+
+    def get_first_items(self, limit=3):
+        '''Gets first item objects based on their priority'''
+        items = self._get_index().iter_items(descending=self._reverse)
+        return [_item for _item, _ in zip(items, range(limit))]
+
+    def get_last_items(self, limit=3):
+        '''Gets last item objects based on their priority'''
+        items = self._get_index().iter_items(descending=self._reverse,
+            backward=True)
+        last_items = [_item for _item, _ in zip(items, range(limit))]
+        last_items.reverse()
+        return last_items
+
+    def _pop(self, last):
+        # Removes and returns item from first or last bucket.
+        _index = self._get_index()
+        if last != self._reverse:
+            bucket = _index.get_last_bucket()
+        else:
+            bucket = _index.get_first_bucket()
+        if bucket is None:
+            return None
+        items = _index.get_bucket(bucket)
+        # First item is at front of its bucket, last item at its back.
+        if last:
+            seq = next(reversed(items))
+        else:
+            seq = next(iter(items))
+        return self._delete_item(seq)
+
+    def peek_first(self):
+        '''Gets first item without removing it, None if block is empty'''
+        return self.get_first_item()
+
+    def peek_last(self):
+        '''Gets last item without removing it, None if block is empty'''
+        return self.get_last_item()
+
+    def pop_first(self):
+        '''Removes and returns first item, None if block is empty'''
+        return self._pop(last=False)
+
+    def pop_last(self):
+        '''Removes and returns last item, None if block is empty'''
+        return self._pop(last=True)
@@ -0,0 +1,134 @@
+'''Opt-in cache of blocks created by highlevel functions.
+
+Highlevel functions create new block each time they are called. When
+cache is enabled, block created from sequence of items is reused by
+later calls with the same items and arguments, including its sorted
+and hash indexes.
+
+    from mimap import cache
+
+    cache.enable(maxsize=16)
+    mimap.find_first_item(items)  # creates block
+    mimap.find_last_item(items)   # reuses block
+
+Cache is keyed by identity of sequence of items. Entry is only used
+while the sequence holds the same item objects with the same priorities,
+changing priority of item only invalidates entries holding that item.
+Cached blocks keep their items alive until entries are evicted or cache
+is cleared. Items containing nested blocks are never cached as changes
+within nested blocks cant be detected. Least recently used entries are
+evicted when cache is full.'''
+from mimap import block
+
+from collections import OrderedDict
+from collections.abc import Sequence
+import operator
+
+
+__all__ = [
+    "enable",
+    "disable",
+    "is_enabled",
+    "clear",
+    "get_info",
+    "get_block"
+]
+
+# Checked by highlevel functions before using cache.
+# Use enable() and disable() instead of setting it directly.
+enabled = False
+
+# Maximum number of blocks kept by cache.
+_maxsize = 32
+# Maps (id of sequence, arguments) to cache entries in order of use.
+_entries = OrderedDict()
+_hits = 0
+_misses = 0
+
+
+class _Entry():
+    # Block created from items with items and their priorities.
+    __slots__ = ("block", "items", "priorities")
+
+    def __init__(self, _block, items):
+        self.block = _block
+        self.items = list(items)
+        self.priorities = [_item.get_priority() for _item in self.items]
+
+    def is_valid(self, items):
+        # Checks if items are still the same objects with same priorities.
+        # Priority set to other object is treated as changed.
+        if len(self.items) != len(items):
+            return False
+        if not all(map(operator.is_, self.items, items)):
+            return False
+        priorities = (_item.get_priority() for _item in items)
+        return all(map(operator.is_, self.priorities, priorities))
+
+
+def enable(maxsize=32):
+    '''Enables caching of blocks keeping up to `maxsize` blocks'''
+    global enabled, _maxsize
+    if maxsize < 1:
+        raise ValueError("maxsize should be positive")
+    _maxsize = maxsize
+    enabled = True
+    while len(_entries) > _maxsize:
+        _entries.popitem(last=False)
+
+def disable():
+    '''Disables caching of blocks and removes cached blocks'''
+    global enabled
+    enabled = False
+    clear()
+
+def is_enabled():
+    '''Checks if blocks are cached'''
+    return enabled
+
+def clear():
+    '''Removes cached blocks and resets hits and misses'''
+    global _hits, _misses
+    _entries.clear()
+    _hits = 0
+    _misses = 0
+
+def get_info():
+    '''Gets dict with hits, misses, size and maxsize of cache'''
+    return {"hits": _hits, "misses": _misses, "size": len(_entries),
+        "maxsize": _maxsize}
+
+def get_block(items, create_block, **kwargs):
+    '''Gets cached block for items or creates it with `create_block`
+
+    `create_block(items, **kwargs)` is called when items have no valid
+    cached block. Items that are not sequence of item objects are never
+    cached.'''
+    global _hits, _misses
+    if not enabled or not isinstance(items, Sequence):
+        return create_block(items, **kwargs)
+    try:
+        key = (id(items), tuple(sorted(kwargs.items())))
+        entry = _entries.get(key)
+    except TypeError:
+        # Arguments cannot be hashed or compared.
+        return create_block(items, **kwargs)
+    if entry is not None and entry.is_valid(items):
+        _hits += 1
+        _entries.move_to_end(key)
+        return entry.block
+    _misses += 1
+    created_block = create_block(items, **kwargs)
+    try:
+        if any(isinstance(_item.get_object(), block.Block) 
+            for _item in items):
+            return created_block
+        entry = _Entry(created_block, items)
+    except AttributeError:
+        # Items are not item objects.
+        return created_block
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    if len(_entries) > _maxsize:
+        _entries.popitem(last=False)
+    return created_block
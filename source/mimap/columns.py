@@ -0,0 +1,23 @@
+'''Helpers for exporting priorities and objects as columns.'''
+from array import array
+
+
+def to_array(values):
+    '''Returns numbers as array.array, other values as list
+
+    Integers are stored as signed 64-bit and floats as double numbers.
+    Values mixing integers and floats or not fitting array are returned
+    in list. Arrays support buffer protocol which allows other libraries
+    to read them without copying(e.g numpy.frombuffer()).'''
+    values = list(values)
+    types = set(map(type, values))
+    if types == {int}:
+        typecode = "q"
+    elif types == {float}:
+        typecode = "d"
+    else:
+        return values
+    try:
+        return array(typecode, values)
+    except OverflowError:
+        return values
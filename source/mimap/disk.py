@@ -0,0 +1,443 @@
+from mimap import columns
+from mimap import item
+from mimap import mapping
+from mimap import profiling
+from mimap.block import Block
+
+from bisect import bisect_left
+from bisect import bisect_right
+from collections import defaultdict
+from queue import PriorityQueue
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+
+
+class DiskBlock():
+    '''Block keeping its items sorted on disk instead of memory.
+
+    Instances of this class consume items from iterator in runs of
+    `run_size` items. Each run is sorted and written to temporary file
+    then runs are merged(external merge sort) into pages of `page_size`
+    items. Only first key of each page is kept in memory which allows
+    queries to find pages they need with binary search and read only
+    those pages.
+
+    Objects and priorities of items need to be picklable. Items returned
+    by queries are new item objects created from pages. Priorities are
+    read when items are consumed, priority changing afterwards wont
+    affect the block.
+
+    Priority for block is calculated from items using `priority_mode`
+    unless provided. Unlike Block, items priorities are not updated
+    from priority of block.
+
+    When `strict` is True, items containing Block objects are not allowed
+    like with Block. Otherwise nested blocks are pickled with their items
+    and block does not follow their priorities.
+
+    Call `close()` or use block as context manager to remove its files,
+    they are also removed when block is garbage collected.'''
+    _default_priority = Block._default_priority
+    _average_priority_modes = Block._average_priority_modes
+    _median_priority_modes = Block._median_priority_modes
+    _min_priority_modes = Block._min_priority_modes
+    _max_priority_modes = Block._max_priority_modes
+    # Modes calculated while pages are written.
+    _priority_modes = {
+        *_average_priority_modes,
+        *_median_priority_modes,
+        *_min_priority_modes,
+        *_max_priority_modes
+    }
+
+    def __init__(self, items, priority=_default_priority, _type=object,
+    strict=True, priority_mode=None, key=None, page_size=1024, 
+    run_size=100000, directory=None):
+        '''
+        items: Iterator
+            Collection of Item objects, can be larger than memory.
+        priority: Any
+            Any object can sorted or support comparison operators.
+        _type: Type
+            Type of items this block expectes, default: object
+        strict: Bool
+            Prevents items containing Block objects, default: True.
+        priority_mode: Str
+            Mode for calculating priority for block, default: 'median'.
+        key: Callable
+            Maps priority to comparable key used for sorting, default: None.
+        page_size: Int
+            Number of items read from disk at once, default: 1024.
+        run_size: Int
+            Number of items sorted in memory at once, default: 100000.
+        directory: Str
+            Directory for temporary files, default: system temp directory.
+        '''
+        if page_size < 1 or run_size < 1:
+            raise ValueError("page_size and run_size should be positive")
+        self._type = _type
+        self._strict = strict
+        self._key = key
+        self._page_size = page_size
+        self._run_size = run_size
+        if priority_mode == None:
+            priority_mode = list(self._median_priority_modes)[0]
+        if priority_mode not in self._priority_modes:
+            err_msg = "priority_mode should one of {} not '{}'"
+            raise ValueError(err_msg.format(self._priority_modes,
+                priority_mode))
+        self._priority_mode = priority_mode
+        self._directory = tempfile.mkdtemp(prefix="mimap-", dir=directory)
+        # Files are removed even if close() is never called.
+        self._finalizer = weakref.finalize(self, shutil.rmtree,
+            self._directory, True)
+        self._path = os.path.join(self._directory, "pages")
+        self._file = None
+        # Sparse index, one entry for each page.
+        self._page_keys = []
+        self._page_offsets = []
+        self._page_counts = [0]
+        self._length = 0
+        # Aggregate of priorities calculated while pages are written.
+        self._aggregate = None
+        self._build(items)
+        self._file = open(self._path, "rb")
+        self._setup_priority(priority)
+
+    def _get_key(self, priority):
+        # Gets key used for sorting and searching priority.
+        if self._key is None:
+            return priority
+        return self._key(priority)
+
+    def _to_record(self, _item, seq):
+        # Converts item to record stored on disk.
+        _item = item.Item.to_item(_item)
+        _object = _item.get_object()
+        if self._strict and isinstance(_object, Block):
+            err_msg = "Nested Block objects not allowed when " +\
+                "'strict' is enabled"
+            raise TypeError(err_msg)
+        if not isinstance(_object, self._type):
+            err_msg = "Item should have reference of type '{}' not '{}'"
+            type_name = _object.__class__.__name__
+            err_msg = err_msg.format(self._type.__name__, type_name)
+            raise TypeError(err_msg)
+        priority = _item.get_priority()
+        return (self._get_key(priority), seq, priority, _object)
+
+    def _write_run(self, records, index):
+        # Sorts records and writes them into run file.
+        started = profiling.enabled and profiling.start()
+        records.sort(key=lambda record: record[:2])
+        if started:
+            profiling.record(self, "sorts", len(records), started)
+        path = os.path.join(self._directory, "run-{}".format(index))
+        with open(path, "wb") as run_file:
+            for record in records:
+                pickle.dump(record, run_file, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def _read_run(path):
+        # Yields records of run file in their sorted order.
+        with open(path, "rb") as run_file:
+            while True:
+                try:
+                    yield pickle.load(run_file)
+                except EOFError:
+                    break
+
+    def _build(self, items):
+        # Creates sorted runs from items and merges them into pages.
+        run_paths = []
+        seqs = itertools.count()
+        items = iter(items)
+        while True:
+            records = [self._to_record(_item, seq) for _item, seq in
+                zip(itertools.islice(items, self._run_size), seqs)]
+            if not records:
+                break
+            run_paths.append(self._write_run(records, len(run_paths)))
+        runs = [self._read_run(path) for path in run_paths]
+        merged = heapq.merge(*runs, key=lambda record: record[:2])
+        with open(self._path, "wb") as pages_file:
+            while True:
+                page = list(itertools.islice(merged, self._page_size))
+                if not page:
+                    break
+                self._page_keys.append(page[0][0])
+                self._page_offsets.append(pages_file.tell())
+                self._page_counts.append(self._page_counts[-1]+len(page))
+                pickle.dump(page, pages_file, pickle.HIGHEST_PROTOCOL)
+                self._length += len(page)
+                self._update_aggregate(page)
+        for path in run_paths:
+            os.remove(path)
+
+    def _update_aggregate(self, page):
+        # Updates sum, min or max of priorities with page records.
+        priorities = [record[2] for record in page]
+        if self._priority_mode in self._average_priority_modes:
+            page_aggregate = sum(priorities)
+        elif self._priority_mode in self._min_priority_modes:
+            page_aggregate = min(priorities)
+        elif self._priority_mode in self._max_priority_modes:
+            page_aggregate = max(priorities)
+        else:
+            return
+        if self._aggregate is None:
+            self._aggregate = page_aggregate
+        elif self._priority_mode in self._average_priority_modes:
+            self._aggregate += page_aggregate
+        elif self._priority_mode in self._min_priority_modes:
+            self._aggregate = min(self._aggregate, page_aggregate)
+        else:
+            self._aggregate = max(self._aggregate, page_aggregate)
+
+    def _setup_priority(self, priority):
+        # Calculates priority for block from items priorities.
+        if priority != self._default_priority:
+            self._priority = priority
+        elif not self._length:
+            err_msg = "There are no items to calculate block priority"
+            raise ValueError(err_msg)
+        elif self._priority_mode in self._median_priority_modes:
+            median_index = round((self._length-1)/2)
+            self._priority = self._read_record(median_index)[2]
+        elif self._priority_mode in self._average_priority_modes:
+            self._priority = self._aggregate/self._length
+        else:
+            self._priority = self._aggregate
+
+    def _read_page(self, page_index):
+        # Reads records of page from disk.
+        self._file.seek(self._page_offsets[page_index])
+        return pickle.load(self._file)
+
+    def _read_record(self, rank):
+        # Reads record at rank of sorted records.
+        page_index = bisect_right(self._page_counts, rank) - 1
+        page = self._read_page(page_index)
+        return page[rank - self._page_counts[page_index]]
+
+    def _iter_records(self, start_page=0, end_page=None):
+        # Yields records of pages in sorted order.
+        if end_page is None:
+            end_page = len(self._page_keys)
+        for page_index in range(start_page, end_page):
+            yield from self._read_page(page_index)
+
+    def _find_range_records(self, start=None, end=None):
+        # Returns records with priorities in range reading only pages
+        # which may contain them.
+        start_key = None if start is None else self._get_key(start)
+        end_key = None if end is None else self._get_key(end)
+        if start_key is None:
+            start_page = 0
+        else:
+            # Equal keys may start in page before first key matching.
+            start_page = max(bisect_left(self._page_keys, start_key)-1, 0)
+        if end_key is None:
+            end_page = len(self._page_keys)
+        else:
+            end_page = bisect_right(self._page_keys, end_key)
+        records = []
+        for record in self._iter_records(start_page, end_page):
+            if start_key is not None and record[0] < start_key:
+                continue
+            if end_key is not None and record[0] > end_key:
+                break
+            records.append(record)
+        return records
+
+    @staticmethod
+    def _to_items(records, ordered=False):
+        # Creates item objects from records.
+        # Ordered records are returned in order items were consumed.
+        if ordered:
+            records = sorted(records, key=lambda record: record[1])
+        return [item.Item(record[3], record[2]) for record in records]
+
+    def get_priority(self):
+        '''Gets priority for block'''
+        return self._priority
+
+    def get_items(self):
+        '''Gets items in order they were consumed(reads all pages)'''
+        return self._to_items(self._iter_records(), ordered=True)
+
+    def get_objects(self):
+        '''Gets items underlying objects(reads all pages)'''
+        return self.extract_objects_from_items(self.get_items())
+
+    @classmethod
+    def extract_objects_from_items(cls, items):
+        '''Gets underlying object from item object'''
+        return [_item.get_object() for _item in items]
+
+    def get_sorted_items(self):
+        '''Gets items sorted by their priorities(reads all pages)'''
+        return self._to_items(self._iter_records())
+
+    def get_sorted_objects(self):
+        '''Gets items underlying objects sorted by priority'''
+        return [record[3] for record in self._iter_records()]
+
+    def get_priorities(self):
+        '''Gets priorities of items in order they were consumed'''
+        records = sorted(self._iter_records(), key=lambda record: record[1])
+        return [record[2] for record in records]
+
+    def filter_items(self, key=None, limit=None):
+        '''Filters sorted item objects by key function'''
+        # Pages are read until limit of items is reached.
+        started = profiling.enabled and profiling.start()
+        items = (item.Item(record[3], record[2])
+            for record in self._iter_records())
+        filtered_items = list(itertools.islice(filter(key, items), limit))
+        if started:
+            profiling.record(self, "scans", self._length, started)
+        return filtered_items
+
+    def get_items_by_priority(self, priority):
+        '''Gets item objects matching priority'''
+        records = self._find_range_records(priority, priority)
+        return self._to_items(records, ordered=True)
+
+    def get_item_by_priority(self, priority):
+        '''Gets first item matching priority'''
+        items = self.get_items_by_priority(priority)
+        if items: return items[0]
+
+    def get_items_by_priorities(self, priorities):
+        '''Gets item objects matching any of priorities'''
+        records = {}
+        for priority in priorities:
+            for record in self._find_range_records(priority, priority):
+                records[record[1]] = record
+        return self._to_items(records.values(), ordered=True)
+
+    def get_item_by_priorities(self, priorities):
+        '''Gets first item matching any of priorities'''
+        items = self.get_items_by_priorities(priorities)
+        if items: return items[0]
+
+    def get_items_by_priority_range(self, start=None, end=None):
+        '''Gets item objects with priorities in range'''
+        if start != None and end != None:
+            if self._get_key(start) > self._get_key(end):
+                err_msg = "Start priority '{}' cant be greater than " +\
+                    "end priority '{}'"
+                err_msg = err_msg.format(start, end)
+                raise ValueError(err_msg)
+        records = self._find_range_records(start, end)
+        return self._to_items(records, ordered=True)
+
+    def get_item_by_priority_range(self, start=None, end=None):
+        '''Gets first item with priority in range'''
+        items = self.get_items_by_priority_range(start, end)
+        if items: return items[0]
+
+    def get_items_by_type(self, _type):
+        '''Gets item objects of provided type(reads all pages)'''
+        records = [record for record in self._iter_records()
+            if isinstance(record[3], _type)]
+        return self._to_items(records, ordered=True)
+
+    def get_item_by_type(self, _type):
+        '''Gets first item of provided type'''
+        items = self.get_items_by_type(_type)
+        if items: return items[0]
+
+    def get_first_items(self, limit=3):
+        '''Gets first item objects based on their priority'''
+        records = itertools.islice(self._iter_records(), max(limit, 0))
+        return self._to_items(records)
+
+    def get_first_item(self):
+        '''Gets first item based on priority'''
+        items = self.get_first_items(1)
+        if items: return items[0]
+
+    def get_last_items(self, limit=3):
+        '''Gets last item objects based on their priority'''
+        # Pages are read backwards until limit of items is reached.
+        records = []
+        page_index = len(self._page_keys) - 1
+        while page_index >= 0 and len(records) < limit:
+            records = self._read_page(page_index) + records
+            page_index -= 1
+        return self._to_items(records[-limit:] if limit > 0 else [])
+
+    def get_last_item(self):
+        '''Gets last item based on priority'''
+        items = self.get_last_items(1)
+        if items: return items[-1]
+
+    def to_tuple(self):
+        '''Returns tuple form of block with priorities and objects'''
+        return tuple((record[2], record[3]) for record in
+            self._iter_records())
+
+    def to_columns(self):
+        '''Returns sorted priorities and objects as two sequences'''
+        priorities = []
+        objects = []
+        for record in self._iter_records():
+            priorities.append(record[2])
+            objects.append(record[3])
+        return columns.to_array(priorities), objects
+
+    def to_dict(self):
+        '''Returns dict form of block with priorities and objects'''
+        map = dict()
+        for record in self._iter_records():
+            if record[2] not in map:
+                map[record[2]] = record[3]
+        return map
+
+    def to_multi_dict(self):
+        '''Returns multi dict from items priorities and underlying objects'''
+        result_dict = defaultdict(list)
+        for record in self._iter_records():
+            result_dict[record[2]].append(record[3])
+        return {priority: mapping.unique_objects(objects)
+            for priority, objects in result_dict.items()}
+
+    def to_priority_queue(self, maxsize=None):
+        '''Returns priority queue version of block object'''
+        if maxsize != None:
+            priority_queue = PriorityQueue(maxsize)
+            records = itertools.islice(self._iter_records(), maxsize)
+        else:
+            priority_queue = PriorityQueue()
+            records = self._iter_records()
+        for record in records:
+            priority_queue.put((record[2], record[3]))
+        return priority_queue
+
+    def close(self):
+        '''Closes block removing its files from disk'''
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        for record in self._iter_records():
+            yield item.Item(record[3], record[2])
+
+    def __len__(self):
+        return self._length
@@ -1,4 +1,6 @@
 from mimap import block
+from mimap import bucket
+from mimap import cache
 from mimap import item
 
 
@@ -23,6 +25,9 @@ __all__ = [
     "find_items_by_priority_range",
     "find_item_by_priority_range",
 
+    "find_items_by_priority_prefix",
+    "find_item_by_priority_prefix",
+
     "find_items_by_type",
     "find_item_by_type",
 
@@ -65,6 +70,14 @@ def create_block(items, priority=None, **kwargs):
         'median'.
     update_priorities: Bool
         Enables and disables updating of block and items priorities.
+    key: Callable
+        Maps priority to comparable key used for sorting, default: None.
+    reverse: Bool
+        Sorts items from highest to lowest priority, default: False.
+    tie_breaker: Callable
+        Maps item to secondary key for ordering items with equal keys.
+    workers: Int
+        Number of workers used for creating block, default: None.
     
     If items contains block object consider using `create_deep_block()`
     as it will extract the items of that block. Continue using this
@@ -89,6 +102,14 @@ def create_deep_block(items, priority=None, **kwargs):
         'median'.
     update_priorities: Bool
         Enables and disables updating of block and items priorities.
+    key: Callable
+        Maps priority to comparable key used for sorting, default: None.
+    reverse: Bool
+        Sorts items from highest to lowest priority, default: False.
+    tie_breaker: Callable
+        Maps item to secondary key for ordering items with equal keys.
+    workers: Int
+        Number of workers used for creating block, default: None.
     
     Deep block is neccessay when items can contain block object
     which may contain other items. This function results in block object
@@ -106,13 +127,28 @@ def create_deep_block(items, priority=None, **kwargs):
     return block.DeepBlock(items, priority, **kwargs)
 
 
-def create_mapping(items, priority=None, flatten=False, **kwargs):
+def _can_use_buckets(items, priority, kwargs):
+    # Checks if bucket block can replace block for items.
+    # Priorities calculated from block priority may not be integers.
+    if priority is not None or kwargs.get("key") is not None or \
+        kwargs.get("tie_breaker") is not None:
+        return False
+    if not all(isinstance(_item, item.Item) for _item in items):
+        return False
+    return bucket.BucketBlock.supports_items(items)
+
+def create_mapping(items, priority=None, flatten=False, bucket_block=False,
+**kwargs):
     '''Creates corresponding block object based on 'flatten' argument.
 
     items: Iterator
         Collection of Item objects
     flatten: Bool
         Enables and disables use `create_block()` or `create_deep_block()`.
+    bucket_block: Bool
+        Creates `BucketBlock` for integer priorities from 0 to 255. Its 
+        used when priorities of starting items allow it if None which
+        suits blocks not getting other items later, default: False.
     priority: Any
         Any object can sorted or support comparison operators.   
         It needs to be compatible with items priorities unless 
@@ -126,14 +162,31 @@ def create_mapping(items, priority=None, flatten=False, **kwargs):
         'median'.
     update_priorities: Bool
         Enables and disables updating of block and items priorities.
+    key: Callable
+        Maps priority to comparable key used for sorting, default: None.
+    reverse: Bool
+        Sorts items from highest to lowest priority, default: False.
+    tie_breaker: Callable
+        Maps item to secondary key for ordering items with equal keys.
+    workers: Int
+        Number of workers used for creating block, default: None.
 
     When 'flatten' is True, `create_deep_block()` will be used to create 
     block object else `create_block()`. Set 'flatten' argument to 
     True to remove any nested block objects and replace them with their 
     items.
+
+    Bucket block is never picked automatically when 'flatten' is True or
+    block priority, `key` or `tie_breaker` is provided.
     '''
     if flatten:
         return create_deep_block(items, priority, **kwargs)
+    if bucket_block is None:
+        # Items may be iterator which can only be consumed once.
+        items = list(items)
+        bucket_block = _can_use_buckets(items, priority, kwargs)
+    if bucket_block:
+        return bucket.BucketBlock(items, priority, **kwargs)
     else:
         return create_block(items, priority, **kwargs)
 
@@ -143,21 +196,30 @@ def create_mapping(items, priority=None, flatten=False, **kwargs):
 # It may be better to manually create block object for performance.
 # These functions are meant to give functional programming flavour.
 # Manually creating block object could result in few more advantages.
+# Blocks are reused for the same items when `mimap.cache` is enabled.
 ######################################################################
 
+def _get_mapping(items, **kwargs):
+    # Gets block for items reusing cached block when cache is enabled.
+    # Blocks from cache are shared, they should only be read.
+    # Bucket block is picked when priorities allow it as items are
+    # never added to blocks created here.
+    return cache.get_block(items, create_mapping, bucket_block=None, 
+        **kwargs)
+
 def items_to_priority_queue(items, flatten=False):
     '''Convert items into priority queue'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.to_priority_queue()
 
 def items_to_map_tuple(items, flatten=False):
     '''Convert items into map like tuple'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.to_tuple()
 
 def items_to_dict(items, flatten=False):
     '''Convert items into multi dict'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.to_dict()
 
 
@@ -178,75 +240,88 @@ def flatten_items(items):
     block objects. But items containg other items is something that wasnt
     planned for this library.
     '''
-    block_object = create_deep_block(items, update_priorities=False)
-    return block_object.get_items()
+    block_object = cache.get_block(items, create_deep_block, 
+        update_priorities=False)
+    # Items of cached block should not be modified.
+    return list(block_object.get_items())
 
 def sort_items_by_priority(items):
     '''Sorts items based on their priorities'''
-    block_object = create_block(items, update_priorities=False,
-    strict=False)
+    block_object = cache.get_block(items, create_block, 
+        update_priorities=False, strict=False)
     return block_object.get_sorted_items()
 
 def extract_objects(items, flatten=False):
     '''Extracts objects within items'''
     #return [_item.get_object() for _item in items]
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_objects()
 
 
 
 def find_items_by_priorities(items, priorities, flatten=False):
     '''Finds items with priorities matching any of priorities'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_items_by_priorities(priorities)
 
 def find_item_by_priorities(items, priorities, flatten=False):
     '''Finds item with priority matching any of priorities'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_item_by_priorities(priorities)
 
 
 def find_items_by_priority_range(items, start=None, end=None, flatten=False):
     '''Finds items with priorities in ramge'''
-    block_object = create_mapping(items, start=None, end=None, 
-    flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_items_by_priority_range(start, end)
 
 def find_item_by_priority_range(items, start=None, end=None, flatten=False):
     '''Finds item with priority in ramge'''
-    block_object = create_mapping(items, start=None, end=None, 
-    flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_item_by_priority_range(start, end)
 
 
+def find_items_by_priority_prefix(items, prefix, start=None, end=None, 
+flatten=False):
+    '''Finds items with tuple priorities starting with prefix'''
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
+    return block_object.get_items_by_priority_prefix(prefix, start, end)
+
+def find_item_by_priority_prefix(items, prefix, start=None, end=None, 
+flatten=False):
+    '''Finds item with tuple priority starting with prefix'''
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
+    return block_object.get_item_by_priority_prefix(prefix, start, end)
+
+
 def find_items_by_type(items, _type, flatten=False):
     '''Finds items with type matching provided type'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_items_by_type(_type)
 
 def find_item_by_type(items, _type, flatten=False):
     '''Finds item with type matching provided type'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_item_by_type(_type)
 
 
 def find_first_items(items, limit=3, flatten=False):
     '''Finds first items by priority'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_first_items(limit)
 
 def find_first_item(items, flatten=False):
     '''Finds the first item by priority'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_first_item()
 
 
 def find_last_items(items, limit=3, flatten=False):
     '''Finds last items by priority'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_last_items(limit)
 
 def find_last_item(items, flatten=False):
     '''Finds the last item by priority'''
-    block_object = create_mapping(items, flatten=flatten, strict=False)
+    block_object = _get_mapping(items, flatten=flatten, strict=False)
     return block_object.get_last_item()
@@ -0,0 +1,1036 @@
+from mimap import parallel
+
+from bisect import bisect_left
+from bisect import bisect_right
+import copy
+import heapq
+import itertools
+import math
+
+
+def _bisect_projected(keys, target, project, lo, hi, right=False):
+    # Binary search on keys projected with project function.
+    # Projected keys need to be sorted in same order as keys.
+    while lo < hi:
+        middle = (lo + hi) // 2
+        projected = project(keys[middle])
+        if projected < target or (right and projected == target):
+            lo = middle + 1
+        else:
+            hi = middle
+    return lo
+
+
+class Descending():
+    '''Wraps value reversing its comparison(for max heaps)'''
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class SortedIndex():
+    '''Keeps items sorted by keys computed once from their priorities.
+
+    Each item priority is mapped to a key with `key` function(priority
+    itself is used if key is None) and the key is cached next to item.
+    Sorting and searching then compare the cached keys without going
+    through item priority again.
+
+    Items with equal keys keep order in which they were provided unless
+    `tie_breaker` is provided. Sequence number of each item(its position
+    in the original sequence by default) is also kept which allows
+    results to be returned in that order.
+    
+    Tuple keys are sorted by their components which allows searching
+    keys by their leading components(prefix) using binary search.
+    
+    Items can be inserted and removed after index is created. Binary
+    search finds their positions while underlying lists shift items
+    after those positions.'''
+    def __init__(self, items, key=None, tie_breaker=None, seqs=None,
+    workers=None):
+        '''
+        items: Iterator
+            Collection of Item objects.
+        key: Callable
+            Maps priority to comparable key, default: None.
+        tie_breaker: Callable
+            Maps item to secondary key for ordering items with equal keys.
+        seqs: Iterator
+            Increasing sequence numbers of items, default: None.
+        workers: Int
+            Number of workers sorting chunks of keys, default: None.
+        '''
+        self._key = key
+        self._tie_breaker = tie_breaker
+        items = list(items)
+        if seqs is None:
+            seqs = range(len(items))
+        seqs = list(seqs)
+        def get_keys(chunk):
+            return [self.get_key(_item.get_priority()) for _item in chunk]
+        keys = parallel.map_chunks(get_keys, items, workers)
+        # Sorting is stable, equal keys keep their original order.
+        if tie_breaker is None:
+            order = parallel.sort_keys(keys, workers)
+            self._ties = None
+        else:
+            # Ties are (secondary key, sequence number) of items.
+            ties = [(tie_breaker(_item), seq) 
+                for _item, seq in zip(items, seqs)]
+            order = parallel.sort_keys(zip(keys, ties), workers)
+            self._ties = [ties[position] for position in order]
+        self._keys = [keys[position] for position in order]
+        self._items = [items[position] for position in order]
+        self._seqs = [seqs[position] for position in order]
+        # Descending items are created when first needed.
+        self._descending_items = None
+
+    def get_key(self, priority):
+        '''Gets key used for sorting and searching priority'''
+        if self._key is None:
+            return priority
+        return self._key(priority)
+
+    def get_keys(self):
+        '''Gets cached keys in ascending order'''
+        return self._keys
+
+    def get_items(self):
+        '''Gets items in ascending order of their keys'''
+        return self._items
+
+    def get_descending_items(self):
+        '''Gets items in descending order of their keys'''
+        # Items with equal keys still keep their original order.
+        # Thats the same order as sorted() with reverse=True.
+        if self._descending_items is None:
+            descending_items = []
+            end = len(self._keys)
+            while end > 0:
+                start = bisect_left(self._keys, self._keys[end-1], 0, end)
+                descending_items.extend(self._items[start:end])
+                end = start
+            self._descending_items = descending_items
+        return self._descending_items
+
+    def get_item_at(self, rank):
+        '''Gets item at rank of ascending order'''
+        return self._items[rank]
+
+    def count_slice(self, start, end):
+        '''Gets number of items within slice'''
+        return end - start
+
+    def iter_slice(self, start, end, descending=False, backward=False):
+        '''Yields items within slice in ascending or descending order
+
+        Items are yielded from the end of that order if `backward` is
+        True(last item first). Slice is (start, end) indexes returned by
+        find methods.'''
+        if not descending:
+            if backward:
+                positions = range(end - 1, start - 1, -1)
+            else:
+                positions = range(start, end)
+            for position in positions:
+                yield self._items[position]
+        elif backward:
+            # Groups of equal keys are visited from the lowest key.
+            while start < end:
+                group_end = bisect_right(self._keys, self._keys[start], 
+                    start, end)
+                for position in range(group_end - 1, start - 1, -1):
+                    yield self._items[position]
+                start = group_end
+        else:
+            # Items with equal keys still keep their original order.
+            while start < end:
+                group_start = bisect_left(self._keys, self._keys[end-1], 
+                    start, end)
+                for position in range(group_start, end):
+                    yield self._items[position]
+                end = group_start
+
+    def find(self, priority):
+        '''Returns start and end indexes of items matching priority'''
+        key = self.get_key(priority)
+        start = bisect_left(self._keys, key)
+        return start, bisect_right(self._keys, key, start)
+
+    def find_range(self, start=None, end=None):
+        '''Returns start and end indexes of items with priority in range'''
+        # Both 'start' and 'end' priorities are included.
+        if start is None:
+            lower = 0
+        else:
+            lower = bisect_left(self._keys, self.get_key(start))
+        if end is None:
+            upper = len(self._keys)
+        else:
+            upper = bisect_right(self._keys, self.get_key(end), lower)
+        return lower, max(lower, upper)
+
+    def _find_sorted(self, keys, right=False):
+        # Finds insertion indexes of keys within cached keys.
+        # Keys are searched in sorted order, each search starting where
+        # previous one ended(single merged pass over cached keys).
+        bisect = bisect_right if right else bisect_left
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        indexes = [0] * len(keys)
+        lower = 0
+        for position in order:
+            lower = bisect(self._keys, keys[position], lower)
+            indexes[position] = lower
+        return indexes
+
+    def find_many(self, priorities):
+        '''Returns start and end indexes of items matching each priority'''
+        keys = [self.get_key(priority) for priority in priorities]
+        starts = self._find_sorted(keys)
+        ends = self._find_sorted(keys, right=True)
+        return list(zip(starts, ends))
+
+    def find_ranges(self, ranges):
+        '''Returns start and end indexes of items within each range'''
+        # Missing start or end priority is represented by None.
+        ranges = list(ranges)
+        starts = [0] * len(ranges)
+        ends = [len(self._keys)] * len(ranges)
+        start_keys = {}
+        end_keys = {}
+        for position, (start, end) in enumerate(ranges):
+            if start is not None:
+                start_keys[position] = self.get_key(start)
+            if end is not None:
+                end_keys[position] = self.get_key(end)
+        indexes = self._find_sorted(list(start_keys.values()))
+        for position, lower in zip(start_keys, indexes):
+            starts[position] = lower
+        indexes = self._find_sorted(list(end_keys.values()), right=True)
+        for position, upper in zip(end_keys, indexes):
+            ends[position] = upper
+        return [(start, max(start, end)) for start, end in zip(starts, ends)]
+
+    def find_prefix(self, prefix, start=None, end=None):
+        '''Returns start and end indexes of keys starting with prefix
+
+        Component of key following prefix can be restricted to be within
+        range of `start` and `end`(both included). Keys need to be tuples
+        or other sequences sorted by their components.'''
+        prefix = tuple(prefix)
+        size = len(prefix)
+        def project_prefix(key):
+            return tuple(key[:size])
+        def project_component(key):
+            return tuple(key[:size+1])
+        keys_count = len(self._keys)
+        if start is None:
+            lower = _bisect_projected(self._keys, prefix, project_prefix,
+            0, keys_count)
+        else:
+            lower = _bisect_projected(self._keys, prefix + (start,),
+            project_component, 0, keys_count)
+        if end is None:
+            upper = _bisect_projected(self._keys, prefix, project_prefix,
+            lower, keys_count, right=True)
+        else:
+            upper = _bisect_projected(self._keys, prefix + (end,),
+            project_component, lower, keys_count, right=True)
+        return lower, upper
+
+    def get_ordered_items(self, slices):
+        '''Gets items within slices in their original order'''
+        # Slices are (start, end) indexes returned by find methods.
+        positions = []
+        for start, end in slices:
+            positions.extend(range(start, end))
+        positions.sort(key=self._seqs.__getitem__)
+        return [self._items[position] for position in positions]
+
+    def _locate(self, _item, seq, key):
+        # Returns position of item within items with equal key.
+        # Insertion position is returned if item is not in index.
+        start = bisect_left(self._keys, key)
+        end = bisect_right(self._keys, key, start)
+        if self._ties is None:
+            return bisect_left(self._seqs, seq, start, end)
+        tie = (self._tie_breaker(_item), seq)
+        return bisect_left(self._ties, tie, start, end)
+
+    def insert(self, _item, seq):
+        '''Inserts item with sequence number into index'''
+        # Sequence number should be greater than ones of previous items
+        # unless item is inserted back after priority change.
+        key = self.get_key(_item.get_priority())
+        position = self._locate(_item, seq, key)
+        self._keys.insert(position, key)
+        self._items.insert(position, _item)
+        self._seqs.insert(position, seq)
+        if self._ties is not None:
+            self._ties.insert(position, (self._tie_breaker(_item), seq))
+        self._descending_items = None
+
+    def remove(self, _item, seq):
+        '''Removes item with sequence number from index'''
+        try:
+            key = self.get_key(_item.get_priority())
+            position = self._locate(_item, seq, key)
+        except TypeError:
+            position = len(self._seqs)
+        if position >= len(self._seqs) or self._seqs[position] != seq:
+            # Priority of item was changed without updating the index.
+            position = self._seqs.index(seq)
+        del self._keys[position]
+        del self._items[position]
+        del self._seqs[position]
+        if self._ties is not None:
+            del self._ties[position]
+        self._descending_items = None
+
+    def update(self, removed, inserted):
+        '''Removes and inserts many (item, sequence number) in one pass
+
+        Remaining items and sorted inserted items are merged instead of
+        shifting lists for each item.'''
+        if (len(removed) + len(inserted)) * 64 < len(self._keys):
+            # Shifting lists for few items is faster than merging.
+            for _item, seq in removed:
+                self.remove(_item, seq)
+            for _item, seq in inserted:
+                self.insert(_item, seq)
+            return
+        removed_seqs = {seq for _, seq in removed}
+        kept = [position for position, seq in enumerate(self._seqs)
+            if seq not in removed_seqs]
+        keys = [self._keys[position] for position in kept]
+        items = [self._items[position] for position in kept]
+        seqs = [self._seqs[position] for position in kept]
+        for _item, seq in inserted:
+            keys.append(self.get_key(_item.get_priority()))
+            items.append(_item)
+            seqs.append(seq)
+        if self._ties is None:
+            orders = list(zip(keys, seqs))
+        else:
+            ties = [self._ties[position] for position in kept]
+            ties.extend((self._tie_breaker(_item), seq) 
+                for _item, seq in inserted)
+            orders = list(zip(keys, ties))
+        # Sorting finds remaining items as already sorted run.
+        order = sorted(range(len(orders)), key=orders.__getitem__)
+        self._keys = [keys[position] for position in order]
+        self._items = [items[position] for position in order]
+        self._seqs = [seqs[position] for position in order]
+        if self._ties is not None:
+            self._ties = [ties[position] for position in order]
+        self._descending_items = None
+
+    def copy(self):
+        '''Returns copy of index sharing items but not lists'''
+        copied_index = copy.copy(self)
+        copied_index._keys = list(self._keys)
+        copied_index._items = list(self._items)
+        copied_index._seqs = list(self._seqs)
+        if self._ties is not None:
+            copied_index._ties = list(self._ties)
+        return copied_index
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class HashIndex():
+    '''Groups items by their priorities in hash table.
+
+    Items with equal priorities can be found without searching or sorting
+    other items. Items of each priority are kept in order of their
+    sequence numbers while priorities are kept in order they were first
+    added. Priorities need to be hashable.'''
+    def __init__(self, items, seqs=None):
+        '''
+        items: Iterator
+            Collection of Item objects.
+        seqs: Iterator
+            Increasing sequence numbers of items, default: None.
+        '''
+        items = list(items)
+        if seqs is None:
+            seqs = range(len(items))
+        # Maps priority to dict of items by their sequence numbers.
+        self._groups = {}
+        for _item, seq in zip(items, seqs):
+            self._groups.setdefault(_item.get_priority(), {})[seq] = _item
+
+    def get_priorities(self):
+        '''Gets distinct priorities of items'''
+        return self._groups.keys()
+
+    def get_items(self, priority):
+        '''Gets items with priority in order of their sequence numbers'''
+        group = self._groups.get(priority)
+        if group is None:
+            return []
+        return list(group.values())
+
+    def get_ordered_items(self, priorities):
+        '''Gets items with any of priorities in order of sequences'''
+        records = []
+        # Same priority may be provided more than once.
+        for priority in dict.fromkeys(priorities):
+            group = self._groups.get(priority)
+            if group is not None:
+                records.extend(group.items())
+        records.sort(key=lambda record: record[0])
+        return [_item for _, _item in records]
+
+    def iter_groups(self):
+        '''Iterates priorities with their items in order of sequences'''
+        for priority, group in self._groups.items():
+            yield priority, group.values()
+
+    def insert(self, _item, seq):
+        '''Inserts item with sequence number into index'''
+        group = self._groups.setdefault(_item.get_priority(), {})
+        if group and seq < next(reversed(group)):
+            # Item was inserted back after priority change.
+            group[seq] = _item
+            self._groups[_item.get_priority()] = dict(sorted(group.items()))
+        else:
+            group[seq] = _item
+
+    def remove(self, _item, seq):
+        '''Removes item with sequence number from index'''
+        priority = _item.get_priority()
+        group = self._groups.get(priority)
+        if group is None or seq not in group:
+            # Priority of item was changed without updating the index.
+            for priority, group in self._groups.items():
+                if seq in group:
+                    break
+        del group[seq]
+        if not group:
+            del self._groups[priority]
+
+    def copy(self):
+        '''Returns copy of index sharing items but not groups'''
+        copied_index = copy.copy(self)
+        copied_index._groups = {priority: dict(group)
+            for priority, group in self._groups.items()}
+        return copied_index
+
+    def __len__(self):
+        return len(self._groups)
+
+
+class BucketIndex():
+    '''Keeps items in buckets of their integer priorities.
+
+    Each priority from 0 to `size - 1` has bucket keeping its items in
+    order of their sequence numbers(first in, first out). Bitmap with bit
+    set for each non-empty bucket finds lowest and highest priorities
+    without looking at empty buckets.
+
+    Methods returning slices return (start, end) priorities of buckets
+    instead of positions of items, `get_ordered_items()` accepts them the
+    same way as slices of SortedIndex.'''
+    def __init__(self, items, seqs=None, size=256):
+        '''
+        items: Iterator
+            Collection of Item objects with integer priorities.
+        seqs: Iterator
+            Increasing sequence numbers of items, default: None.
+        size: Int
+            Number of buckets(priorities), default: 256.
+        '''
+        items = list(items)
+        if seqs is None:
+            seqs = range(len(items))
+        self._size = size
+        self._buckets = [{} for _ in range(size)]
+        self._bitmap = 0
+        self._length = 0
+        for _item, seq in zip(items, seqs):
+            self.insert(_item, seq)
+
+    @staticmethod
+    def to_bucket(priority, size):
+        '''Gets bucket of priority, None if priority has no bucket'''
+        if isinstance(priority, bool) or \
+            not isinstance(priority, (int, float)):
+            return None
+        if priority != int(priority) or not 0 <= priority < size:
+            return None
+        return int(priority)
+
+    def get_key(self, priority):
+        '''Gets key used for sorting and searching priority'''
+        return priority
+
+    def _iter_buckets(self, bitmap, descending=False):
+        # Yields buckets whose bits are set in bitmap.
+        while bitmap:
+            if descending:
+                bucket = bitmap.bit_length() - 1
+                bitmap ^= 1 << bucket
+            else:
+                lowest = bitmap & -bitmap
+                bucket = lowest.bit_length() - 1
+                bitmap ^= lowest
+            yield bucket
+
+    def iter_items(self, descending=False, backward=False):
+        '''Yields items in ascending or descending order of priorities
+
+        Items are yielded from the end of that order if `backward` is
+        True(last item first).'''
+        for bucket in self._iter_buckets(self._bitmap, 
+            descending != backward):
+            if backward:
+                yield from reversed(self._buckets[bucket].values())
+            else:
+                yield from self._buckets[bucket].values()
+
+    def iter_slice(self, start, end, descending=False, backward=False):
+        '''Yields items within slice of buckets in order of priorities'''
+        bitmap = 0
+        if start < end:
+            bitmap = (((1 << (end - start)) - 1) << start) & self._bitmap
+        for bucket in self._iter_buckets(bitmap, descending != backward):
+            if backward:
+                yield from reversed(self._buckets[bucket].values())
+            else:
+                yield from self._buckets[bucket].values()
+
+    def get_items(self):
+        '''Gets items in ascending order of their priorities'''
+        return list(self.iter_items())
+
+    def get_descending_items(self):
+        '''Gets items in descending order of their priorities'''
+        # Items with equal priorities still keep their original order.
+        return list(self.iter_items(descending=True))
+
+    def get_first_bucket(self):
+        '''Gets lowest priority with items, None if there are no items'''
+        if not self._bitmap:
+            return None
+        return (self._bitmap & -self._bitmap).bit_length() - 1
+
+    def get_last_bucket(self):
+        '''Gets highest priority with items, None if there are no items'''
+        if not self._bitmap:
+            return None
+        return self._bitmap.bit_length() - 1
+
+    def get_bucket(self, bucket):
+        '''Gets dict of items of bucket by their sequence numbers'''
+        return self._buckets[bucket]
+
+    def get_count(self, priority):
+        '''Gets number of items with priority'''
+        bucket = self.to_bucket(priority, self._size)
+        if bucket is None:
+            return 0
+        return len(self._buckets[bucket])
+
+    def get_item_at(self, rank):
+        '''Gets item at rank of ascending order'''
+        for bucket in self._iter_buckets(self._bitmap):
+            items = self._buckets[bucket]
+            if rank < len(items):
+                return next(itertools.islice(items.values(), rank, None))
+            rank -= len(items)
+        raise IndexError("rank out of range")
+
+    def count_slice(self, start, end):
+        '''Gets number of items within slice of buckets'''
+        bitmap = 0
+        if start < end:
+            bitmap = (((1 << (end - start)) - 1) << start) & self._bitmap
+        return sum(len(self._buckets[bucket]) 
+            for bucket in self._iter_buckets(bitmap))
+
+    def find(self, priority):
+        '''Returns start and end buckets of items matching priority'''
+        bucket = self.to_bucket(priority, self._size)
+        if bucket is None:
+            return 0, 0
+        return bucket, bucket + 1
+
+    def find_range(self, start=None, end=None):
+        '''Returns start and end buckets of items with priority in range'''
+        # Both 'start' and 'end' priorities are included.
+        lower = 0 if start is None else max(math.ceil(start), 0)
+        upper = self._size if end is None else \
+            min(math.floor(end) + 1, self._size)
+        return lower, max(lower, upper)
+
+    def find_many(self, priorities):
+        '''Returns start and end buckets of items matching each priority'''
+        return [self.find(priority) for priority in priorities]
+
+    def find_ranges(self, ranges):
+        '''Returns start and end buckets of items within each range'''
+        return [self.find_range(start, end) for start, end in ranges]
+
+    def find_prefix(self, prefix, start=None, end=None):
+        '''Priorities of buckets are integers which have no prefix'''
+        raise TypeError("Integer priorities cant be searched by prefix")
+
+    def get_ordered_items(self, slices):
+        '''Gets items within slices of buckets in their original order'''
+        bitmap = 0
+        for start, end in slices:
+            if start < end:
+                bitmap |= ((1 << (end - start)) - 1) << start
+        bitmap &= self._bitmap
+        buckets = list(self._iter_buckets(bitmap))
+        if len(buckets) == 1:
+            return list(self._buckets[buckets[0]].values())
+        records = []
+        for bucket in buckets:
+            records.extend(self._buckets[bucket].items())
+        records.sort(key=lambda record: record[0])
+        return [record[1] for record in records]
+
+    def insert(self, _item, seq):
+        '''Inserts item with sequence number into index'''
+        bucket = self.to_bucket(_item.get_priority(), self._size)
+        if bucket is None:
+            err_msg = "Priority should be integer from 0 to {} not '{}'"
+            raise ValueError(err_msg.format(self._size - 1, 
+                _item.get_priority()))
+        items = self._buckets[bucket]
+        if items and seq < next(reversed(items)):
+            # Item was inserted back after priority change.
+            items[seq] = _item
+            self._buckets[bucket] = dict(sorted(items.items()))
+        else:
+            items[seq] = _item
+        self._bitmap |= 1 << bucket
+        self._length += 1
+
+    def update(self, removed, inserted):
+        '''Removes and inserts many (item, sequence number)'''
+        for _item, seq in removed:
+            self.remove(_item, seq)
+        for _item, seq in inserted:
+            self.insert(_item, seq)
+
+    def remove(self, _item, seq):
+        '''Removes item with sequence number from index'''
+        bucket = self.to_bucket(_item.get_priority(), self._size)
+        if bucket is None or seq not in self._buckets[bucket]:
+            # Priority of item was changed without updating the index.
+            bucket = next(bucket for bucket in 
+                self._iter_buckets(self._bitmap)
+                if seq in self._buckets[bucket])
+        items = self._buckets[bucket]
+        del items[seq]
+        if not items:
+            self._bitmap &= ~(1 << bucket)
+        self._length -= 1
+
+    def copy(self):
+        '''Returns copy of index sharing items but not buckets'''
+        copied_index = copy.copy(self)
+        copied_index._buckets = [dict(items) for items in self._buckets]
+        return copied_index
+
+    def __len__(self):
+        return self._length
+
+
+class HeapIndex():
+    '''Keeps items in two heaps for taking first and last items.
+
+    Items are ordered the same way as by SortedIndex. Min heap has first
+    item at its top and max heap has last item at its top. Adding item
+    and taking item from either end takes logarithmic time.
+
+    Removed items stay in heaps until they reach their tops, they are
+    then discarded(lazy deletion). Heaps are rebuilt without removed
+    items once they make up most of heaps.'''
+    def __init__(self, items, key=None, tie_breaker=None, seqs=None,
+    reverse=False):
+        '''
+        items: Iterator
+            Collection of Item objects.
+        key: Callable
+            Maps priority to comparable key, default: None.
+        tie_breaker: Callable
+            Maps item to secondary key for ordering items with equal keys.
+        seqs: Iterator
+            Increasing sequence numbers of items, default: None.
+        reverse: Bool
+            Orders items from highest to lowest key, default: False.
+        '''
+        self._key = key
+        self._tie_breaker = tie_breaker
+        self._reverse = reverse
+        items = list(items)
+        if seqs is None:
+            seqs = range(len(items))
+        # Maps sequence number of item to version of its heap entries.
+        # Entries whose version is not current belong to removed items.
+        self._versions = {}
+        self._version = 0
+        self._min_heap = []
+        self._max_heap = []
+        for _item, seq in zip(items, seqs):
+            self._min_heap.append(self._create_entry(_item, seq))
+        self._max_heap = [(Descending(entry[0]),) + entry[1:]
+            for entry in self._min_heap]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+
+    def _create_entry(self, _item, seq):
+        # Returns entry of min heap registering its version.
+        key = _item.get_priority()
+        if self._key is not None:
+            key = self._key(key)
+        if self._reverse:
+            # Equal keys still keep their original order.
+            key = Descending(key)
+        if self._tie_breaker is None:
+            order = (key, seq)
+        else:
+            order = (key, self._tie_breaker(_item), seq)
+        self._version += 1
+        self._versions[seq] = self._version
+        return (order, seq, self._version, _item)
+
+    def _get_top(self, heap):
+        # Returns entry at top of heap discarding removed entries.
+        while heap and self._versions.get(heap[0][1]) != heap[0][2]:
+            heapq.heappop(heap)
+        if heap:
+            return heap[0]
+
+    def peek_first(self):
+        '''Gets (sequence number, item) of first item, None if empty'''
+        entry = self._get_top(self._min_heap)
+        if entry is not None:
+            return entry[1], entry[3]
+
+    def peek_last(self):
+        '''Gets (sequence number, item) of last item, None if empty'''
+        entry = self._get_top(self._max_heap)
+        if entry is not None:
+            return entry[1], entry[3]
+
+    def insert(self, _item, seq):
+        '''Inserts item with sequence number into index'''
+        entry = self._create_entry(_item, seq)
+        heapq.heappush(self._min_heap, entry)
+        heapq.heappush(self._max_heap, (Descending(entry[0]),) + entry[1:])
+
+    def remove(self, _item, seq):
+        '''Removes item with sequence number from index'''
+        del self._versions[seq]
+        if len(self._min_heap) > 2 * len(self._versions) + 32:
+            for heap in (self._min_heap, self._max_heap):
+                heap[:] = [entry for entry in heap
+                    if self._versions.get(entry[1]) == entry[2]]
+                heapq.heapify(heap)
+
+    def copy(self):
+        '''Returns copy of index sharing items but not heaps'''
+        copied_index = copy.copy(self)
+        copied_index._versions = dict(self._versions)
+        copied_index._min_heap = list(self._min_heap)
+        copied_index._max_heap = list(self._max_heap)
+        return copied_index
+
+    def __len__(self):
+        return len(self._versions)
+
+
+class WeightIndex():
+    '''Keeps priorities of items as weights for drawing random items.
+
+    Weights are kept in Fenwick tree(binary indexed tree) which updates
+    sums of weights and finds item at cumulative weight in logarithmic
+    time. Each inserted item takes next slot of tree, removed items
+    leave slots with zero weight until tree is rebuilt without them.
+    Priorities need to be non negative numbers.'''
+    def __init__(self, items, seqs=None):
+        '''
+        items: Iterator
+            Collection of Item objects with numeric priorities.
+        seqs: Iterator
+            Sequence numbers of items, default: None.
+        '''
+        items = list(items)
+        if seqs is None:
+            seqs = range(len(items))
+        # Records are (sequence number, item, weight) of slots.
+        records = [(seq, _item, _item.get_priority()) 
+            for seq, _item in zip(seqs, items)]
+        for record in records:
+            self._check_weight(record[2])
+        self._records = records
+        self._slots = {record[0]: slot for slot, record in enumerate(records)}
+        # Tree is built in linear time by adding each node to its parent.
+        self._tree = [0] + [record[2] for record in records]
+        for node in range(1, len(self._tree)):
+            parent = node + (node & -node)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[node]
+        self._total = sum(record[2] for record in records)
+
+    @staticmethod
+    def _check_weight(weight):
+        # Raises error if weight is not non negative number.
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            err_msg = "Priority should be number to be used as weight " +\
+                "not '{}'"
+            raise TypeError(err_msg.format(weight))
+        if weight < 0:
+            err_msg = "Priority used as weight cant be negative '{}'"
+            raise ValueError(err_msg.format(weight))
+
+    def _add(self, slot, weight):
+        # Adds weight to slot updating sums containing it.
+        node = slot + 1
+        while node < len(self._tree):
+            self._tree[node] += weight
+            node += node & -node
+        self._total += weight
+
+    def _rebuild(self):
+        # Creates tree again from slots of items not removed.
+        records = [record for record in self._records if record is not None]
+        self.__init__([record[1] for record in records], 
+            [record[0] for record in records])
+
+    def get_total(self):
+        '''Gets sum of weights of items'''
+        return self._total
+
+    def find(self, weight):
+        '''Gets item at cumulative weight from 0 up to total weight'''
+        node = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            next_node = node + step
+            if next_node < len(self._tree) and \
+                self._tree[next_node] <= weight:
+                node = next_node
+                weight -= self._tree[node]
+            step >>= 1
+        # Slots of removed items are skipped over as they weigh nothing.
+        for slot in range(min(node, len(self._records) - 1), -1, -1):
+            if self._records[slot] is not None:
+                return self._records[slot][1]
+        return None
+
+    def insert(self, _item, seq):
+        '''Inserts item with sequence number into index'''
+        weight = _item.get_priority()
+        self._check_weight(weight)
+        slot = len(self._records)
+        self._records.append((seq, _item, weight))
+        self._slots[seq] = slot
+        # New node covers sum of slots below it within its range.
+        node = slot + 1
+        low = node - (node & -node)
+        self._tree.append(weight + self._get_prefix(node - 1) - 
+            self._get_prefix(low))
+        self._total += weight
+
+    def _get_prefix(self, count):
+        # Gets sum of weights of first count slots.
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+    def remove(self, _item, seq):
+        '''Removes item with sequence number from index'''
+        slot = self._slots.pop(seq)
+        weight = self._records[slot][2]
+        self._records[slot] = None
+        self._add(slot, -weight)
+        if len(self._records) > 2 * len(self._slots) + 32:
+            self._rebuild()
+
+    def copy(self):
+        '''Returns copy of index sharing items but not tree'''
+        copied_index = copy.copy(self)
+        copied_index._records = list(self._records)
+        copied_index._slots = dict(self._slots)
+        copied_index._tree = list(self._tree)
+        return copied_index
+
+    def __len__(self):
+        return len(self._slots)
+
+
+class _SumTree():
+    # Fenwick trees of counts and sums of priorities of sorted keys.
+    def __init__(self, keys, totals):
+        self.keys = keys
+        self.positions = {key: position for position, key in enumerate(keys)}
+        # Totals are [count, sum] of items with each key.
+        self.totals = totals
+        # Trees are built in linear time by adding each node to its parent.
+        self.counts = [0] + [total[0] for total in totals]
+        self.sums = [0] + [total[1] for total in totals]
+        for node in range(1, len(self.counts)):
+            parent = node + (node & -node)
+            if parent < len(self.counts):
+                self.counts[parent] += self.counts[node]
+                self.sums[parent] += self.sums[node]
+
+    def add(self, position, count, total):
+        # Adds count and sum to key at position.
+        self.totals[position][0] += count
+        self.totals[position][1] += total
+        node = position + 1
+        while node < len(self.counts):
+            self.counts[node] += count
+            self.sums[node] += total
+            node += node & -node
+
+    def get_prefix(self, position):
+        # Gets count and sum of items with keys before position.
+        count, total = 0, 0
+        while position > 0:
+            count += self.counts[position]
+            total += self.sums[position]
+            position -= position & -position
+        return count, total
+
+    def copy(self):
+        copied_tree = copy.copy(self)
+        copied_tree.totals = [list(total) for total in self.totals]
+        copied_tree.counts = list(self.counts)
+        copied_tree.sums = list(self.sums)
+        return copied_tree
+
+
+class SumIndex():
+    '''Keeps counts and sums of priorities of items by their keys.
+
+    Distinct keys are kept sorted with counts and sums of priorities of
+    their items in Fenwick trees(binary indexed trees). Keys not seen
+    before get tree of their own which is merged with trees of the same
+    size, each tree being at most half the size of previous one. Count
+    and sum of items with keys in range then take logarithmic time for
+    each of the few trees and so does inserting or removing items.
+    Priorities need to be numbers and their keys need to be hashable.'''
+    def __init__(self, items, key=None):
+        '''
+        items: Iterator
+            Collection of Item objects with numeric priorities.
+        key: Callable
+            Maps priority to comparable key, default: None.
+        '''
+        self._key = key
+        totals = {}
+        for _item in items:
+            priority = _item.get_priority()
+            self._check_priority(priority)
+            key = self.get_key(priority)
+            if key not in totals:
+                totals[key] = [0, 0]
+            totals[key][0] += 1
+            totals[key][1] += priority
+        keys = sorted(totals)
+        self._trees = [_SumTree(keys, [totals[key] for key in keys])]
+        self._length = sum(total[0] for total in totals.values())
+        self._size = len(keys)
+
+    def get_key(self, priority):
+        '''Gets key used for sorting and searching priority'''
+        if self._key is None:
+            return priority
+        return self._key(priority)
+
+    @staticmethod
+    def _check_priority(priority):
+        # Raises error if priority is not number.
+        if isinstance(priority, bool) or \
+            not isinstance(priority, (int, float)):
+            err_msg = "Priority should be number to be summed not '{}'"
+            raise TypeError(err_msg.format(priority))
+
+    def _merge(self, first_tree, second_tree):
+        # Creates tree with keys of both trees dropping keys without items.
+        merged = sorted(itertools.chain(
+            zip(first_tree.keys, first_tree.totals), 
+            zip(second_tree.keys, second_tree.totals)), 
+            key=lambda pair: pair[0])
+        merged = [pair for pair in merged if pair[1][0]]
+        self._size += len(merged) - len(first_tree.keys) - \
+            len(second_tree.keys)
+        return _SumTree([pair[0] for pair in merged], 
+            [pair[1] for pair in merged])
+
+    def _update(self, _item, sign):
+        # Adds or removes item from tree of its key.
+        priority = _item.get_priority()
+        self._check_priority(priority)
+        key = self.get_key(priority)
+        self._length += sign
+        for tree in self._trees:
+            position = tree.positions.get(key)
+            if position is not None:
+                tree.add(position, sign, sign * priority)
+                return
+        # Key was not seen before, it gets tree of its own.
+        self._trees.append(_SumTree([key], [[sign, sign * priority]]))
+        self._size += 1
+        while len(self._trees) > 1 and \
+            len(self._trees[-2].keys) <= len(self._trees[-1].keys):
+            second_tree = self._trees.pop()
+            self._trees[-1] = self._merge(self._trees[-1], second_tree)
+        if self._size > 2 * self._length + 32:
+            # Most of keys no longer have items.
+            merged_tree = self._trees[0]
+            for tree in self._trees[1:]:
+                merged_tree = self._merge(merged_tree, tree)
+            self._trees = [merged_tree]
+
+    def insert(self, _item, seq):
+        '''Inserts item with sequence number into index'''
+        self._update(_item, 1)
+
+    def remove(self, _item, seq):
+        '''Removes item with sequence number from index'''
+        self._update(_item, -1)
+
+    def get_totals(self, start=None, end=None):
+        '''Returns count and sum of items with priority in range'''
+        # Both 'start' and 'end' priorities are included.
+        count, total = 0, 0
+        for tree in self._trees:
+            lower = 0 if start is None else \
+                bisect_left(tree.keys, self.get_key(start))
+            upper = len(tree.keys) if end is None else \
+                bisect_right(tree.keys, self.get_key(end))
+            if lower < upper:
+                upper_count, upper_total = tree.get_prefix(upper)
+                lower_count, lower_total = tree.get_prefix(lower)
+                count += upper_count - lower_count
+                total += upper_total - lower_total
+        return count, total
+
+    def copy(self):
+        '''Returns copy of index sharing keys but not trees'''
+        copied_index = copy.copy(self)
+        copied_index._trees = [tree.copy() for tree in self._trees]
+        return copied_index
+
+    def __len__(self):
+        return self._length
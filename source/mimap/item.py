@@ -40,6 +40,16 @@ class Item(pemap.Item):
         '''Gets priority priority for this object'''
         self._value.set_value(priority)
 
+    def get_priority_object(self):
+        '''Gets Priority object holding priority of this object'''
+        return self._value
+
+    def set_priority_object(self, _priority):
+        '''Sets Priority object holding priority of this object
+
+        Priority object may be shared with other items.'''
+        self._value = _priority
+
 
 if __name__ == "__main__":
 
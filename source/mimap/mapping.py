@@ -0,0 +1,58 @@
+from collections.abc import Mapping
+
+
+def unique_objects(objects):
+    '''Gets objects without repeated ones keeping their order
+
+    Objects are compared by hash and equality, unhashable objects are
+    compared by identity.'''
+    seen_objects = set()
+    seen_ids = set()
+    unique = []
+    for _object in objects:
+        try:
+            if _object in seen_objects:
+                continue
+            seen_objects.add(_object)
+        except TypeError:
+            if id(_object) in seen_ids:
+                continue
+            seen_ids.add(id(_object))
+        unique.append(_object)
+    return unique
+
+
+class PriorityMapping(Mapping):
+    '''Read-only view mapping priorities of block to underlying objects.
+
+    Nothing is copied when view is created, objects are looked up from
+    block when accessed which means view reflects later changes to block.
+    Each priority maps to object of first item with that priority or to
+    list of distinct objects of those items if `multi` is True.
+    Priorities are in order they were first added to block.'''
+    def __init__(self, block, multi=False):
+        '''
+        block: Block
+            Block whose priorities and objects are viewed.
+        multi: Bool
+            Maps priority to list of all its objects, default: False.
+        '''
+        self._block = block
+        self._multi = multi
+
+    def __getitem__(self, priority):
+        items = self._block._get_priority_group(priority)
+        if not items:
+            raise KeyError(priority)
+        if self._multi:
+            return unique_objects(_item.get_object() for _item in items)
+        return items[0].get_object()
+
+    def __iter__(self):
+        return iter(self._block._get_group_priorities())
+
+    def __len__(self):
+        return len(self._block._get_group_priorities())
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, dict(self))
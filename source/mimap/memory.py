@@ -0,0 +1,51 @@
+'''Estimates memory used by objects of blocks.
+
+Sizes are sums of `sys.getsizeof()` of objects reachable from the
+measured object. Containers and objects of this library are followed
+into their contents while classes, functions and modules are never
+counted. Objects are counted once even when reached more than once.'''
+import sys
+import types
+
+
+# Objects that are shared by the whole program rather than owned.
+_skipped_types = (type, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, types.ModuleType)
+_followed_modules = ("mimap", "pemap")
+
+
+def _is_followed(_object):
+    # Checks if attributes of object belong to it(objects of library).
+    module = type(_object).__module__ or ""
+    return module.split(".")[0] in _followed_modules
+
+def get_size(_object, seen=None, follow=True):
+    '''Gets bytes used by object and objects reachable from it
+
+    Objects whose ids are in `seen` are not counted and ids of counted
+    objects are added to it. Contents of containers and objects of this
+    library are only counted if `follow` is True.'''
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [_object]
+    while stack:
+        _object = stack.pop()
+        if id(_object) in seen or isinstance(_object, _skipped_types):
+            continue
+        seen.add(id(_object))
+        size += sys.getsizeof(_object)
+        if not follow:
+            continue
+        if isinstance(_object, dict):
+            stack.extend(_object.keys())
+            stack.extend(_object.values())
+        elif isinstance(_object, (list, tuple, set, frozenset)):
+            stack.extend(_object)
+        elif _is_followed(_object):
+            if hasattr(_object, "__dict__"):
+                stack.append(_object.__dict__)
+            for name in getattr(type(_object), "__slots__", ()):
+                if hasattr(_object, name):
+                    stack.append(getattr(_object, name))
+    return size
@@ -0,0 +1,115 @@
+'''Helpers for creating blocks with multiple workers.
+
+Work is split into chunks processed by pool of workers. Workers are
+only used on free-threaded python builds where threads run at the same
+time. With global interpreter lock, sending keys to processes costs more
+than sorting them, 4 processes sorted 300k keys at 0.54x to 0.87x the
+speed of sorting them in current process.'''
+from bisect import bisect_left
+import concurrent.futures
+import sys
+
+
+def is_free_threaded():
+    '''Checks if python runs without global interpreter lock'''
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+def create_executor(workers):
+    '''Creates pool of workers suited for current python build'''
+    if is_free_threaded():
+        return concurrent.futures.ThreadPoolExecutor(workers)
+    return concurrent.futures.ProcessPoolExecutor(workers)
+
+def split(sequence, chunks):
+    '''Splits sequence into at most `chunks` slices of similar size'''
+    chunks = max(min(chunks, len(sequence)), 1)
+    size = max(-(-len(sequence) // chunks), 1)
+    return [sequence[start:start+size]
+        for start in range(0, len(sequence), size)]
+
+def _sort_chunk(keys, offset):
+    # Sorts chunk of keys returning sorted keys with their positions.
+    # Defined at module level so that processes can receive it.
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return [keys[position] for position in order], \
+        [offset + position for position in order]
+
+def _merge_runs(runs):
+    # Merges sorted runs of keys returning positions of merged keys.
+    # Runs are concatenated and sorted again which finds them as already
+    # sorted runs, equal keys keep order of runs.
+    keys = []
+    positions = []
+    for run_keys, run_positions in runs:
+        keys.extend(run_keys)
+        positions.extend(run_positions)
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return [positions[position] for position in order]
+
+def _find_splitters(sorted_chunks, count):
+    # Picks keys splitting sorted chunks into parts of similar size.
+    samples = []
+    for chunk_keys, _ in sorted_chunks:
+        step = max(len(chunk_keys) // (count * 4), 1)
+        samples.extend(chunk_keys[::step])
+    samples.sort()
+    return [samples[len(samples) * part // count] 
+        for part in range(1, count)]
+
+def sort_keys(keys, workers, executor=None):
+    '''Returns positions of keys in their stable sorted order
+
+    Keys are sorted with sample sort. Each worker sorts chunk of keys,
+    sorted chunks are split into key ranges and each worker merges one
+    range from all chunks. Current process only splits and concatenates
+    results. Keys are sorted in current process unless python build is
+    free-threaded or `executor` is provided, processes are slower.'''
+    keys = list(keys)
+    if workers is None or workers < 2 or len(keys) < 2 or \
+        (executor is None and not is_free_threaded()):
+        return sorted(range(len(keys)), key=keys.__getitem__)
+    chunks = split(keys, workers)
+    offsets = [0]
+    for chunk in chunks[:-1]:
+        offsets.append(offsets[-1] + len(chunk))
+    own_executor = executor is None
+    if own_executor:
+        executor = create_executor(workers)
+    try:
+        sorted_chunks = list(executor.map(_sort_chunk, chunks, offsets))
+        splitters = _find_splitters(sorted_chunks, len(chunks))
+        # Equal keys end up in the same range as splitters are searched
+        # from the left in every chunk.
+        ranges = [[] for _ in range(len(splitters) + 1)]
+        for chunk_keys, chunk_positions in sorted_chunks:
+            start = 0
+            for part, splitter in enumerate(splitters + [None]):
+                if splitter is None:
+                    end = len(chunk_keys)
+                else:
+                    end = bisect_left(chunk_keys, splitter, start)
+                ranges[part].append((chunk_keys[start:end], 
+                    chunk_positions[start:end]))
+                start = end
+        positions = []
+        for range_positions in executor.map(_merge_runs, ranges):
+            positions.extend(range_positions)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return positions
+
+def map_chunks(function, sequence, workers):
+    '''Applies function to chunks of sequence using threads
+
+    Results of chunks are concatenated in order of chunks. Threads only
+    run at the same time on free-threaded python builds, function is
+    applied in current thread otherwise.'''
+    if workers is None or workers < 2 or not is_free_threaded():
+        return function(sequence)
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        for result in executor.map(function, split(sequence, workers)):
+            results.extend(result)
+    return results
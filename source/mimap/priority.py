@@ -13,3 +13,12 @@ class Priority(pemap.Value):
     def set_priority(self, priority):
         # Sets priority value
         self.set_value(priority)
+
+
+class SharedPriority(Priority):
+    # Priority shared by items which cant be changed in place.
+    # Items get other priority object instead when priority changes.
+    def set_value(self, value):
+        err_msg = "Priority shared by items cant be changed, set " +\
+            "priority of item through its block"
+        raise TypeError(err_msg)
@@ -0,0 +1,176 @@
+'''Opt-in counters and timings for block operations.
+
+Block objects record what they spend time on (sorting, copying items,
+scanning, index lookups and flattening nested blocks) only when
+profiling is enabled. When disabled, instrumented code only checks
+`enabled` attribute of this module and skips everything else.
+
+    from mimap import profiling
+
+    with profiling.capture() as counters:
+        block.get_sorted_items()
+    counters.get_count("sorts") # 1
+'''
+import contextlib
+import time
+
+
+__all__ = [
+    "Counters",
+    "enable",
+    "disable",
+    "is_enabled",
+    "capture",
+    "add_hook",
+    "remove_hook",
+    "get_counters",
+    "reset"
+]
+
+# Events recorded by block objects.
+EVENTS = (
+    "sorts",
+    "copies",
+    "scans",
+    "index_hits",
+    "index_misses",
+    "flattens"
+)
+
+# Checked by instrumented code before recording anything.
+# Use enable() and disable() instead of setting it directly.
+enabled = False
+
+# Counters receiving every recorded event.
+_global_counters = None
+# Counters of capture() context managers currently active.
+_captures = []
+# Callables called with (block, event, count, elapsed) on each event.
+_hooks = []
+
+
+class Counters():
+    '''Keeps counts and cumulative timings of block operations.
+
+    Count of event is the number of units processed by operation,
+    e.g number of items copied for 'copies' event. Time is cumulative
+    time in seconds spent on operations of the event.'''
+    def __init__(self) -> None:
+        self._counts = dict.fromkeys(EVENTS, 0)
+        self._timings = dict.fromkeys(EVENTS, 0.0)
+        self._calls = dict.fromkeys(EVENTS, 0)
+
+    def record(self, event, count=1, elapsed=0.0):
+        '''Records event processing `count` units for `elapsed` seconds'''
+        if event not in self._counts:
+            err_msg = "event should be one of {} not '{}'"
+            raise ValueError(err_msg.format(EVENTS, event))
+        self._counts[event] += count
+        self._timings[event] += elapsed
+        self._calls[event] += 1
+
+    def get_count(self, event):
+        '''Gets number of units processed by event'''
+        return self._counts[event]
+
+    def get_calls(self, event):
+        '''Gets number of times event was recorded'''
+        return self._calls[event]
+
+    def get_time(self, event):
+        '''Gets cumulative time in seconds spent on event'''
+        return self._timings[event]
+
+    def to_dict(self):
+        '''Returns dict mapping event to its count, calls and time'''
+        return {
+            event: {
+                "count": self._counts[event],
+                "calls": self._calls[event],
+                "time": self._timings[event]
+            }
+            for event in EVENTS
+        }
+
+    def reset(self):
+        '''Sets counts and timings of all events back to zero'''
+        self.__init__()
+
+
+_global_counters = Counters()
+
+
+def enable():
+    '''Enables recording of block operations'''
+    global enabled
+    enabled = True
+
+def disable():
+    '''Disables recording of block operations'''
+    global enabled
+    enabled = False
+
+def is_enabled():
+    '''Checks if block operations are being recorded'''
+    return enabled
+
+def start():
+    # Returns start time for operation being recorded.
+    return time.perf_counter()
+
+def record(block, event, count=1, started=None):
+    # Records event on global, block and captured counters.
+    # Instrumented code should only call this if profiling is enabled.
+    if started is not None:
+        elapsed = time.perf_counter() - started
+    else:
+        elapsed = 0.0
+    _global_counters.record(event, count, elapsed)
+    if block is not None:
+        get_counters(block).record(event, count, elapsed)
+    for counters in _captures:
+        counters.record(event, count, elapsed)
+    for hook in _hooks:
+        hook(block, event, count, elapsed)
+
+def get_counters(block=None):
+    '''Gets counters of block or global counters if block is None'''
+    if block is None:
+        return _global_counters
+    # Block counters are only created once something is recorded.
+    counters = block.__dict__.get("_counters")
+    if counters is None:
+        counters = Counters()
+        block._counters = counters
+    return counters
+
+def reset():
+    '''Resets global counters'''
+    _global_counters.reset()
+
+def add_hook(hook):
+    '''Adds callable called with (block, event, count, elapsed) on events.
+
+    Block is None for events not tied to block object. Hooks are
+    called synchronously which means slow hook slows down block.'''
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    '''Removes hook previously added with add_hook()'''
+    _hooks.remove(hook)
+
+@contextlib.contextmanager
+def capture():
+    '''Enables profiling and yields counters for events within context.
+
+    Profiling is restored to its previous state after context exits.'''
+    global enabled
+    counters = Counters()
+    previous_state = enabled
+    _captures.append(counters)
+    enabled = True
+    try:
+        yield counters
+    finally:
+        _captures.remove(counters)
+        enabled = previous_state
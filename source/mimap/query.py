@@ -0,0 +1,153 @@
+'''Queries combining conditions on items of block in one pass.
+
+Query collects conditions and runs them when results are requested.
+Priority range is searched in index of block, items within the range
+are then filtered lazily in order of their priorities. Taking first
+items stops once enough items were found without filtering, copying
+or sorting the rest.'''
+from mimap import block
+
+import heapq
+import itertools
+
+
+class Query():
+    '''Builds query of items of block run when results are requested
+
+    Each method adding condition returns new query leaving the query it
+    was called on unchanged. Results are in order of priorities the same
+    way as `get_sorted_items()` of block. Block should not be changed
+    while iterating results.'''
+    def __init__(self, _block):
+        '''
+        _block: Block
+            Block whose items are queried.
+        '''
+        self._block = _block
+        self._types = None
+        self._start = None
+        self._end = None
+        self._predicates = ()
+        self._deep = False
+
+    def _extend(self, **attributes):
+        # Returns copy of query with changed attributes.
+        new_query = Query(self._block)
+        new_query.__dict__.update(self.__dict__)
+        for name, value in attributes.items():
+            setattr(new_query, "_" + name, value)
+        return new_query
+
+    def of_type(self, *types):
+        '''Keeps items whose objects are instances of any of types'''
+        if self._types is not None:
+            # Objects need to be instances of types of each call.
+            return self.where(lambda _item: isinstance(_item.get_object(),
+                types))
+        return self._extend(types=types)
+
+    def between(self, start=None, end=None):
+        '''Keeps items with priorities in range(both included)'''
+        return self._extend(start=start, end=end)
+
+    def where(self, predicate):
+        '''Keeps items for which predicate returns True'''
+        return self._extend(predicates=self._predicates + (predicate,))
+
+    def deep(self):
+        '''Replaces items with nested blocks with items of those blocks
+
+        Items of nested blocks are merged with other items in order of
+        their own priorities like in DeepBlock.'''
+        return self._extend(deep=True)
+
+    def _matches(self, _item):
+        # Checks if item meets conditions other than priority range.
+        if self._types is not None and \
+            not isinstance(_item.get_object(), self._types):
+            return False
+        return all(predicate(_item) for predicate in self._predicates)
+
+    def _iter_range(self, _block, descending, backward):
+        # Yields items of block within priority range using its index.
+        _index, (start, end) = _block._find_priority_range(self._start, 
+            self._end)
+        return _index.iter_slice(start, end, descending, backward)
+
+    def _iter_deep(self, _block, key, descending, backward):
+        # Yields items of block and its nested blocks merging them.
+        # Nested blocks can only be found by scanning items.
+        if _block._strict:
+            nested_blocks = []
+        else:
+            nested_blocks = [_item.get_object() for _item in _block._items
+                if isinstance(_item.get_object(), block.Block)]
+        if not nested_blocks:
+            return self._iter_range(_block, descending, backward)
+        streams = [(_item for _item in
+            self._iter_range(_block, descending, backward)
+            if not isinstance(_item.get_object(), block.Block))]
+        for nested_block in nested_blocks:
+            if nested_block._key is _block._key:
+                stream = self._iter_deep(nested_block, key, descending, 
+                    backward)
+            else:
+                # Nested block sorts priorities differently.
+                unbounded_query = self._extend(start=None, end=None)
+                items = unbounded_query._iter_deep(nested_block, 
+                    self._get_item_key(nested_block), False, False)
+                stream = sorted(filter(self._in_range, items), key=key,
+                    reverse=descending != backward)
+            streams.append(stream)
+        return heapq.merge(*streams, key=key,
+            reverse=descending != backward)
+
+    def _get_item_key(self, _block):
+        # Returns function mapping item to key used by block.
+        get_key = _block._get_index().get_key
+        return lambda _item: get_key(_item.get_priority())
+
+    def _in_range(self, _item):
+        # Checks if priority of item is within range of query.
+        get_key = self._block._get_index().get_key
+        key = get_key(_item.get_priority())
+        if self._start is not None and key < get_key(self._start):
+            return False
+        return self._end is None or not get_key(self._end) < key
+
+    def _iter(self, backward=False):
+        # Yields matching items from first or last item.
+        descending = self._block._reverse
+        if self._deep:
+            items = self._iter_deep(self._block, 
+                self._get_item_key(self._block), descending, backward)
+        else:
+            items = self._iter_range(self._block, descending, backward)
+        if self._types is None and not self._predicates:
+            return items
+        return filter(self._matches, items)
+
+    def __iter__(self):
+        return self._iter()
+
+    def first(self, limit=3):
+        '''Gets first matching items stopping once limit is reached'''
+        return list(itertools.islice(self._iter(), limit))
+
+    def last(self, limit=3):
+        '''Gets last matching items stopping once limit is reached'''
+        items = list(itertools.islice(self._iter(backward=True), limit))
+        items.reverse()
+        return items
+
+    def get_items(self):
+        '''Gets all matching items in order of their priorities'''
+        return list(self._iter())
+
+    def get_objects(self):
+        '''Gets objects of all matching items'''
+        return [_item.get_object() for _item in self._iter()]
+
+    def count(self):
+        '''Gets number of matching items'''
+        return sum(1 for _ in self._iter())
@@ -0,0 +1,37 @@
+from pemap.reference import Reference
+
+import weakref
+
+
+class WeakReference(Reference):
+    '''Reference keeping weak reference to its object.
+
+    Object of reference can be garbage collected once nothing else
+    refers to it, `get_object()` then returns None. Callback is called
+    with underlying weakref object when object is garbage collected.'''
+    def __init__(self, _object, callback=None):
+        '''
+        _object: Any
+            Object supporting weak references.
+        callback: Callable
+            Called with weakref object when object is garbage collected.
+        '''
+        try:
+            self._ref = weakref.ref(_object, callback)
+        except TypeError:
+            err_msg = "Objects of type '{}' cant be weakly referenced"
+            raise TypeError(err_msg.format(_object.__class__.__name__))
+
+    def set_object(self, _object):
+        self._ref = weakref.ref(_object, self._ref.__callback__)
+
+    def get_object(self):
+        return self._ref()
+
+    def get_ref(self):
+        '''Gets underlying weakref object'''
+        return self._ref
+
+    def is_alive(self):
+        '''Checks if object was not garbage collected'''
+        return self._ref() is not None
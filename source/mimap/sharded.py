@@ -0,0 +1,469 @@
+from mimap import block
+from mimap import item
+
+from bisect import bisect_right
+import heapq
+import multiprocessing
+import weakref
+
+
+class _Shard():
+    # Part of sharded block living in worker process.
+    # Items are kept with sequence numbers given by sharded block which
+    # allows results from shards to be merged in their original order.
+    def __init__(self, key=None):
+        self._key = key
+        self._clear()
+
+    def _clear(self):
+        # Priority is provided to avoid calculating it from no items.
+        self._block = block.Block([], 0, strict=False, key=self._key,
+            update_priorities=False)
+        self._seqs = {}
+
+    def _with_seqs(self, items):
+        # Pairs items with their sequence numbers.
+        return [(self._seqs[id(_item)], _item) for _item in items]
+
+    def _with_keys(self, items):
+        # Pairs items with their keys and sequence numbers for merging.
+        _index = self._block._get_index()
+        return [((_index.get_key(_item.get_priority()),
+            self._seqs[id(_item)]), _item) for _item in items]
+
+    def add(self, records):
+        items = [_item for _, _item in records]
+        stored_items = self._block.add_items(items)
+        for (seq, _), stored_item in zip(records, stored_items):
+            self._seqs[id(stored_item)] = seq
+        return len(self._block)
+
+    def query(self, method_name, args):
+        # Calls block method returning items with sequence numbers.
+        items = getattr(self._block, method_name)(*args)
+        return self._with_seqs(items)
+
+    def first(self, limit):
+        return self._with_keys(self._block.get_first_items(limit))
+
+    def last(self, limit):
+        return self._with_keys(self._block.get_last_items(limit))
+
+    def sorted_items(self):
+        return self._with_keys(self._block.get_sorted_items())
+
+    def priority_at(self, rank):
+        return self._block._get_index().get_item_at(rank).get_priority()
+
+    def aggregate(self, mode):
+        priorities = self._block.get_priorities()
+        if not priorities:
+            return None
+        if mode in block.Block._average_priority_modes:
+            return sum(priorities)
+        elif mode in block.Block._min_priority_modes:
+            return self._block.get_first_item().get_priority()
+        return self._block.get_last_item().get_priority()
+
+    def take(self):
+        # Removes all items returning them with sequence numbers.
+        records = self._with_seqs(self._block.get_items())
+        self._clear()
+        return records
+
+
+def _serve(connection, key):
+    # Answers commands sent by sharded block until told to stop.
+    shard = _Shard(key)
+    while True:
+        command, args = connection.recv()
+        if command == "stop":
+            break
+        try:
+            result = getattr(shard, command)(*args)
+        except Exception as error:
+            connection.send((False, error))
+        else:
+            connection.send((True, result))
+    connection.close()
+
+
+def _stop_workers(connections, processes):
+    # Stops worker processes of sharded block.
+    for connection in connections:
+        try:
+            connection.send(("stop", ()))
+            connection.close()
+        except (OSError, EOFError):
+            pass
+    for process in processes:
+        process.join(1)
+        if process.is_alive():
+            process.terminate()
+
+
+class ShardedBlock():
+    '''Block splitting its items between local worker processes.
+
+    Items are partitioned by priority range(`partition='range'`) or by
+    hash of priority(`partition='hash'`) into `shards` worker processes,
+    each holding its part in Block object. Queries are sent to shards
+    which may contain results and results are merged back in the same
+    order as Block would return them.
+
+    Range partitioning sends priority and range queries only to shards
+    covering the priorities and calculates median priority by asking
+    single shard. Hash partitioning spreads items evenly but sends range
+    queries to every shard.
+
+    Shards are rebalanced when items are added and one shard holds more
+    than `balance_factor` times average number of items. Range
+    boundaries are then recalculated from priorities of all items.
+
+    Objects, priorities and `key` need to be picklable unless processes
+    are forked. Items returned are copies of items held by shards and
+    priorities of items are not updated from priority of block.
+    Call `close()` or use block as context manager to stop workers.'''
+    _default_priority = block.Block._default_priority
+    _partitions = {"range", "hash"}
+    # Modes calculated from aggregates of shards.
+    _priority_modes = {
+        *block.Block._average_priority_modes,
+        *block.Block._median_priority_modes,
+        *block.Block._min_priority_modes,
+        *block.Block._max_priority_modes
+    }
+
+    def __init__(self, items, priority=_default_priority, shards=2,
+    partition="range", priority_mode=None, key=None, balance_factor=2.0):
+        '''
+        items: Iterator
+            Collection of Item objects
+        priority: Any
+            Any object can sorted or support comparison operators.
+        shards: Int
+            Number of worker processes, default: 2.
+        partition: Str
+            How items are split between shards('range' or 'hash').
+        priority_mode: Str
+            Mode for calculating priority for block, default: 'median'.
+        key: Callable
+            Maps priority to comparable key used for sorting, default: None.
+        balance_factor: Float
+            Shard size relative to average size that causes rebalancing.
+        '''
+        if partition not in self._partitions:
+            err_msg = "partition should be one of {} not '{}'"
+            raise ValueError(err_msg.format(self._partitions, partition))
+        if shards < 1:
+            raise ValueError("shards should be positive")
+        if priority_mode == None:
+            priority_mode = list(block.Block._median_priority_modes)[0]
+        if priority_mode not in self._priority_modes:
+            err_msg = "priority_mode should one of {} not '{}'"
+            raise ValueError(err_msg.format(self._priority_modes,
+                priority_mode))
+        self._partition = partition
+        self._priority_mode = priority_mode
+        self._key = key
+        self._balance_factor = balance_factor
+        self._provided_priority = priority
+        self._priority = None
+        self._next_seq = 0
+        self._sizes = [0] * shards
+        # Number of items when rebalancing last failed to even out shards.
+        self._skewed_total = 0
+        self._boundaries = []
+        self._connections = []
+        self._processes = []
+        for _ in range(shards):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve,
+                args=(worker_connection, key), daemon=True)
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+        self._finalizer = weakref.finalize(self, _stop_workers,
+            self._connections, self._processes)
+        items = [item.Item.to_item(_item) for _item in items]
+        if priority == self._default_priority and not items:
+            err_msg = "There are no items to calculate block priority"
+            raise ValueError(err_msg)
+        self._boundaries = self._create_boundaries(items)
+        self._distribute(list(self._number_items(items)))
+
+    def _get_key(self, priority):
+        # Gets key used for sorting and partitioning priority.
+        if self._key is None:
+            return priority
+        return self._key(priority)
+
+    def _number_items(self, items):
+        # Pairs items with new sequence numbers.
+        for _item in items:
+            yield self._next_seq, _item
+            self._next_seq += 1
+
+    def _create_boundaries(self, items):
+        # Returns keys splitting items into shards of equal size.
+        if self._partition != "range" or not items:
+            return []
+        keys = sorted(self._get_key(_item.get_priority()) for _item in items)
+        shards = len(self._connections)
+        return [keys[len(keys)*shard//shards] for shard in range(1, shards)]
+
+    def _get_shard(self, priority):
+        # Returns index of shard responsible for priority.
+        if self._partition == "hash":
+            return hash(self._get_key(priority)) % len(self._connections)
+        return bisect_right(self._boundaries, self._get_key(priority))
+
+    def _get_range_shards(self, start, end):
+        # Returns indexes of shards which may contain priority range.
+        if self._partition == "hash":
+            return range(len(self._connections))
+        first = 0 if start is None else self._get_shard(start)
+        last = len(self._connections)-1 if end is None else \
+            self._get_shard(end)
+        return range(first, last+1)
+
+    def _send(self, shard, command, *args):
+        self._connections[shard].send((command, args))
+
+    def _receive(self, shard):
+        succeeded, result = self._connections[shard].recv()
+        if not succeeded:
+            raise result
+        return result
+
+    def _gather(self, shards):
+        # Receives results of all shards before raising first error.
+        # Replies left unread would be mistaken for later results.
+        replies = [self._connections[shard].recv() for shard in shards]
+        for succeeded, result in replies:
+            if not succeeded:
+                raise result
+        return [result for _, result in replies]
+
+    def _scatter(self, shards, command, *args):
+        # Sends command to shards before waiting for their results.
+        # That way shards work on their parts at the same time.
+        shards = list(shards)
+        for shard in shards:
+            self._send(shard, command, *args)
+        return self._gather(shards)
+
+    def _distribute(self, records):
+        # Sends items with sequence numbers to their shards.
+        shard_records = [[] for _ in self._connections]
+        for record in records:
+            shard_records[self._get_shard(record[1].get_priority())].append(
+                record)
+        shards = [shard for shard, records in enumerate(shard_records)
+            if records]
+        for shard in shards:
+            self._send(shard, "add", shard_records[shard])
+        for shard, size in zip(shards, self._gather(shards)):
+            self._sizes[shard] = size
+        self._priority = None
+
+    @staticmethod
+    def _merge_records(results):
+        # Merges results of shards by first values of their records.
+        # Records start with sequence numbers to keep original order of
+        # items or (key, sequence number) to keep them sorted.
+        return [_item for _, _item in heapq.merge(*results,
+            key=lambda record: record[0])]
+
+    def _query(self, shards, method_name, *args):
+        return self._merge_records(self._scatter(shards, "query",
+            method_name, args))
+
+    def _needs_rebalance(self):
+        # Checks if one of shards holds too many items.
+        total = sum(self._sizes)
+        if total < len(self._sizes) or self._partition != "range":
+            return False
+        average = total/len(self._sizes)
+        if max(self._sizes) <= average * self._balance_factor:
+            return False
+        # Items with equal keys cant be split between shards. Shards they
+        # left skewed are rebalanced again once number of items doubles.
+        return total > 2 * self._skewed_total
+
+    def rebalance(self):
+        '''Recalculates range boundaries and moves items between shards'''
+        records = []
+        for shard_records in self._scatter(range(len(self._connections)),
+            "take"):
+            records.extend(shard_records)
+        records.sort(key=lambda record: record[0])
+        self._sizes = [0] * len(self._connections)
+        self._boundaries = self._create_boundaries(
+            [_item for _, _item in records])
+        self._distribute(records)
+        self._skewed_total = 0
+        if self._needs_rebalance():
+            self._skewed_total = sum(self._sizes)
+
+    def add_items(self, items):
+        '''Adds items to shards responsible for their priorities'''
+        items = [item.Item.to_item(_item) for _item in items]
+        self._distribute(list(self._number_items(items)))
+        if self._needs_rebalance():
+            self.rebalance()
+
+    def add_item(self, _item):
+        '''Adds item to shard responsible for its priority'''
+        self.add_items([_item])
+
+    def get_shard_sizes(self):
+        '''Gets number of items held by each shard'''
+        return list(self._sizes)
+
+    def _calculate_priority(self):
+        # Calculates priority for block from aggregates of shards.
+        all_shards = range(len(self._connections))
+        total = sum(self._sizes)
+        if not total:
+            return self._default_priority
+        if self._priority_mode in block.Block._median_priority_modes:
+            median_index = round((total-1)/2)
+            if self._partition == "range":
+                # Shards hold consecutive ranges, single shard is asked.
+                for shard, size in enumerate(self._sizes):
+                    if median_index < size:
+                        self._send(shard, "priority_at", median_index)
+                        return self._receive(shard)
+                    median_index -= size
+            # Hash shards need their sorted items merged.
+            items = self.get_sorted_items()
+            return items[median_index].get_priority()
+        aggregates = [aggregate for aggregate in self._scatter(all_shards,
+            "aggregate", self._priority_mode) if aggregate is not None]
+        if self._priority_mode in block.Block._average_priority_modes:
+            return sum(aggregates)/total
+        elif self._priority_mode in block.Block._min_priority_modes:
+            return min(aggregates, key=self._get_key)
+        return max(aggregates, key=self._get_key)
+
+    def get_priority(self):
+        '''Gets priority for block'''
+        if self._provided_priority != self._default_priority:
+            return self._provided_priority
+        if self._priority is None:
+            self._priority = self._calculate_priority()
+        return self._priority
+
+    def get_items(self):
+        '''Gets items of all shards in order they were added'''
+        return self._query(range(len(self._connections)), "get_items")
+
+    def get_objects(self):
+        '''Gets items underlying objects'''
+        return [_item.get_object() for _item in self.get_items()]
+
+    def get_priorities(self):
+        '''Gets priorities of items in order they were added'''
+        return [_item.get_priority() for _item in self.get_items()]
+
+    def get_sorted_items(self):
+        '''Gets items sorted by their priorities'''
+        return self._merge_records(self._scatter(
+            range(len(self._connections)), "sorted_items"))
+
+    def get_sorted_objects(self):
+        '''Gets items underlying objects sorted by priority'''
+        return [_item.get_object() for _item in self.get_sorted_items()]
+
+    def get_items_by_priority(self, priority):
+        '''Gets item objects matching priority'''
+        return self._query([self._get_shard(priority)],
+            "get_items_by_priority", priority)
+
+    def get_item_by_priority(self, priority):
+        '''Gets first item matching priority'''
+        items = self.get_items_by_priority(priority)
+        if items: return items[0]
+
+    def get_items_by_priorities(self, priorities):
+        '''Gets item objects matching any of priorities'''
+        priorities = list(priorities)
+        shards = sorted({self._get_shard(priority)
+            for priority in priorities})
+        return self._query(shards, "get_items_by_priorities", priorities)
+
+    def get_item_by_priorities(self, priorities):
+        '''Gets first item matching any of priorities'''
+        items = self.get_items_by_priorities(priorities)
+        if items: return items[0]
+
+    def get_items_by_priority_range(self, start=None, end=None):
+        '''Gets item objects with priorities in range'''
+        if start != None and end != None:
+            if self._get_key(start) > self._get_key(end):
+                err_msg = "Start priority '{}' cant be greater than " +\
+                    "end priority '{}'"
+                err_msg = err_msg.format(start, end)
+                raise ValueError(err_msg)
+        return self._query(self._get_range_shards(start, end),
+            "get_items_by_priority_range", start, end)
+
+    def get_item_by_priority_range(self, start=None, end=None):
+        '''Gets first item with priority in range'''
+        items = self.get_items_by_priority_range(start, end)
+        if items: return items[0]
+
+    def get_items_by_type(self, _type):
+        '''Gets item objects of provided type'''
+        return self._query(range(len(self._connections)),
+            "get_items_by_type", _type)
+
+    def get_item_by_type(self, _type):
+        '''Gets first item of provided type'''
+        items = self.get_items_by_type(_type)
+        if items: return items[0]
+
+    def get_first_items(self, limit=3):
+        '''Gets first item objects based on their priority'''
+        results = self._scatter(range(len(self._connections)), "first",
+            limit)
+        return self._merge_records(results)[:limit]
+
+    def get_first_item(self):
+        '''Gets first item based on priority'''
+        items = self.get_first_items(1)
+        if items: return items[0]
+
+    def get_last_items(self, limit=3):
+        '''Gets last item objects based on their priority'''
+        results = self._scatter(range(len(self._connections)), "last",
+            limit)
+        return self._merge_records(results)[-limit:]
+
+    def get_last_item(self):
+        '''Gets last item based on priority'''
+        items = self.get_last_items(1)
+        if items: return items[-1]
+
+    def to_tuple(self):
+        '''Returns tuple form of block with priorities and objects'''
+        return tuple((_item.get_priority(), _item.get_object())
+            for _item in self.get_sorted_items())
+
+    def close(self):
+        '''Stops worker processes of block'''
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.get_sorted_items())
+
+    def __len__(self):
+        return sum(self._sizes)
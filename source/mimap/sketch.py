@@ -0,0 +1,129 @@
+'''Approximate quantiles of priorities in bounded memory.'''
+import math
+import random
+
+
+class QuantileSketch():
+    '''Estimates quantiles of stream of values keeping few of them(KLL).
+
+    Values are kept in levels of compactors. Value at level h stands for
+    2**h values of stream. When compactors get full, values of a level
+    are sorted and every second value(starting at random one) is moved
+    to next level while the rest are discarded. Levels closer to top
+    keep more values which bounds memory to about `3*k` values.
+
+    `error` is bound of rank error relative to number of values, rank of
+    estimated quantile is within `error * len(sketch)` of the exact one
+    with high probability. Smaller error keeps more values.
+
+    Sketches of parts of stream can be merged which results in sketch of
+    the whole stream. Values need to support comparison operators.'''
+    def __init__(self, error=0.01, seed=None):
+        '''
+        error: Float
+            Bound of rank error relative to number of values, default: 0.01.
+        seed: Any
+            Seed for random choices of compactors, default: None.
+        '''
+        if not 0 < error < 1:
+            err_msg = "error should be between 0 and 1 not '{}'"
+            raise ValueError(err_msg.format(error))
+        self._error = error
+        self._k = max(math.ceil(3.3/error), 8)
+        self._random = random.Random(seed)
+        self._compactors = [[]]
+        self._max_size = self._get_capacity(0)
+        self._size = 0
+        self._count = 0
+
+    def _get_capacity(self, height):
+        # Capacity of compactor shrinks by 2/3 for each level below top.
+        depth = len(self._compactors) - height - 1
+        return math.ceil(self._k * (2/3)**depth) + 1
+
+    def _grow(self):
+        # Adds level at top of compactors.
+        self._compactors.append([])
+        self._max_size = sum(self._get_capacity(height)
+            for height in range(len(self._compactors)))
+
+    def _compact(self, height):
+        # Moves half of values of level to next level.
+        compactor = self._compactors[height]
+        if height + 1 >= len(self._compactors):
+            self._grow()
+        # Odd value out stays at its level.
+        last = compactor.pop() if len(compactor) % 2 else None
+        compactor.sort()
+        offset = self._random.random() < 0.5
+        self._compactors[height+1].extend(compactor[offset::2])
+        compactor.clear()
+        if last is not None:
+            compactor.append(last)
+
+    def _compress(self):
+        # Compacts full levels until values fit in sketch.
+        for height in range(len(self._compactors)):
+            if len(self._compactors[height]) >= self._get_capacity(height):
+                self._compact(height)
+                self._size = sum(map(len, self._compactors))
+                if self._size < self._max_size:
+                    break
+
+    def update(self, value):
+        '''Adds value to sketch'''
+        self._compactors[0].append(value)
+        self._size += 1
+        self._count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def extend(self, values):
+        '''Adds values to sketch'''
+        for value in values:
+            self.update(value)
+
+    def merge(self, other):
+        '''Adds values of other sketch to this sketch'''
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for height, compactor in enumerate(other._compactors):
+            self._compactors[height].extend(compactor)
+        self._count += other._count
+        self._size = sum(map(len, self._compactors))
+        while self._size >= self._max_size:
+            self._compress()
+
+    def copy(self):
+        '''Returns copy of sketch'''
+        sketch = QuantileSketch(self._error)
+        sketch.merge(self)
+        return sketch
+
+    def get_error(self):
+        '''Gets bound of rank error relative to number of values'''
+        return self._error
+
+    def get_quantile(self, fraction):
+        '''Gets value estimated to be at fraction of sorted values'''
+        if not self._count:
+            return None
+        weighted_values = sorted(((value, 2**height)
+            for height, compactor in enumerate(self._compactors)
+            for value in compactor), key=lambda pair: pair[0])
+        # Rank within kept values scaled to number of values seen.
+        total = sum(weight for _, weight in weighted_values)
+        rank = round((total-1)*fraction)
+        cumulative = 0
+        for value, weight in weighted_values:
+            cumulative += weight
+            if cumulative > rank:
+                return value
+        return weighted_values[-1][0]
+
+    def get_median(self):
+        '''Gets value estimated to be median of values'''
+        return self.get_quantile(0.5)
+
+    def __len__(self):
+        return self._count
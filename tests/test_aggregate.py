@@ -0,0 +1,64 @@
+import unittest
+
+from mimap import aggregate
+from mimap import item as _item
+
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ricky", 40)]
+        self._records = list(enumerate(self._items))
+
+    def test_sum_aggregate(self):
+        _aggregate = aggregate.SumAggregate(self._records)
+        self.assertEqual(_aggregate.get_value(), 80)
+        _aggregate.remove(1, self._items[1])
+        self.assertEqual(_aggregate.get_value(), 70)
+        self.assertEqual(len(_aggregate), 2)
+
+    def test_mean_aggregate(self):
+        _aggregate = aggregate.MeanAggregate(self._records)
+        self.assertAlmostEqual(_aggregate.get_value(), 80/3)
+        for seq, item in self._records:
+            _aggregate.remove(seq, item)
+        self.assertIsNone(_aggregate.get_value())
+
+    def test_sum_cancellation(self):
+        records = [(0, _item.Item("Ben", 0.1)), (1, _item.Item("Tom", 0.2))]
+        large_item = _item.Item("Lord", 1e17)
+        for _aggregate, value in [(aggregate.SumAggregate(records), 0.3),
+            (aggregate.WeightedMeanAggregate(records), 0.15)]:
+            _aggregate.add(2, large_item)
+            self.assertFalse(_aggregate.is_outdated())
+            _aggregate.remove(2, large_item)
+            # Compensation keeps small priorities despite large one.
+            self.assertAlmostEqual(_aggregate.get_value(), value)
+            # Sum left is small part of sum reached before.
+            self.assertTrue(_aggregate.is_outdated())
+        _aggregate = aggregate.SumAggregate(list(enumerate(self._items)))
+        _aggregate.add(3, _item.Item("Lord", 10**20))
+        _aggregate.remove(3, _item.Item("Lord", 10**20))
+        self.assertEqual(_aggregate.get_value(), 80)
+        self.assertFalse(_aggregate.is_outdated())
+
+    def test_weighted_mean_aggregate(self):
+        _aggregate = aggregate.WeightedMeanAggregate(self._records,
+            lambda item: len(item.get_object()))
+        self.assertEqual(_aggregate.get_value(), (150 + 40 + 200)/14)
+
+    def test_min_max_aggregate(self):
+        min_aggregate = aggregate.MinAggregate(self._records)
+        max_aggregate = aggregate.MaxAggregate(self._records)
+        self.assertEqual(min_aggregate.get_value(), 10)
+        self.assertEqual(max_aggregate.get_value(), 40)
+        # Item is removed and added back with new priority.
+        for _aggregate in (min_aggregate, max_aggregate):
+            _aggregate.remove(1, self._items[1])
+            _aggregate.add(1, _item.Item("John", 50))
+        self.assertEqual(min_aggregate.get_value(), 30)
+        self.assertEqual(max_aggregate.get_value(), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
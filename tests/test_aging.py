@@ -0,0 +1,111 @@
+import random
+import unittest
+
+from mimap import aging
+from mimap import item as _item
+
+
+class TestAgingBlock(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ricky", 40)]
+        self._block = aging.AgingBlock(self._items)
+
+    def test_age(self):
+        self._block.age(5)
+        self.assertEqual(self._block.get_offset(), -5)
+        self.assertEqual(self._block.get_priorities(), [25, 5, 35])
+        self.assertEqual(self._block.get_priority(), 25)
+        # Items keep their base priorities.
+        self.assertEqual(self._items[0].get_priority(), 30)
+
+    def test_sum_priority(self):
+        block = aging.AgingBlock(self._items, priority_mode="sum")
+        block.age(5)
+        self.assertEqual(block.get_priority(), 65)
+
+    def test_add_item(self):
+        self._block.age(25)
+        ben_item = self._block.add_item(_item.Item("Ben", 10))
+        self.assertEqual(self._block.get_effective_priority(ben_item), 10)
+        self._block.age(10)
+        self.assertEqual(self._block.get_sorted_objects(), 
+            ["John", "Marry", "Ben", "Ricky"])
+        self.assertEqual(self._block.to_tuple()[2], (0, "Ben"))
+
+    def test_get_items_by_priority_range(self):
+        self._block.age(10)
+        items = self._block.get_items_by_priority_range(0, 20)
+        self.assertEqual(items, self._items[:2])
+        self.assertEqual(self._block.get_items_by_priority(30), 
+            self._items[2:])
+        self.assertEqual(self._block.get_items_by_priority_ranges(
+            [(None, 0)]), [self._items[1:2]])
+
+    def test_set_item_priority(self):
+        self._block.age(10)
+        self._block.set_item_priority(self._items[1], 50)
+        self.assertEqual(self._block.get_last_item(), self._items[1])
+        self.assertEqual(self._block.to_tuple()[-1], (50, "John"))
+
+    def test_rate(self):
+        block = aging.AgingBlock(self._items, rate=2)
+        block.set_rate(3)
+        block.age(2)
+        self.assertEqual(block.get_rate(), 3)
+        self.assertEqual(block.get_priority(), 36)
+
+    def test_sample(self):
+        rng = random.Random(1)
+        self._block.age(10)
+        sampled_items = self._block.sample(500, rng=rng)
+        self.assertNotIn(self._items[1], sampled_items)
+        self.assertGreater(sampled_items.count(self._items[2]), 250)
+        block = aging.AgingBlock(self._items, rate=3)
+        block.age(2)
+        sampled_items = block.sample(500, rng=rng)
+        self.assertEqual(set(sampled_items), set(self._items))
+        self.assertLess(sampled_items.count(self._items[1]), 125)
+
+    def test_aggregate_range(self):
+        self._block.age(5)
+        self.assertEqual(self._block.aggregate_range(20, 40, "count"), 2)
+        self.assertEqual(self._block.aggregate_range(20, 40, "sum"), 60)
+        self.assertEqual(self._block.aggregate_range(None, 30, "max"), 25)
+        self.assertAlmostEqual(self._block.aggregate_range(mode="mean"), 
+            65 / 3)
+
+    def test_link_nested(self):
+        outer_block = aging.AgingBlock([_item.Item(self._block)], 
+            strict=False, link_nested=True)
+        self._block.age(5)
+        self.assertEqual(outer_block.get_priorities(), [25])
+        outer_block.age(5)
+        self._block.age(5)
+        self.assertEqual(outer_block.get_priorities(), [20])
+
+    def test_set_priority(self):
+        self._block.age(5)
+        self._block.set_priority(None)
+        self.assertEqual(self._block.get_priorities(), [25, 5, 35])
+        self.assertEqual(self._block.get_priority(), 25)
+        block = aging.AgingBlock(self._items, priority_mode="mean")
+        block.age(10)
+        block.set_priority(20)
+        self.assertEqual(block.get_priorities(), [20, 10, 25])
+        self.assertEqual(block.get_priority(), 20)
+
+    def test_to_dict(self):
+        self._block.age(5)
+        self.assertEqual(self._block.to_dict(), 
+            {25: "Marry", 5: "John", 35: "Ricky"})
+        self.assertEqual(self._block.to_multi_dict(), 
+            {25: ["Marry"], 5: ["John"], 35: ["Ricky"]})
+
+    def test_key(self):
+        self.assertRaises(ValueError, aging.AgingBlock, self._items, 
+            key=abs)
+
+
+if __name__ == "__main__":
+    unittest.main()
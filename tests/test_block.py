@@ -1,9 +1,17 @@
+import gc
+import pickle
+import random
 import unittest
 
 from mimap import block as _block
 from mimap import item as _item
 
 
+class _Entry():
+    def __init__(self, name):
+        self.name = name
+
+
 class TestBaseBlock(unittest.TestCase):
     _block_type = _block.BaseBlock
 
@@ -95,6 +103,19 @@ class TestBlock(TestBaseBlock):
         item = self._block.get_item_by_priority_range(start=10)
         self.assertEqual(item, self._items[0])
 
+    def test_get_items_by_priority_ranges(self):
+        results = self._block.get_items_by_priority_ranges(
+            [(30, None), (10, 11), (None, 5)])
+        self.assertEqual(results, [[self._marry_item, self._ricky_item,
+            self._ben_item], [self._john_item], []])
+        self.assertRaises(ValueError, 
+            self._block.get_items_by_priority_ranges, [(11, 10)])
+
+    def test_get_items_by_priority_batch(self):
+        results = self._block.get_items_by_priority_batch([40, 10, 30, 5])
+        self.assertEqual(results, [[self._ricky_item], [self._john_item],
+            [self._marry_item, self._ben_item], []])
+
     def test_get_items_by_type(self):
         items = self._block.get_items_by_type(str)
         self.assertEqual(items, self._items)
@@ -139,5 +160,548 @@ class TestBlock(TestBaseBlock):
         self.assertEqual(prority_queue.get(), (30, "Marry"))
 
 
+class TestMutableBlock(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ricky", 40)]
+        self._block = _block.Block(self._items)
+        self._block.get_sorted_items()
+
+    def test_add_item(self):
+        ben_item = self._block.add_item(_item.Item("Ben", 20))
+        self.assertEqual(self._block.get_items(), self._items + [ben_item])
+        self.assertEqual(self._block.get_sorted_objects(), 
+            ["John", "Ben", "Marry", "Ricky"])
+        self.assertEqual(self._block.get_priority(), 30)
+        self.assertEqual(len(self._block), 4)
+
+    def test_add_item_type(self):
+        block = _block.Block(self._items, _type=str)
+        self.assertRaises(TypeError, block.add_item, _item.Item(10, 20))
+
+    def test_add_item_copies(self):
+        block = _block.Block(self._items, 20, priority_mode="mean")
+        new_item = _item.Item("Ben", 40)
+        stored_item = block.add_item(new_item)
+        self.assertIsNot(stored_item, new_item)
+        self.assertEqual(stored_item.get_priority(), 30)
+        self.assertEqual(block.get_priority(), 20)
+
+    def test_remove_item(self):
+        self._block.remove_item(self._items[0])
+        self.assertEqual(self._block.get_items(), self._items[1:])
+        self.assertEqual(self._block.get_sorted_objects(), ["John", "Ricky"])
+        self.assertEqual(self._block.get_priority(), 10)
+        self.assertRaises(ValueError, self._block.remove_item, 
+            self._items[0])
+
+    def test_remove_large_item(self):
+        block = _block.Block([_item.Item("Ben", 1.0), _item.Item("Tom", 2.0)],
+            priority_mode="mean")
+        large_item = block.add_item(_item.Item("Lord", 1e17))
+        block.get_priority()
+        block.remove_item(large_item)
+        self.assertEqual(block.get_priority(), 1.5)
+        block.add_item(_item.Item("Lord", 3.0))
+        self.assertEqual(block.get_priority(), 2.0)
+
+    def test_remove_items(self):
+        self._block.remove_items(self._items)
+        self.assertEqual(self._block.get_items(), [])
+        self.assertIsNone(self._block.get_priority())
+
+    def test_set_item_priority(self):
+        self._block.set_item_priority(self._items[2], 5)
+        self.assertEqual(self._block.get_first_item(), self._items[2])
+        self.assertEqual(self._block.get_items_by_priority(40), [])
+        self.assertEqual(self._block.get_priority(), 10)
+
+    def test_priority_modes(self):
+        block = _block.Block(self._items, priority_mode="weighted_mean",
+            weight=lambda item: len(item.get_object()))
+        self.assertEqual(block.get_priority(), (150 + 40 + 200)/14)
+        block.remove_item(self._items[2])
+        self.assertEqual(block.get_priority(), (150 + 40)/9)
+        for mode, priority in [("sum", 90), ("min", 5), ("max", 40),
+            ("percentile:100", 40), ("percentile:0", 5)]:
+            block = _block.Block([item.copy() for item in self._items],
+                priority_mode=mode)
+            block.get_priority()
+            block.set_item_priority(block.get_items()[1], 5)
+            block.get_priority()
+            block.add_item(_item.Item("Ben", 15))
+            block.remove_item(block.get_items()[0])
+            block.add_item(_item.Item("Ben", 30))
+            self.assertEqual(block.get_priority(), priority, mode)
+        with self.assertRaises(ValueError):
+            _block.Block(self._items, priority_mode="percentile:x")
+
+    def test_approximate_priority_modes(self):
+        items = [_item.Item(position, position) for position in range(101)]
+        block = _block.Block(items, priority_mode="median~")
+        self.assertEqual(block.get_priority(), 50)
+        block = _block.Block(items, priority_mode="percentile~:90",
+            sketch_error=0.05)
+        self.assertEqual(block.get_priority(), 90)
+        block.remove_items(items[:50])
+        self.assertEqual(block.get_priority(), 95)
+        self.assertEqual(len(block.get_priority_sketch()), 51)
+
+    def test_pop(self):
+        ben_item = self._block.add_item(_item.Item("Ben", 30))
+        self.assertEqual(self._block.peek_first(), self._items[1])
+        self.assertEqual(self._block.pop_first(), self._items[1])
+        self.assertEqual(self._block.peek_last(), self._items[2])
+        self.assertEqual(self._block.pop_last(), self._items[2])
+        self.assertEqual(self._block.get_priority(), 30)
+        self.assertEqual(self._block.get_sorted_items(), 
+            [self._items[0], ben_item])
+        self.assertEqual(self._block.pop_first_n(5), 
+            [self._items[0], ben_item])
+        self.assertIsNone(self._block.pop_last())
+        self.assertIsNone(self._block.peek_first())
+
+    def test_batch(self):
+        block = _block.Block([_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 10), ("Ricky", 40)]])
+        block.get_sorted_items()
+        with block.batch():
+            ben_item = block.add_item(_item.Item("Ben", 20))
+            block.remove_item(block.get_items()[0])
+            block.set_item_priority(block.get_items()[0], 50)
+            block.add_item(_item.Item("Tom", 5))
+            self.assertRaises(RuntimeError, block.set_priority, 10)
+        self.assertEqual(block.get_sorted_objects(), 
+            ["Tom", "Ben", "Ricky", "John"])
+        self.assertEqual(block.get_priority(), 40)
+        self.assertEqual(block.get_item_by_priority(20), ben_item)
+
+    def test_batch_rollback(self):
+        items = [_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 10), ("Ricky", 40)]]
+        block = _block.Block(items, priority_mode="mean")
+        sorted_items = block.get_sorted_items()
+        with self.assertRaises(KeyError):
+            with block.batch():
+                block.add_item(_item.Item("Ben", 20))
+                block.remove_item(items[0])
+                block.set_item_priority(items[1], 50)
+                self.assertEqual(block.get_priority(), 110/3)
+                raise KeyError("Ben")
+        self.assertEqual(block.get_items(), items)
+        self.assertEqual(block.get_sorted_items(), sorted_items)
+        self.assertEqual(block.get_priority(), 80/3)
+        self.assertEqual(items[1].get_priority(), 10)
+
+    def test_fork(self):
+        items = [_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 10), ("Ricky", 40)]]
+        block = _block.Block(items, priority_mode="mean")
+        sorted_items = block.get_sorted_items()
+        forked_block = block.fork()
+        forked_block.set_item_priority(items[1], 50)
+        forked_block.set_item_priority(items[1], 60)
+        forked_block.remove_item(items[0])
+        forked_block.add_item(_item.Item("Ben", 20))
+        self.assertEqual(forked_block.get_sorted_objects(), 
+            ["Ben", "Ricky", "John"])
+        self.assertEqual(forked_block.get_priority(), 40)
+        self.assertEqual(forked_block.pop_last().get_priority(), 60)
+        self.assertEqual(block.get_items(), items)
+        self.assertEqual(block.get_sorted_items(), sorted_items)
+        self.assertEqual(block.get_priority(), 80/3)
+        self.assertEqual(items[1].get_priority(), 10)
+        block.remove_item(items[2])
+        self.assertEqual(forked_block.get_sorted_objects(), ["Ben", "Ricky"])
+
+    def test_fork_batch(self):
+        items = [_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 10), ("Ricky", 40)]]
+        block = _block.Block(items)
+        block.get_sorted_items()
+        forked_block = block.fork()
+        with block.batch():
+            block.add_item(_item.Item("Ben", 20))
+            block.remove_item(items[2])
+        self.assertEqual(block.get_sorted_objects(), ["John", "Ben", "Marry"])
+        self.assertEqual(forked_block.get_sorted_items(), 
+            [items[1], items[0], items[2]])
+        forked_block = block.fork()
+        with self.assertRaises(KeyError):
+            with forked_block.batch():
+                forked_block.set_item_priority(items[1], 50)
+                raise KeyError
+        self.assertEqual(forked_block.get_sorted_objects(), 
+            ["John", "Ben", "Marry"])
+        self.assertEqual(forked_block.get_sorted_items(), 
+            forked_block.sort_items_by_priority(forked_block.get_items()))
+        forked_block.set_item_priority(items[1], 35)
+        self.assertEqual(forked_block.get_sorted_objects(), 
+            ["Ben", "Marry", "John"])
+        self.assertEqual(block.get_sorted_objects(), ["John", "Ben", "Marry"])
+        self.assertEqual(items[1].get_priority(), 10)
+
+    def test_weak(self):
+        entries = [_Entry(name) for name in ("Marry", "John", "Ricky")]
+        items = [_item.Item(entry, priority) for entry, priority in
+            zip(entries, (30, 10, 40))]
+        block = _block.Block(items, priority_mode="mean", weak=True)
+        block.get_sorted_items()
+        forked_block = block.fork()
+        self.assertRaises(TypeError, block.add_item, _item.Item("Ben", 20))
+        del items, entries[1]
+        gc.collect()
+        self.assertEqual(len(block), 2)
+        self.assertEqual(block.get_sorted_objects(), entries)
+        self.assertEqual(block.get_priority(), 35)
+        self.assertEqual(block.get_first_item().get_object(), entries[0])
+        self.assertEqual(forked_block.get_objects(), entries)
+        block.add_item(_item.Item(_Entry("Ben"), 20))
+        self.assertEqual(len(block), 2)
+
+    def test_ttl(self):
+        now = [0]
+        items = [_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 10), ("Ricky", 40)]]
+        block = _block.Block(items, priority_mode="mean", ttl=10,
+            clock=lambda: now[0])
+        ben_item = block.add_item(_item.Item("Ben", 20), ttl=20)
+        block.set_item_expiry(items[2], None)
+        self.assertEqual(block.get_item_expiry(ben_item), 20)
+        now[0] = 10
+        self.assertEqual(block.get_first_items(), [ben_item, items[2]])
+        self.assertEqual(block.get_items_by_priority_range(0, 35), 
+            [ben_item])
+        self.assertEqual(block.get_priority(), 30)
+        with self.assertRaises(KeyError):
+            with block.batch():
+                block.set_item_expiry(items[2], 15)
+                raise KeyError("Ricky")
+        now[0] = 20
+        self.assertEqual(block.get_items(), [items[2]])
+        self.assertIsNone(block.get_item_expiry(items[2]))
+
+    def test_sample(self):
+        items = [_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 0), ("Ricky", 10)]]
+        block = _block.Block(items)
+        rng = random.Random(1)
+        sampled_items = block.sample(400, rng=rng)
+        self.assertNotIn(items[1], sampled_items)
+        self.assertGreater(sampled_items.count(items[0]), 250)
+        block.set_item_priority(items[1], 20)
+        block.remove_item(items[0])
+        self.assertEqual(set(block.sample(100, rng=rng)), set(items[1:]))
+        self.assertEqual(len(block.sample(5, weighted=False)), 5)
+        block.set_item_priority(items[2], -1)
+        self.assertRaises(ValueError, block.sample)
+
+    def test_update_from(self):
+        entries = [_Entry(name) for name in ("Marry", "John", "Ricky")]
+        block = _block.Block([_item.Item(entry, priority) for entry, 
+            priority in zip(entries, (30, 10, 40))], priority_mode="mean")
+        block.get_sorted_items()
+        ben_entry = _Entry("Ben")
+        summary = block.update_from([_item.Item(entries[0], 30), 
+            _item.Item(ben_entry, 5), _item.Item(entries[2], 20)])
+        self.assertEqual([_item.get_object() for _item in summary.added], 
+            [ben_entry])
+        self.assertEqual(summary.removed[0].get_object(), entries[1])
+        self.assertEqual(summary.changed[0].get_priority(), 20)
+        self.assertEqual(block.get_sorted_objects(), 
+            [ben_entry, entries[2], entries[0]])
+        self.assertEqual(block.get_priority(), 55/3)
+        summary = block.update_from([_item.Item(_Entry("Ben"), 5)],
+            object_key=lambda entry: entry.name)
+        self.assertEqual((len(summary.added), len(summary.removed), 
+            len(summary.changed)), (0, 2, 0))
+        self.assertEqual(block.get_objects(), [ben_entry])
+        # Priorities are compared before being blended.
+        block = _block.Block([_item.Item(entries[0], 4), 
+            _item.Item(entries[1], 2)], 10, priority_mode="mean")
+        summary = block.update_from([_item.Item(entries[0], 4), 
+            _item.Item(entries[1], 6)])
+        self.assertEqual([_item.get_priority() for _item in 
+            summary.changed], [8])
+        self.assertEqual(block.get_priorities(), [7, 8])
+
+    def test_aggregate_range(self):
+        items = [_item.Item(*pair) for pair in 
+            [("Marry", 30), ("John", 10), ("Ricky", 40), ("Ben", 20)]]
+        block = _block.Block(items)
+        self.assertEqual(block.aggregate_range(10, 30, "count"), 3)
+        self.assertEqual(block.aggregate_range(10, 30, "sum"), 60)
+        self.assertEqual(block.aggregate_range(15, None), 30)
+        self.assertEqual(block.aggregate_range(15, 35, "min"), 20)
+        self.assertEqual(block.aggregate_range(None, 35, "max"), 30)
+        self.assertEqual(block.aggregate_range(mode="median"), 30)
+        self.assertEqual(block.aggregate_range(mode="percentile:0"), 10)
+        self.assertIsNone(block.aggregate_range(50, 60))
+        self.assertEqual(block.aggregate_range(50, 60, "count"), 0)
+        self.assertRaises(ValueError, block.aggregate_range, mode="mode")
+        self.assertRaises(ValueError, block.aggregate_range, 30, 10)
+        # Sums are updated as items change.
+        block.add_item(_item.Item("Tom", 25))
+        block.remove_item(items[0])
+        block.set_item_priority(items[1], 35)
+        self.assertEqual(block.aggregate_range(20, 35, "sum"), 80)
+        self.assertEqual(block.aggregate_range(mode="mean"), 30)
+        block.add_items([_item.Item(seq, seq) for seq in range(100)])
+        self.assertEqual(block.aggregate_range(0, 9, "sum"), 45)
+        self.assertEqual(block.aggregate_range(20, 35, "sum"), 
+            80 + sum(range(20, 36)))
+        block = _block.Block(items, key=lambda priority: -priority, 
+            priority_mode="min")
+        self.assertEqual(block.aggregate_range(mode="min"), 
+            block.get_priority())
+        self.assertEqual(block.aggregate_range(40, 30, "max"), 40)
+        self.assertEqual(block.aggregate_range(40, 30, "median"), 35)
+        block = _block.Block([_item.Item("Tom", "a")])
+        self.assertEqual(block.aggregate_range(mode="max"), "a")
+        self.assertRaises(TypeError, block.aggregate_range, mode="sum")
+
+    def test_pickle_link_nested(self):
+        inner_block = _block.Block([_item.Item("Marry", 10)])
+        outer_block = _block.Block([_item.Item(inner_block), 
+            _item.Item("Ben", 0)], strict=False, link_nested=True, 
+            priority_mode="mean")
+        loaded_block = pickle.loads(pickle.dumps(outer_block))
+        self.assertEqual(loaded_block.get_priority(), 5)
+        loaded_inner_block = loaded_block.get_objects()[0]
+        self.assertIsNot(loaded_inner_block, inner_block)
+        # Loaded blocks are linked to each other but not to originals.
+        loaded_inner_block.set_priority(30)
+        self.assertEqual(loaded_block.get_priority(), 15)
+        self.assertEqual(outer_block.get_priority(), 5)
+        self.assertEqual(len(pickle.loads(pickle.dumps(inner_block))), 1)
+
+    def test_link_nested(self):
+        inner_block = _block.Block([_item.Item("Marry", 10), 
+            _item.Item("John", 20)], priority_mode="mean")
+        middle_block = _block.Block([_item.Item(inner_block), 
+            _item.Item("Ricky", 30)], strict=False, link_nested=True, 
+            priority_mode="mean")
+        outer_block = _block.Block([_item.Item(middle_block), 
+            _item.Item("Ben", 0)], strict=False, link_nested=True,
+            priority_mode="mean")
+        self.assertEqual(outer_block.get_priority(), 11.25)
+        inner_block.add_item(_item.Item("Tom", 60))
+        self.assertEqual(middle_block.get_priority(), 30)
+        self.assertEqual(outer_block.get_priority(), 15)
+        self.assertEqual(outer_block.get_sorted_items()[-1].get_object(), 
+            middle_block)
+        # Priorities of items are blended with provided block priority.
+        blended_block = _block.Block([_item.Item(inner_block)], 100, 
+            strict=False, link_nested=True, priority_mode="mean")
+        inner_block.set_priority(40)
+        self.assertEqual(blended_block.get_priorities(), [70])
+        self.assertEqual(outer_block.get_priority(), 17.5)
+        # Removed items no longer follow nested blocks.
+        middle_block.remove_item(middle_block.get_items()[0])
+        inner_block.set_priority(0)
+        self.assertEqual(middle_block.get_priority(), 30)
+        self.assertEqual(blended_block.get_priorities(), [50])
+        unlinked_block = _block.Block([_item.Item(middle_block, 5)], 
+            strict=False)
+        middle_block.add_item(_item.Item("Lord", 0))
+        self.assertEqual(unlinked_block.get_priorities(), [5])
+
+    def test_memory_usage(self):
+        block = _block.Block(self._items)
+        usage = block.memory_usage()
+        self.assertEqual(list(usage), ["items", "references", "priorities",
+            "objects", "storage", "indexes", "total"])
+        self.assertEqual(usage["total"], sum(usage.values()) / 2)
+        block.get_sorted_items()
+        self.assertGreater(block.memory_usage(False)["indexes"], 
+            usage["indexes"])
+        self.assertNotIn("objects", block.memory_usage(deep=False))
+
+    def test_intern_priorities(self):
+        items = [_item.Item(position, position % 3) for position in range(30)]
+        block = _block.Block(items, intern_priorities=True)
+        stored_items = block.get_items()
+        self.assertIs(stored_items[0].get_priority_object(), 
+            stored_items[3].get_priority_object())
+        self.assertRaises(TypeError, stored_items[0].set_priority, 5)
+        # Items passed to block are copied and can still be changed.
+        items[0].set_priority(5)
+        self.assertEqual(stored_items[0].get_priority(), 0)
+        block.set_item_priority(stored_items[0], 2)
+        self.assertEqual(stored_items[3].get_priority(), 0)
+        self.assertIs(stored_items[0].get_priority_object(), 
+            stored_items[2].get_priority_object())
+        self.assertEqual(block.get_items_by_priority(2)[0], stored_items[0])
+        block.add_item(items[1])
+        items[1].set_priority(7)
+        self.assertEqual(block.get_items()[-1].get_priority(), 1)
+        interned_block = _block.Block([_item.Item(position, position % 3) 
+            for position in range(30)], intern_priorities=True)
+        plain_block = _block.Block([_item.Item(position, position % 3) 
+            for position in range(30)])
+        self.assertLess(interned_block.memory_usage()["priorities"],
+            plain_block.memory_usage()["priorities"])
+
+    def test_pop_order(self):
+        items = [_item.Item(position, position % 5) for position in range(20)]
+        for kwargs in [{}, {"reverse": True}, 
+            {"tie_breaker": lambda i: -i.get_object()}]:
+            block = _block.Block(items, **kwargs)
+            sorted_items = block.get_sorted_items()
+            self.assertEqual(block.pop_first_n(3), sorted_items[:3])
+            self.assertEqual(block.pop_last(), sorted_items[-1])
+            self.assertEqual(block.get_sorted_items(), sorted_items[3:-1])
+
+    def test_to_mapping(self):
+        mapping = self._block.to_mapping()
+        self.assertEqual(mapping[10], "John")
+        self._block.add_item(_item.Item("Ben", 10))
+        self._block.add_item(_item.Item("John", 10))
+        self._block.add_item(_item.Item(["Ben"], 20))
+        self._block.set_item_priority(self._items[1], 15)
+        self.assertEqual(mapping[10], "Ben")
+        self.assertEqual(dict(mapping), 
+            {30: "Marry", 40: "Ricky", 10: "Ben", 20: ["Ben"], 15: "John"})
+        self.assertEqual(self._block.to_multi_dict()[10], ["Ben", "John"])
+        self.assertNotIn(50, mapping)
+
+    def test_to_columns(self):
+        priorities, objects = self._block.to_columns()
+        self.assertEqual(priorities.typecode, "q")
+        self.assertEqual(list(priorities), [10, 30, 40])
+        self.assertEqual(objects, ["John", "Marry", "Ricky"])
+        block = _block.Block.from_columns(priorities, objects)
+        self.assertEqual(block.to_tuple(), self._block.to_tuple())
+        self._block.add_item(_item.Item("Ben", 2.5))
+        self.assertIsInstance(self._block.to_columns()[0], list)
+        with self.assertRaises(ValueError):
+            _block.Block.from_columns([1, 2], ["Ben"])
+
+    def test_set_priority(self):
+        block = _block.Block(self._items, priority_mode="mean")
+        block.set_priority(20)
+        self.assertEqual(block.get_priority(), 20)
+        self.assertEqual(block.get_priorities(), [25, 15, 30])
+        self.assertEqual(self._items[0].get_priority(), 30)
+        # Priorities are blended from ones items were added with.
+        block = _block.Block([_item.Item("Ben", 3), _item.Item("Tom", 1)],
+            priority_mode="mean")
+        ben_item = block.get_items()[0]
+        lord_item = block.add_item(_item.Item("Lord", 2))
+        block.set_priority(5)
+        block.set_priority(5)
+        self.assertEqual(block.get_priorities(), [4, 3, 3.5])
+        self.assertEqual(ben_item.get_priority(), 3)
+        block.set_priority(None)
+        self.assertEqual(block.get_priorities(), [3, 1, 2])
+        self.assertEqual(block.get_priority(), 2)
+        # Items passed or returned by block still refer to stored items.
+        block.set_priority(7)
+        block.remove_item(ben_item)
+        block.remove_item(lord_item)
+        self.assertEqual(block.get_priorities(), [4])
+        self.assertEqual(block.get_sorted_objects(), ["Tom"])
+
+    def test_deep_add_item(self):
+        block = _block.DeepBlock(self._items[:1])
+        new_item = block.add_item(_item.Item(self._block, 20))
+        self.assertEqual(block.get_objects(), 
+            ["Marry", "Marry", "John", "Ricky"])
+        self.assertIs(new_item, self._items[0])
+
+
+class TestKeyBlock(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ben", 30), _item.Item("Ricky", 40)]
+        self._block = _block.Block(self._items, key=lambda p: -p)
+        self._reverse_block = _block.Block(self._items, reverse=True)
+
+    def test_get_sorted_objects(self):
+        objects = self._block.get_sorted_objects()
+        self.assertEqual(objects, ["Ricky", "Marry", "Ben", "John"])
+        objects = self._reverse_block.get_sorted_objects()
+        self.assertEqual(objects, ["Ricky", "Marry", "Ben", "John"])
+
+    def test_get_first_items(self):
+        items = self._reverse_block.get_first_items(1)
+        self.assertEqual(items, self._items[3:])
+        items = self._reverse_block.get_last_items(2)
+        self.assertEqual(items, [self._items[2], self._items[1]])
+
+    def test_get_items_by_priority_range(self):
+        items = self._block.get_items_by_priority_range(40, 30)
+        self.assertEqual(items, [self._items[0], self._items[2], 
+            self._items[3]])
+        self.assertRaises(ValueError, 
+            self._block.get_items_by_priority_range, 30, 40)
+
+    def test_get_items_by_priority(self):
+        items = self._block.get_items_by_priority(30)
+        self.assertEqual(items, [self._items[0], self._items[2]])
+        self.assertEqual(self._block.get_items_by_priority("a"), [])
+        # Sets are partially ordered, only equal ones are matched.
+        items = [_item.Item(str(i), frozenset(range(i, i+2))) 
+            for i in range(4)]
+        block = _block.Block(items, priority=0)
+        block.get_sorted_items()
+        self.assertEqual([block.extract_objects_from_items(
+            block.get_items_by_priority(_item.get_priority())) 
+            for _item in items], [["0"], ["1"], ["2"], ["3"]])
+        items = block.get_items_by_priorities([frozenset({3, 4}),
+            frozenset({0, 1}), frozenset({0})])
+        self.assertEqual(block.extract_objects_from_items(items), ["0", "3"])
+
+    def test_get_priority(self):
+        # Median is calculated from keys of priorities.
+        self.assertEqual(self._block.get_priority(), 30)
+        block = _block.Block(self._items[1:], key=lambda p: -p)
+        self.assertEqual(block.get_priority(), 30)
+
+    def test_refresh_index(self):
+        self._block.get_sorted_items()
+        self._items[1].set_priority(50)
+        self._block.refresh_index()
+        self.assertEqual(self._block.get_first_item(), self._items[1])
+
+
+class TestCompositeBlock(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("a", (1, 5, 2)), _item.Item("b", (0, 9, 1)),
+            _item.Item("c", (1, 3, 1)), _item.Item("d", (1, 5, 1))]
+        self._block = _block.Block(self._items, 
+            tie_breaker=lambda i: i.get_object())
+
+    def test_get_items_by_priority_prefix(self):
+        items = self._block.get_items_by_priority_prefix((1,))
+        self.assertEqual(items, [self._items[0], self._items[2], 
+            self._items[3]])
+        items = self._block.get_items_by_priority_prefix((1,), 4, 5)
+        self.assertEqual(items, [self._items[0], self._items[3]])
+
+    def test_get_item_by_priority_prefix(self):
+        item = self._block.get_item_by_priority_prefix((1, 5))
+        self.assertEqual(item, self._items[0])
+        self.assertIsNone(self._block.get_item_by_priority_prefix((3,)))
+
+    def test_tie_breaker(self):
+        block = _block.Block(self._items, key=lambda p: p[:2],
+            tie_breaker=lambda i: i.get_object())
+        self.assertEqual(block.get_sorted_objects(), ["b", "c", "a", "d"])
+        block = _block.Block(self._items, key=lambda p: p[:2],
+            tie_breaker=lambda i: -ord(i.get_object()))
+        self.assertEqual(block.get_sorted_objects(), ["b", "c", "d", "a"])
+
+
+class TestParallelBlock(unittest.TestCase):
+    def test_workers(self):
+        items = [_item.Item(position, position % 7) for position in range(50)]
+        block = _block.Block(items, workers=2)
+        expected = _block.Block(items)
+        self.assertEqual(block.get_sorted_objects(), 
+            expected.get_sorted_objects())
+        self.assertEqual(block.get_priority(), expected.get_priority())
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import unittest
+
+from mimap import bucket
+from mimap import highlevel
+from mimap import item as _item
+from tests import test_block
+
+
+class TestBucketBlockQueries(test_block.TestBlock):
+    _block_type = bucket.BucketBlock
+
+
+class TestBucketBlock(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 3), _item.Item("John", 1),
+            _item.Item("Ben", 3), _item.Item("Ricky", 4)]
+        self._block = bucket.BucketBlock(self._items)
+
+    def test_aggregate_range(self):
+        self.assertEqual(self._block.aggregate_range(2, 4, "count"), 3)
+        self.assertEqual(self._block.aggregate_range(2, 3.5, "sum"), 6)
+        self.assertEqual(self._block.aggregate_range(2, None, "max"), 4)
+        self.assertEqual(self._block.aggregate_range(2, None, "min"), 3)
+        self.assertEqual(self._block.aggregate_range(mode="median"), 3)
+
+    def test_priority_check(self):
+        with self.assertRaises(ValueError):
+            bucket.BucketBlock([_item.Item("John", 256)])
+        with self.assertRaises(ValueError):
+            self._block.add_item(_item.Item("John", 1.5))
+        with self.assertRaises(ValueError):
+            bucket.BucketBlock(self._items, key=abs)
+
+    def test_get_priority_count(self):
+        self.assertEqual(self._block.get_priority_count(3), 2)
+        self.assertEqual(self._block.get_priority_count(2), 0)
+        self._block.remove_item(self._items[0])
+        self.assertEqual(self._block.get_priority_count(3), 1)
+
+    def test_pop(self):
+        self.assertEqual(self._block.pop_first(), self._items[1])
+        self.assertEqual(self._block.pop_last(), self._items[3])
+        self.assertEqual(self._block.pop_last(), self._items[2])
+        self.assertEqual(self._block.get_priority(), 3)
+        self.assertEqual(self._block.pop_first(), self._items[0])
+        self.assertIsNone(self._block.pop_first())
+
+    def test_first_last_items(self):
+        self.assertEqual(self._block.get_first_items(2), 
+            [self._items[1], self._items[0]])
+        self.assertEqual(self._block.get_last_items(2), 
+            [self._items[2], self._items[3]])
+        block = bucket.BucketBlock(self._items, reverse=True)
+        self.assertEqual(block.get_sorted_objects(), 
+            ["Ricky", "Marry", "Ben", "John"])
+        self.assertEqual(block.get_last_items(2), 
+            [self._items[2], self._items[1]])
+
+    def test_create_mapping(self):
+        block = highlevel.create_mapping(self._items)
+        self.assertNotIsInstance(block, bucket.BucketBlock)
+        block.add_item(_item.Item("Ben", 300))
+        block = highlevel.create_mapping(self._items, bucket_block=None)
+        self.assertIsInstance(block, bucket.BucketBlock)
+        block = highlevel.create_mapping(self._items + 
+            [_item.Item("Ben", 300)], bucket_block=None)
+        self.assertNotIsInstance(block, bucket.BucketBlock)
+
+
+if __name__ == '__main__':
+    unittest.main()
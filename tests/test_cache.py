@@ -0,0 +1,70 @@
+import unittest
+
+from mimap import cache
+from mimap import highlevel
+from mimap import item as _item
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ricky", 40)]
+        cache.enable(maxsize=2)
+
+    def tearDown(self) -> None:
+        cache.disable()
+
+    def test_get_block(self):
+        block = cache.get_block(self._items, highlevel.create_mapping)
+        self.assertIs(cache.get_block(self._items, highlevel.create_mapping),
+            block)
+        self.assertIsNot(cache.get_block(self._items, 
+            highlevel.create_mapping, flatten=True), block)
+        self.assertEqual(cache.get_info()["hits"], 1)
+        self.assertEqual(cache.get_info()["misses"], 2)
+
+    def test_invalidation(self):
+        self.assertEqual(highlevel.find_first_item(self._items), 
+            self._items[1])
+        self._items[2].set_priority(5)
+        self.assertEqual(highlevel.find_first_item(self._items), 
+            self._items[2])
+        self._items.append(_item.Item("Ben", 1))
+        self.assertEqual(highlevel.find_first_item(self._items), 
+            self._items[3])
+        self.assertEqual(cache.get_info()["hits"], 0)
+        # Changing items not held by entry keeps it valid.
+        _item.Item("Tom", 3).set_priority(4)
+        highlevel.find_first_item(self._items)
+        self.assertEqual(cache.get_info()["hits"], 1)
+
+    def test_nested(self):
+        nested_block = highlevel.create_block(self._items)
+        items = [_item.Item(nested_block, 20)]
+        highlevel.flatten_items(items)
+        highlevel.flatten_items(items)
+        self.assertEqual(cache.get_info()["hits"], 0)
+
+    def test_eviction(self):
+        items_lists = [list(self._items) for _ in range(3)]
+        for items in items_lists:
+            highlevel.find_last_item(items)
+        self.assertEqual(cache.get_info()["size"], 2)
+        highlevel.find_last_item(items_lists[2])
+        highlevel.find_first_item(items_lists[0])
+        self.assertEqual(cache.get_info()["hits"], 1)
+
+    def test_find_items_by_priority_range(self):
+        items = highlevel.find_items_by_priority_range(self._items, 20, 40)
+        self.assertEqual(items, [self._items[0], self._items[2]])
+        item = highlevel.find_item_by_priority_range(self._items, end=20)
+        self.assertEqual(item, self._items[1])
+
+    def test_disabled(self):
+        cache.disable()
+        highlevel.find_first_item(self._items)
+        self.assertEqual(cache.get_info()["size"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from mimap import block
+from mimap import disk
+from mimap import item as _item
+
+
+class TestDiskBlock(unittest.TestCase):
+    def setUp(self) -> None:
+        priorities = [30, 10, 40, 30, 20, 50, 10, 60, 45, 5]
+        self._items = [_item.Item("item{}".format(i), priority)
+            for i, priority in enumerate(priorities)]
+        self._sorted_items = sorted(self._items, 
+            key=lambda i: i.get_priority())
+        self._block = disk.DiskBlock(iter(self._items), page_size=3, 
+            run_size=4)
+
+    def tearDown(self) -> None:
+        self._block.close()
+
+    def _objects(self, items):
+        return [_item.get_object() for _item in items]
+
+    def test_len(self):
+        self.assertEqual(len(self._block), 10)
+
+    def test_get_priority(self):
+        self.assertEqual(self._block.get_priority(), 30)
+        with disk.DiskBlock(self._items, priority_mode="mean") as block:
+            self.assertEqual(block.get_priority(), 30)
+        with disk.DiskBlock(self._items, priority_mode="max") as block:
+            self.assertEqual(block.get_priority(), 60)
+
+    def test_strict(self):
+        nested_item = _item.Item(block.Block(self._items[:2]), 15)
+        self.assertRaises(TypeError, disk.DiskBlock, [nested_item])
+        with disk.DiskBlock([nested_item] + self._items[2:4], 
+            strict=False) as disk_block:
+            nested_block = disk_block.get_first_item().get_object()
+            self.assertEqual(nested_block.get_objects(), ["item0", "item1"])
+
+    def test_get_items(self):
+        self.assertEqual(self._objects(self._block.get_items()),
+            self._objects(self._items))
+
+    def test_to_columns(self):
+        priorities, objects = self._block.to_columns()
+        self.assertEqual(priorities.typecode, "q")
+        self.assertEqual(list(priorities), 
+            [i.get_priority() for i in self._sorted_items])
+        self.assertEqual(objects, self._objects(self._sorted_items))
+
+    def test_get_sorted_objects(self):
+        self.assertEqual(self._block.get_sorted_objects(),
+            self._objects(self._sorted_items))
+
+    def test_get_items_by_priority(self):
+        items = self._block.get_items_by_priority(10)
+        self.assertEqual(self._objects(items), ["item1", "item6"])
+        self.assertEqual(self._block.get_items_by_priority(11), [])
+
+    def test_get_items_by_priority_range(self):
+        items = self._block.get_items_by_priority_range(30, 45)
+        self.assertEqual(self._objects(items), 
+            ["item0", "item2", "item3", "item8"])
+        items = self._block.get_items_by_priority_range(end=10)
+        self.assertEqual(self._objects(items), ["item1", "item6", "item9"])
+        self.assertRaises(ValueError, 
+            self._block.get_items_by_priority_range, 2, 1)
+
+    def test_get_items_by_priorities(self):
+        items = self._block.get_items_by_priorities([60, 5])
+        self.assertEqual(self._objects(items), ["item7", "item9"])
+
+    def test_get_first_items(self):
+        self.assertEqual(self._objects(self._block.get_first_items(4)),
+            self._objects(self._sorted_items[:4]))
+        self.assertEqual(self._block.get_first_item().get_object(), "item9")
+
+    def test_get_last_items(self):
+        self.assertEqual(self._objects(self._block.get_last_items(4)),
+            self._objects(self._sorted_items[-4:]))
+        self.assertEqual(self._block.get_last_item().get_object(), "item7")
+
+    def test_get_items_by_type(self):
+        self.assertEqual(len(self._block.get_items_by_type(str)), 10)
+        self.assertEqual(self._block.get_items_by_type(int), [])
+
+    def test_to_tuple(self):
+        self.assertEqual(self._block.to_tuple()[:2], 
+            ((5, "item9"), (10, "item1")))
+
+    def test_type(self):
+        self.assertRaises(TypeError, disk.DiskBlock, self._items, 
+            _type=int)
+
+    def test_close(self):
+        block = disk.DiskBlock(self._items)
+        directory = block._directory
+        block.close()
+        import os
+        self.assertFalse(os.path.exists(directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
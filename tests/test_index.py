@@ -0,0 +1,156 @@
+import unittest
+
+from mimap import index as _index
+from mimap import item as _item
+
+
+class TestSortedIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ben", 30), _item.Item("Ricky", 40)]
+        self._index = _index.SortedIndex(self._items)
+
+    def test_get_keys(self):
+        self.assertEqual(self._index.get_keys(), [10, 30, 30, 40])
+
+    def test_get_items(self):
+        items = self._index.get_items()
+        self.assertEqual(items, [self._items[1], self._items[0], 
+            self._items[2], self._items[3]])
+
+    def test_get_descending_items(self):
+        items = self._index.get_descending_items()
+        self.assertEqual(items, [self._items[3], self._items[0], 
+            self._items[2], self._items[1]])
+
+    def test_find(self):
+        self.assertEqual(self._index.find(30), (1, 3))
+        self.assertEqual(self._index.find(20), (1, 1))
+
+    def test_find_range(self):
+        self.assertEqual(self._index.find_range(20, 35), (1, 3))
+        self.assertEqual(self._index.find_range(end=10), (0, 1))
+        self.assertEqual(self._index.find_range(50), (4, 4))
+
+    def test_find_many(self):
+        slices = self._index.find_many([40, 30, 10, 35])
+        self.assertEqual(slices, [(3, 4), (1, 3), (0, 1), (3, 3)])
+
+    def test_find_ranges(self):
+        slices = self._index.find_ranges([(30, None), (None, 10), (5, 35)])
+        self.assertEqual(slices, [(1, 4), (0, 1), (0, 3)])
+
+    def test_get_ordered_items(self):
+        items = self._index.get_ordered_items([(2, 4), (0, 1)])
+        self.assertEqual(items, self._items[1:])
+
+    def test_key(self):
+        _index_object = _index.SortedIndex(self._items, key=str)
+        self.assertEqual(_index_object.get_keys(), ["10", "30", "30", "40"])
+
+
+class TestCompositeSortedIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("a", (1, 5, 2)), _item.Item("b", (0, 9, 1)),
+            _item.Item("c", (1, 3, 1)), _item.Item("d", (2, 1, 1)),
+            _item.Item("e", (1, 5, 1))]
+        self._index = _index.SortedIndex(self._items)
+
+    def test_find_prefix(self):
+        self.assertEqual(self._index.find_prefix((1,)), (1, 4))
+        self.assertEqual(self._index.find_prefix((1, 5)), (2, 4))
+        self.assertEqual(self._index.find_prefix((3,)), (5, 5))
+        self.assertEqual(self._index.find_prefix(()), (0, 5))
+
+    def test_find_prefix_range(self):
+        self.assertEqual(self._index.find_prefix((1,), 4, 5), (2, 4))
+        self.assertEqual(self._index.find_prefix((1,), end=3), (1, 2))
+        self.assertEqual(self._index.find_prefix((1,), start=6), (4, 4))
+
+    def test_tie_breaker(self):
+        items = [_item.Item("b", 1), _item.Item("a", 1), _item.Item("c", 0)]
+        _index_object = _index.SortedIndex(items, 
+            tie_breaker=lambda i: i.get_object())
+        self.assertEqual(_index_object.get_items(), 
+            [items[2], items[1], items[0]])
+
+
+class TestHashIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ben", 30)]
+        self._index = _index.HashIndex(self._items)
+
+    def test_get_items(self):
+        self.assertEqual(list(self._index.get_priorities()), [30, 10])
+        self.assertEqual(self._index.get_items(30), 
+            [self._items[0], self._items[2]])
+        self.assertEqual(self._index.get_items(20), [])
+
+    def test_insert_remove(self):
+        self._index.remove(self._items[0], 0)
+        self._index.remove(self._items[1], 1)
+        self.assertEqual(len(self._index), 1)
+        self._index.insert(self._items[0], 0)
+        self.assertEqual(self._index.get_items(30), 
+            [self._items[0], self._items[2]])
+
+
+class TestWeightIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 3), _item.Item("John", 0),
+            _item.Item("Ricky", 2), _item.Item("Ben", 1)]
+        self._index = _index.WeightIndex(self._items)
+
+    def test_find(self):
+        self.assertEqual(self._index.get_total(), 6)
+        found_items = [self._index.find(weight) 
+            for weight in (0, 2.9, 3, 4.9, 5, 5.9)]
+        self.assertEqual(found_items, [self._items[0]] * 2 + 
+            [self._items[2]] * 2 + [self._items[3]] * 2)
+        self.assertRaises(ValueError, self._index.insert, 
+            _item.Item("Tom", -1), 4)
+        self.assertRaises(TypeError, self._index.insert, 
+            _item.Item("Tom", "a"), 4)
+
+    def test_insert_remove(self):
+        self._index.remove(self._items[0], 0)
+        self._index.insert(_item.Item("Tom", 4), 4)
+        self.assertEqual(self._index.get_total(), 7)
+        self.assertEqual(self._index.find(0), self._items[2])
+        self.assertEqual(self._index.find(3).get_object(), "Tom")
+        for seq in range(5, 100):
+            self._index.insert(_item.Item(seq, 1), seq)
+            self._index.remove(None, seq)
+        self.assertEqual(len(self._index), 4)
+        self.assertEqual(self._index.find(6.5).get_object(), "Tom")
+
+
+class TestSumIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 3), _item.Item("John", 1),
+            _item.Item("Ricky", 2), _item.Item("Ben", 1)]
+        self._index = _index.SumIndex(self._items)
+
+    def test_get_totals(self):
+        self.assertEqual(self._index.get_totals(), (4, 7))
+        self.assertEqual(self._index.get_totals(1, 2), (3, 4))
+        self.assertEqual(self._index.get_totals(1.5, None), (2, 5))
+        self.assertEqual(self._index.get_totals(4, 5), (0, 0))
+        self.assertRaises(TypeError, self._index.insert, 
+            _item.Item("Tom", "a"), 4)
+
+    def test_insert_remove(self):
+        self._index.remove(self._items[0], 0)
+        self._index.insert(_item.Item("Tom", 1.5), 4)
+        self.assertEqual(self._index.get_totals(1, 2), (4, 5.5))
+        for seq in range(5, 100):
+            self._index.insert(_item.Item(seq, seq), seq)
+        self.assertEqual(self._index.get_totals(10, 20), (11, 165))
+        self._index.remove(_item.Item(10, 10), 10)
+        self.assertEqual(self._index.get_totals(10, 20), (10, 155))
+        self.assertEqual(len(self._index), 98)
+
+
+if __name__ == "__main__":
+    unittest.main()
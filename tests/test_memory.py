@@ -0,0 +1,32 @@
+import sys
+import unittest
+
+from mimap import item as _item
+from mimap import memory
+
+
+class TestMemory(unittest.TestCase):
+    def test_get_size(self):
+        values = [1000, 2000]
+        size = sys.getsizeof(values) + sys.getsizeof(1000) * 2
+        self.assertEqual(memory.get_size(values), size)
+        self.assertEqual(memory.get_size([values, values]), 
+            size + sys.getsizeof([values, values]))
+        self.assertEqual(memory.get_size(values, follow=False), 
+            sys.getsizeof(values))
+
+    def test_seen(self):
+        seen = set()
+        memory.get_size("Marry", seen)
+        self.assertEqual(memory.get_size(["Marry"], seen), 
+            sys.getsizeof(["Marry"]))
+
+    def test_item(self):
+        item = _item.Item("Marry", 30.5)
+        self.assertGreater(memory.get_size(item), sys.getsizeof(item) +
+            sys.getsizeof(30.5) + sys.getsizeof("Marry"))
+        self.assertEqual(memory.get_size(len), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import concurrent.futures
+import unittest
+
+from mimap import parallel
+
+
+class TestParallel(unittest.TestCase):
+    def test_split(self):
+        self.assertEqual(parallel.split([1, 2, 3, 4, 5], 2), 
+            [[1, 2, 3], [4, 5]])
+        self.assertEqual(parallel.split([1], 4), [[1]])
+        self.assertEqual(parallel.split([], 4), [])
+
+    def test_sort_keys(self):
+        keys = [3, 1, 2, 1, 3, 0, 2, 1]
+        expected = sorted(range(len(keys)), key=keys.__getitem__)
+        self.assertEqual(parallel.sort_keys(keys, None), expected)
+        self.assertEqual(parallel.sort_keys(keys, 2), expected)
+        # Provided pool of workers is used on any python build.
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            self.assertEqual(parallel.sort_keys(keys, 2, executor), 
+                expected)
+
+    def test_map_chunks(self):
+        def double(chunk):
+            return [value * 2 for value in chunk]
+        self.assertEqual(parallel.map_chunks(double, [1, 2, 3], 2), 
+            [2, 4, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from mimap import block as _block
+from mimap import item as _item
+from mimap import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item("John", 10),
+            _item.Item("Ricky", 40)]
+        self._block = _block.Block(self._items)
+        profiling.reset()
+
+    def test_disabled(self):
+        self._block.get_sorted_items()
+        self.assertFalse(profiling.is_enabled())
+        self.assertEqual(profiling.get_counters().get_count("sorts"), 0)
+
+    def test_capture(self):
+        with profiling.capture() as counters:
+            self._block.get_sorted_items()
+            self._block.filter_items()
+            self._block.copy_items()
+        self.assertFalse(profiling.is_enabled())
+        self.assertEqual(counters.get_calls("sorts"), 1)
+        self.assertEqual(counters.get_count("scans"), 3)
+        self.assertEqual(counters.get_count("copies"), 3)
+        self.assertGreaterEqual(counters.get_time("sorts"), 0)
+        self._block.get_sorted_items()
+        self.assertEqual(counters.get_calls("sorts"), 1)
+
+    def test_get_counters(self):
+        with profiling.capture():
+            self._block.copy_items()
+        block_counters = profiling.get_counters(self._block)
+        self.assertEqual(block_counters.get_count("copies"), 3)
+        self.assertEqual(profiling.get_counters().get_count("copies"), 3)
+
+    def test_flattens(self):
+        with profiling.capture() as counters:
+            _block.DeepBlock([_item.Item(self._block, 20)])
+        self.assertEqual(counters.get_count("flattens"), 3)
+
+    def test_add_hook(self):
+        events = []
+        def hook(block, event, count, elapsed):
+            events.append((block, event, count))
+        profiling.add_hook(hook)
+        try:
+            with profiling.capture():
+                self._block.filter_items()
+        finally:
+            profiling.remove_hook(hook)
+        self.assertEqual(events, [(self._block, "scans", 3)])
+
+    def test_record_invalid_event(self):
+        counters = profiling.Counters()
+        self.assertRaises(ValueError, counters.record, "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from mimap import aging
+from mimap import block as _block
+from mimap import bucket
+from mimap import item as _item
+
+
+class TestQuery(unittest.TestCase):
+    def setUp(self) -> None:
+        self._items = [_item.Item("Marry", 30), _item.Item(5, 10),
+            _item.Item("John", 10), _item.Item("Ricky", 40),
+            _item.Item(7, 25)]
+        self._block = _block.Block(self._items)
+
+    def test_between(self):
+        query = self._block.query().between(10, 30)
+        self.assertEqual(query.get_items(),
+            [self._items[1], self._items[2], self._items[4], self._items[0]])
+        self.assertEqual(query.first(2), self._items[1:3])
+        self.assertEqual(query.last(2), [self._items[4], self._items[0]])
+        self.assertEqual(query.count(), 4)
+        self.assertRaises(ValueError, self._block.query().between(30, 10)
+            .get_items)
+
+    def test_of_type(self):
+        query = self._block.query().of_type(str)
+        self.assertEqual(query.get_objects(), ["John", "Marry", "Ricky"])
+        self.assertEqual(query.between(20).first(1), [self._items[0]])
+        self.assertEqual(query.of_type(int).get_items(), [])
+        self.assertEqual(self._block.query().where(
+            lambda _item: _item.get_object() == 7).get_items(),
+            [self._items[4]])
+
+    def test_reverse(self):
+        block = _block.Block(self._items, reverse=True)
+        query = block.query().between(10, 30)
+        self.assertEqual(query.get_objects(), ["Marry", 7, 5, "John"])
+        self.assertEqual(query.last(2), block.get_sorted_items()[3:])
+
+    def test_deep(self):
+        nested_block = _block.Block([_item.Item("Ben", 20),
+            _item.Item(8, 35)])
+        block = _block.Block(self._items + [_item.Item(nested_block, 50)],
+            strict=False)
+        query = block.query().deep().of_type(str).between(15)
+        self.assertEqual(query.get_objects(), ["Ben", "Marry", "Ricky"])
+        self.assertEqual(block.query().deep().last(2)[0].get_object(), 8)
+        self.assertEqual(block.query().first(), block.get_first_items())
+
+    def test_aging(self):
+        block = aging.AgingBlock(self._items)
+        block.age(5)
+        self.assertEqual(block.query().between(20, 25).get_objects(),
+            [7, "Marry"])
+
+    def test_bucket(self):
+        block = bucket.BucketBlock(self._items)
+        query = block.query().of_type(int).between(10, 25)
+        self.assertEqual(query.get_objects(), [5, 7])
+        self.assertEqual(block.query().last(1), [self._items[3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from mimap import item as _item
+from mimap import sharded
+
+
+class TestShardedBlock(unittest.TestCase):
+    _partition = "range"
+
+    def setUp(self) -> None:
+        priorities = [30, 10, 40, 30, 20, 50, 10, 60, 45, 5]
+        self._items = [_item.Item("item{}".format(i), priority)
+            for i, priority in enumerate(priorities)]
+        self._sorted_items = sorted(self._items, 
+            key=lambda i: i.get_priority())
+        self._block = sharded.ShardedBlock(self._items, shards=3,
+            partition=self._partition)
+
+    def tearDown(self) -> None:
+        self._block.close()
+
+    def _objects(self, items):
+        return [_item.get_object() for _item in items]
+
+    def test_len(self):
+        self.assertEqual(len(self._block), 10)
+        self.assertEqual(sum(self._block.get_shard_sizes()), 10)
+
+    def test_get_priority(self):
+        self.assertEqual(self._block.get_priority(), 30)
+        with sharded.ShardedBlock(self._items, priority_mode="mean",
+            partition=self._partition) as block:
+            self.assertEqual(block.get_priority(), 30)
+        with sharded.ShardedBlock(self._items, priority_mode="min",
+            partition=self._partition) as block:
+            self.assertEqual(block.get_priority(), 5)
+
+    def test_get_items(self):
+        self.assertEqual(self._objects(self._block.get_items()),
+            self._objects(self._items))
+
+    def test_get_sorted_objects(self):
+        self.assertEqual(self._block.get_sorted_objects(),
+            self._objects(self._sorted_items))
+
+    def test_get_items_by_priority(self):
+        items = self._block.get_items_by_priority(10)
+        self.assertEqual(self._objects(items), ["item1", "item6"])
+        items = self._block.get_items_by_priorities([60, 5])
+        self.assertEqual(self._objects(items), ["item7", "item9"])
+
+    def test_get_items_by_priority_range(self):
+        items = self._block.get_items_by_priority_range(30, 45)
+        self.assertEqual(self._objects(items), 
+            ["item0", "item2", "item3", "item8"])
+        self.assertRaises(ValueError, 
+            self._block.get_items_by_priority_range, 2, 1)
+
+    def test_get_items_by_type(self):
+        self.assertEqual(len(self._block.get_items_by_type(str)), 10)
+        self.assertIsNone(self._block.get_item_by_type(int))
+
+    def test_query_after_error(self):
+        # Every shard fails here, replies of all need to be read.
+        self.assertRaises(TypeError, self._block.get_items_by_type, 5)
+        items = self._block.get_items_by_priority(10)
+        self.assertEqual(self._objects(items), ["item1", "item6"])
+        self.assertEqual(self._objects(self._block.get_first_items(2)),
+            ["item9", "item1"])
+
+    def test_get_first_items(self):
+        self.assertEqual(self._objects(self._block.get_first_items(4)),
+            self._objects(self._sorted_items[:4]))
+        self.assertEqual(self._objects(self._block.get_last_items(4)),
+            self._objects(self._sorted_items[-4:]))
+
+    def test_add_items(self):
+        self._block.add_items([_item.Item("new{}".format(i), 100+i)
+            for i in range(20)])
+        self.assertEqual(len(self._block), 30)
+        self.assertEqual(self._block.get_last_item().get_object(), "new19")
+        self.assertEqual(self._block.get_objects()[-1], "new19")
+        if self._partition == "range":
+            # Last shard got too many items and was rebalanced.
+            self.assertLessEqual(max(self._block.get_shard_sizes()), 10)
+
+    def test_add_equal_items(self):
+        rebalances = []
+        rebalance = self._block.rebalance
+        def count_rebalance():
+            rebalances.append(True)
+            rebalance()
+        self._block.rebalance = count_rebalance
+        for i in range(40):
+            self._block.add_item(_item.Item("new{}".format(i), 70))
+        self.assertEqual(len(self._block), 50)
+        self.assertEqual(len(self._block.get_items_by_priority(70)), 40)
+        if self._partition == "range":
+            # Items with equal priorities stay in one shard.
+            self.assertLessEqual(len(rebalances), 3)
+
+
+class TestHashShardedBlock(TestShardedBlock):
+    _partition = "hash"
+
+
+if __name__ == "__main__":
+    unittest.main()
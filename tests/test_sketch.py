@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from mimap import sketch
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def setUp(self) -> None:
+        self._values = list(range(20000))
+        random.Random(3).shuffle(self._values)
+        self._sketch = sketch.QuantileSketch(0.01, seed=1)
+        self._sketch.extend(self._values)
+
+    def assertRankClose(self, value, fraction):
+        error = abs(value/len(self._values) - fraction)
+        self.assertLessEqual(error, self._sketch.get_error())
+
+    def test_get_quantile(self):
+        self.assertEqual(len(self._sketch), 20000)
+        for fraction in (0, 0.1, 0.5, 0.9, 1):
+            self.assertRankClose(self._sketch.get_quantile(fraction),
+                fraction)
+        self.assertRankClose(self._sketch.get_median(), 0.5)
+        self.assertIsNone(sketch.QuantileSketch().get_median())
+
+    def test_merge(self):
+        first_sketch = sketch.QuantileSketch(0.01, seed=1)
+        second_sketch = sketch.QuantileSketch(0.01, seed=2)
+        first_sketch.extend(self._values[:5000])
+        second_sketch.extend(self._values[5000:])
+        first_sketch.merge(second_sketch)
+        self.assertEqual(len(first_sketch), 20000)
+        self.assertRankClose(first_sketch.get_quantile(0.25), 0.25)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            sketch.QuantileSketch(0)
+
+
+if __name__ == '__main__':
+    unittest.main()